@@ -0,0 +1,146 @@
+"""Local stand-in for the Trustpilot RapidAPI endpoints.
+
+    python -m bench.fake_rapidapi --port 9100 --latency-ms 80 --error-rate 0.01 --rate-limit-rate 0.02
+
+Point the app at it with RAPIDAPI_BASE_URL=http://127.0.0.1:9100. Payloads
+are deterministic and match bench/generate_data.py when started with the
+same --companies and --reviews.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from bench import synthetic
+
+SEARCH_RESULTS = 10
+
+
+class FakeRapidAPI:
+    """Payloads and fault injection; shared by the request handler threads"""
+
+    def __init__(self, companies: int, reviews: int, new_reviews: int, latency_ms: float, jitter_ms: float,
+                 error_rate: float, rate_limit_rate: float, quota: int, seed: int):
+        self.companies = companies
+        self.counts = synthetic.review_counts(companies, reviews)
+        self.new_reviews = new_reviews
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.quota = quota
+        self.served = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def roll(self):
+        """Decide this request's latency and fault, returning (delay_seconds, status)"""
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            draw = self._random.random()
+            self.served += 1
+            served = self.served
+        if draw < self.rate_limit_rate or (self.quota and served > self.quota):
+            return delay, 429
+        if draw < self.rate_limit_rate + self.error_rate:
+            return delay, 500
+        return delay, 200
+
+    def rate_limit_headers(self):
+        remaining = max(self.quota - self.served, 0) if self.quota else 1_000_000_000
+        return {
+            "x-ratelimit-requests-limit": str(self.quota or 1_000_000_000),
+            "x-ratelimit-requests-remaining": str(remaining),
+        }
+
+    def search(self, query: str):
+        # Deterministic pick of companies for the query
+        start = synthetic.stable_hash("search", query.lower()) % self.companies
+        indexes = [(start + i * 97) % self.companies for i in range(min(SEARCH_RESULTS, self.companies))]
+        companies = [synthetic.upstream_company(i, self.counts[i] + self.new_reviews) for i in indexes]
+        return {"data": {"companies": companies}}
+
+    def reviews(self, domain: str, page: int):
+        """A page of reviews, newest first, like the real endpoint with sort=recency"""
+        index = synthetic.company_index(domain)
+        if index is None or index >= self.companies or page < 1:
+            return {"data": {"reviews": []}}
+        stored = self.counts[index]
+        newest = stored + self.new_reviews - 1 - (page - 1) * synthetic.PAGE_SIZE
+        ks = range(newest, max(newest - synthetic.PAGE_SIZE, -1), -1)
+        return {"data": {"reviews": [synthetic.upstream_review(domain, k, stored) for k in ks]}}
+
+
+def make_handler(api: FakeRapidAPI):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: dict, headers=None):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            delay, status = api.roll()
+            time.sleep(delay)
+            headers = api.rate_limit_headers()
+
+            if status == 429:
+                self._send(429, {"message": "Too many requests"}, {**headers, "Retry-After": "1"})
+            elif status == 500:
+                self._send(500, {"message": "Upstream error"}, headers)
+            elif url.path == "/company-search":
+                self._send(200, api.search(params.get("query", "")), headers)
+            elif url.path == "/company-reviews":
+                try:
+                    page = int(params.get("page", 1))
+                except ValueError:
+                    page = 1
+                self._send(200, api.reviews(params.get("company_domain", ""), page), headers)
+            else:
+                self._send(404, {"message": "Not found"})
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Trustpilot RapidAPI server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--companies", type=int, default=synthetic.DEFAULT_COMPANIES)
+    parser.add_argument("--reviews", type=int, default=synthetic.DEFAULT_REVIEWS)
+    parser.add_argument("--new-reviews", type=int, default=synthetic.DEFAULT_NEW_REVIEWS, help="Reviews per domain newer than the stored ones")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--quota", type=int, default=0, help="Requests before every response is a 429 (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    api = FakeRapidAPI(args.companies, args.reviews, args.new_reviews, args.latency_ms, args.jitter_ms,
+                       args.error_rate, args.rate_limit_rate, args.quota, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(api))
+    server.daemon_threads = True
+    print(f"🧪 Fake RapidAPI listening on http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
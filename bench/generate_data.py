@@ -0,0 +1,100 @@
+"""Generate legacy data/*.json files at benchmark scale.
+
+    python -m bench.generate_data --data-dir bench_data
+
+The files are imported into SQLite by the app on first startup (or by
+`DATA_DIR=bench_data python storage.py migrate`). Every user's password is
+bench.synthetic.BENCH_PASSWORD.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import timedelta
+
+from bench import synthetic
+
+# Share of companies (the busiest ones) tracked by many users
+POPULAR_SHARE = 0.01
+POPULAR_SUBSCRIBERS = 25
+
+
+def _write_json_array(path: str, records):
+    """Stream records into a JSON array without holding them all in memory"""
+    count = 0
+    with open(path, "w") as f:
+        f.write("[\n")
+        for record in records:
+            if count:
+                f.write(",\n")
+            f.write(json.dumps(record))
+            count += 1
+        f.write("\n]\n")
+    return count
+
+
+def generate_users(users: int):
+    # bcrypt is deliberately slow, so every user shares one hash of the bench password
+    from utils import get_password_hash
+    hashed_password = get_password_hash(synthetic.BENCH_PASSWORD)
+    for i in range(users):
+        yield {
+            "username": synthetic.username(i),
+            "email": f"{synthetic.username(i)}@example.com",
+            "password": synthetic.BENCH_PASSWORD,
+            "hashed_password": hashed_password,
+            "disabled": False,
+        }
+
+
+def generate_tracked_companies(companies: int, users: int):
+    """Every company has one subscriber; the busiest ones are tracked by many users"""
+    popular = max(1, int(companies * POPULAR_SHARE))
+    for i in range(companies):
+        subscribers = {i % users}
+        if i < popular:
+            subscribers.update((i * 7 + j * 13) % users for j in range(POPULAR_SUBSCRIBERS))
+        for user in sorted(subscribers):
+            yield {
+                "domain": synthetic.company_domain(i),
+                "name": synthetic.company_name(i),
+                "added_at": (synthetic.ANCHOR - timedelta(days=365) + timedelta(minutes=i)).isoformat(),
+                "user": synthetic.username(user),
+            }
+
+
+def generate_reviews(companies: int, total_reviews: int):
+    for i, count in enumerate(synthetic.review_counts(companies, total_reviews)):
+        domain = synthetic.company_domain(i)
+        for k in range(count):
+            yield synthetic.review(domain, k, count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate benchmark data files")
+    parser.add_argument("--data-dir", default="bench_data")
+    parser.add_argument("--companies", type=int, default=synthetic.DEFAULT_COMPANIES)
+    parser.add_argument("--reviews", type=int, default=synthetic.DEFAULT_REVIEWS)
+    parser.add_argument("--users", type=int, default=synthetic.DEFAULT_USERS)
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    files = [
+        ("users.json", generate_users(args.users)),
+        ("tracked_companies.json", generate_tracked_companies(args.companies, args.users)),
+        ("reviews.json", generate_reviews(args.companies, args.reviews)),
+        ("job_logs.json", iter(())),
+    ]
+    summary = {}
+    for file_name, records in files:
+        start = time.perf_counter()
+        count = _write_json_array(os.path.join(args.data_dir, file_name), records)
+        summary[file_name] = count
+        print(f"📝 Wrote {count} records to {os.path.join(args.data_dir, file_name)} in {time.perf_counter() - start:.1f}s")
+
+    with open(os.path.join(args.data_dir, "bench_manifest.json"), "w") as f:
+        json.dump({"companies": args.companies, "reviews": args.reviews, "users": args.users, "records": summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
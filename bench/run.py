@@ -0,0 +1,297 @@
+"""Run the benchmark scenarios and print machine-readable results.
+
+    python -m bench.generate_data --data-dir bench_data
+    python -m bench.run --data-dir bench_data --output results.json
+
+Starts the fake RapidAPI server and the API (uvicorn) as subprocesses, drives
+the HTTP scenarios with a fixed request count and concurrency, then times a
+full fetch_reviews_for_tracked_companies run in-process. Results are a JSON
+document with throughput and latency percentiles per scenario.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from bench import synthetic
+
+SCENARIOS = ["reviews", "search", "login", "fetch"]
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    position = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[position]
+
+
+def summarize(name: str, latencies: List[float], errors: int, elapsed: float, **extra) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        **extra,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float, process: subprocess.Popen):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def load_manifest(data_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(data_dir, "bench_manifest.json")) as f:
+        return json.load(f)
+
+
+def tracked_pairs(data_dir: str) -> Dict[str, List[str]]:
+    """username -> tracked domains, from the generated tracked_companies.json"""
+    with open(os.path.join(data_dir, "tracked_companies.json")) as f:
+        pairs: Dict[str, List[str]] = {}
+        for tracked_company in json.load(f):
+            pairs.setdefault(tracked_company["user"], []).append(tracked_company["domain"])
+    return pairs
+
+
+async def drive(name: str, make_request, total: int, concurrency: int, ok_statuses=(200,), **extra) -> Dict[str, Any]:
+    """Issue `total` requests from `concurrency` workers; make_request(client, i) returns a response"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                start = time.perf_counter()
+                try:
+                    response = await make_request(client, i)
+                    if response.status_code not in ok_statuses:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return summarize(name, latencies, errors, elapsed, concurrency=concurrency, **extra)
+
+
+async def run_http_scenarios(base_url: str, scenarios: List[str], args, pairs: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    rng = random.Random(args.seed)
+    results = []
+    users = sorted(pairs)
+
+    if "reviews" in scenarios:
+        # Log in a sample of users up front; only the reads are timed
+        sample = rng.sample(users, min(args.review_users, len(users)))
+        targets = []
+        async with httpx.AsyncClient(timeout=60) as client:
+            for user in sample:
+                response = await client.post(f"{base_url}/auth/login", data={"username": user, "password": synthetic.BENCH_PASSWORD})
+                response.raise_for_status()
+                headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+                targets.extend((headers, domain) for domain in pairs[user])
+        rng.shuffle(targets)
+
+        async def get_reviews(client, i):
+            headers, domain = targets[i % len(targets)]
+            return await client.get(f"{base_url}/reviews/{domain}", params={"limit": args.page_size}, headers=headers)
+
+        results.append(await drive("reviews", get_reviews, args.requests, args.concurrency, page_size=args.page_size))
+
+    if "search" in scenarios:
+        async with httpx.AsyncClient(timeout=60) as client:
+            response = await client.post(f"{base_url}/auth/login", data={"username": users[0], "password": synthetic.BENCH_PASSWORD})
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        queries = [f"company {rng.randrange(10_000)}" for _ in range(args.search_queries)]
+
+        async def search(client, i):
+            return await client.get(f"{base_url}/companies/search", params={"query": queries[i % len(queries)]}, headers=headers)
+
+        results.append(await drive("search", search, args.requests, args.concurrency, distinct_queries=len(queries)))
+
+    if "login" in scenarios:
+        async def login(client, i):
+            return await client.post(f"{base_url}/auth/login", data={"username": users[i % len(users)], "password": synthetic.BENCH_PASSWORD})
+
+        results.append(await drive("login", login, args.login_requests, args.concurrency))
+
+    return results
+
+
+def run_fetch_scenario(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Time one full review fetch over every tracked domain, in this process"""
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    from datetime import datetime
+    from storage import init_storage
+    from services.review_index import review_index
+    from services.job_service import fetch_reviews_for_tracked_companies, get_job_history
+
+    storage = init_storage()
+    review_index.load()
+    # Make every domain due so the run covers all of them
+    now = datetime.now()
+    for tracked_domain in storage.get_tracked_domains():
+        storage.mark_domain_due(tracked_domain["domain"], now)
+
+    start = time.perf_counter()
+    fetch_reviews_for_tracked_companies()
+    elapsed = time.perf_counter() - start
+
+    job = get_job_history(1, "review_fetch")[0]
+    steps = storage.get_job_steps(job.job_id)
+    fetch_latencies = [step["fetch_ms"] / 1000 for step in steps]
+    return summarize(
+        "fetch",
+        fetch_latencies,
+        sum(1 for step in steps if step["status"] != "success"),
+        elapsed,
+        companies=job.companies_processed,
+        companies_per_second=round(job.companies_processed / elapsed, 2) if elapsed else 0.0,
+        new_reviews=job.reviews_fetched,
+        job_status=job.status,
+        fetch_concurrency=int(os.environ.get("FETCH_CONCURRENCY", 8)),
+        tracked_companies=manifest["companies"],
+    )
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark scenarios")
+    parser.add_argument("--data-dir", default="bench_data")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per reviews/search scenario")
+    parser.add_argument("--login-requests", type=int, default=200, help="Requests for the login scenario (bcrypt bound)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--review-users", type=int, default=50, help="Users whose tracked domains the reviews scenario reads")
+    parser.add_argument("--search-queries", type=int, default=200, help="Distinct search queries; fewer means more cache hits")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Fake upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--upstream-rate", type=float, default=1000, help="UPSTREAM_RATE_PER_SECOND for the API; the default keeps the limiter out of the way")
+    parser.add_argument("--startup-timeout", type=float, default=1800, help="Seconds to wait for the API (first start imports the JSON files)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results here instead of stdout")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    manifest = load_manifest(args.data_dir)
+    data_dir = os.path.abspath(args.data_dir)
+    upstream_port, api_port = free_port(), free_port()
+    env = {
+        **os.environ,
+        "DATA_DIR": data_dir,
+        "DATABASE_FILE": os.path.join(data_dir, "company_review.db"),
+        "SCHEDULER_LOCK_FILE": os.path.join(data_dir, "scheduler.lock"),
+        "RAPIDAPI_BASE_URL": f"http://127.0.0.1:{upstream_port}",
+        # Keep the API's own background jobs out of the HTTP measurements
+        "SCHEDULER_TICK_SECONDS": "86400",
+        "BACKFILL_INTERVAL_MINUTES": "1440",
+        "SCHEDULER_MAX_DOMAINS_PER_TICK": str(manifest["companies"]),
+        "UPSTREAM_RATE_PER_SECOND": str(args.upstream_rate),
+        "UPSTREAM_BURST": str(max(args.upstream_rate, 10)),
+    }
+    # The in-process fetch scenario reads its settings from the same environment
+    os.environ.update(env)
+
+    upstream = subprocess.Popen(
+        [sys.executable, "-m", "bench.fake_rapidapi", "--port", str(upstream_port),
+         "--companies", str(manifest["companies"]), "--reviews", str(manifest["reviews"]),
+         "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+         "--error-rate", str(args.error_rate), "--rate-limit-rate", str(args.rate_limit_rate), "--seed", str(args.seed)],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    results = []
+    try:
+        wait_for(f"http://127.0.0.1:{upstream_port}/", 30, upstream)
+
+        http_scenarios = [s for s in scenarios if s != "fetch"]
+        if http_scenarios:
+            api = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(api_port),
+                 "--workers", str(args.workers), "--log-level", "warning"],
+                cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL,
+            )
+            try:
+                start = time.perf_counter()
+                wait_for(f"http://127.0.0.1:{api_port}/metrics", args.startup_timeout, api)
+                results.append({"scenario": "startup", "duration_s": round(time.perf_counter() - start, 3)})
+                pairs = tracked_pairs(data_dir)
+                results.extend(asyncio.run(run_http_scenarios(f"http://127.0.0.1:{api_port}", http_scenarios, args, pairs)))
+            finally:
+                api.terminate()
+                api.wait()
+
+        if "fetch" in scenarios:
+            results.append(run_fetch_scenario(manifest))
+    finally:
+        upstream.terminate()
+        upstream.wait()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "dataset": {key: manifest[key] for key in ("companies", "reviews", "users")},
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "data_dir")},
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
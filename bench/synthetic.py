@@ -0,0 +1,109 @@
+"""Deterministic synthetic companies, users and reviews.
+
+Shared by the data generator and the fake RapidAPI server, so the reviews the
+server returns for a domain line up with what the generator stored for it:
+the stored reviews are the oldest ones, and the server has a few newer ones
+on top for the fetch job to find.
+"""
+import zlib
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+DEFAULT_COMPANIES = 10_000
+DEFAULT_REVIEWS = 1_000_000
+DEFAULT_USERS = 1_000
+# Reviews the fake server has for each domain beyond the stored ones
+DEFAULT_NEW_REVIEWS = 5
+PAGE_SIZE = 20
+BENCH_PASSWORD = "benchpass"
+
+# The newest stored review of every domain is dated here; the server's extra reviews come after it
+ANCHOR = datetime(2024, 6, 1, tzinfo=timezone.utc)
+HISTORY_SPAN = timedelta(days=4 * 365)
+WORDS = [
+    "delivery", "refund", "support", "quality", "price", "fast", "slow", "friendly", "broken", "excellent",
+    "order", "package", "service", "recommend", "never", "again", "great", "terrible", "helpful", "late",
+]
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Robin", "Avery"]
+
+
+def company_domain(index: int) -> str:
+    return f"company{index:05d}.example"
+
+
+def company_index(domain: str) -> Optional[int]:
+    if not (domain.startswith("company") and domain.endswith(".example")):
+        return None
+    try:
+        return int(domain[len("company"):-len(".example")])
+    except ValueError:
+        return None
+
+
+def company_name(index: int) -> str:
+    return f"Company {index:05d}"
+
+
+def username(index: int) -> str:
+    return f"user{index:04d}"
+
+
+def stable_hash(*parts: Any) -> int:
+    return zlib.crc32(":".join(str(p) for p in parts).encode())
+
+
+@lru_cache(maxsize=8)
+def review_counts(companies: int, total_reviews: int) -> List[int]:
+    """Stored reviews per company, Zipf-like so a few companies hold most reviews"""
+    weights = [1 / (i + 1) ** 0.8 for i in range(companies)]
+    scale = total_reviews / sum(weights)
+    counts = [int(w * scale) for w in weights]
+    # Hand the rounding remainder to the busiest companies
+    for i in range(total_reviews - sum(counts)):
+        counts[i % companies] += 1
+    return counts
+
+
+def review_interval(domain: str, stored_count: int) -> timedelta:
+    """Time between consecutive reviews of a domain, compressed so busy domains fit in HISTORY_SPAN"""
+    return min(timedelta(minutes=30 + stable_hash(domain, "interval") % 720), HISTORY_SPAN / max(stored_count, 1))
+
+
+def review(domain: str, k: int, stored_count: int) -> Dict[str, Any]:
+    """The k-th review (oldest first) of a domain with stored_count stored reviews, shaped like a stored review"""
+    h = stable_hash(domain, k)
+    words = [WORDS[(h >> shift) % len(WORDS)] for shift in (0, 5, 10, 15, 20, 25)]
+    return {
+        "id": f"{domain}-{k}",
+        "company_domain": domain,
+        "title": " ".join(words[:3]).capitalize(),
+        "content": " ".join(words * 4),
+        "rating": 1 + h % 5,
+        "date": (ANCHOR + review_interval(domain, stored_count) * (k + 1 - stored_count)).isoformat(),
+        "author": f"{FIRST_NAMES[h % len(FIRST_NAMES)]} {h % 1000}",
+    }
+
+
+def upstream_review(domain: str, k: int, stored_count: int) -> Dict[str, Any]:
+    """The k-th review of a domain in the RapidAPI payload shape"""
+    stored = review(domain, k, stored_count)
+    return {
+        "review_id": stored["id"],
+        "review_title": stored["title"],
+        "review_text": stored["content"],
+        "review_rating": stored["rating"],
+        "review_time": stored["date"],
+        "consumer_name": stored["author"],
+    }
+
+
+def upstream_company(index: int, review_count: int) -> Dict[str, Any]:
+    domain = company_domain(index)
+    return {
+        "domain": domain,
+        "name": company_name(index),
+        "website": f"https://{domain}",
+        "trust_score": round(1 + (stable_hash(domain, "score") % 40) / 10, 1),
+        "review_count": review_count,
+    }
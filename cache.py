@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from metrics import CACHE_LOOKUPS
+
+
+class TTLCache:
+    """Bounded LRU cache with per-entry TTL and single-flight loading.
+
+    Concurrent get_or_load calls for the same missing key share one loader
+    call; the other callers wait for its result.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, name: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # Named caches also report their lookups to /metrics
+        self._lookups = {result: CACHE_LOOKUPS.labels(name, result) for result in ("hit", "miss", "coalesced")} if name else None
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def _begin(self, key: Hashable):
+        """Return ("hit", value), ("wait", future) or ("load", future)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self._record("hit")
+                    return "hit", value
+                del self._entries[key]
+                self.expirations += 1
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                self._record("coalesced")
+                return "wait", future
+
+            self.misses += 1
+            self._record("miss")
+            future = Future()
+            self._in_flight[key] = future
+            return "load", future
+
+    def _record(self, result: str):
+        if self._lookups is not None:
+            self._lookups[result].inc()
+
+    def _finish(self, key: Hashable, future: Future, value: Any):
+        with self._lock:
+            del self._in_flight[key]
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        # Waiters await it shielded, but a cancelled future must not take the loader down with it
+        if not future.done():
+            future.set_result(value)
+
+    def _fail(self, key: Hashable, future: Future, error: BaseException):
+        with self._lock:
+            del self._in_flight[key]
+        if not future.done():
+            future.set_exception(error)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        state, result = self._begin(key)
+        if state == "hit":
+            return result
+        if state == "wait":
+            return result.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            self._fail(key, result, e)
+            raise
+        self._finish(key, result, value)
+        return value
+
+    async def get_or_load_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Async get_or_load; shares in-flight loads with sync callers"""
+        state, result = self._begin(key)
+        if state == "hit":
+            return result
+        if state == "wait":
+            # Cancelling the wrapper would cancel the shared future for every other waiter and the loader
+            return await asyncio.shield(asyncio.wrap_future(result))
+
+        try:
+            value = await loader()
+        except BaseException as e:
+            self._fail(key, result, e)
+            raise
+        self._finish(key, result, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            }
@@ -8,20 +8,118 @@ class Settings:
     SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-jwt-key-here-change-in-production")
     ALGORITHM = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
 
     # API key loaded successfully
     
     # API endpoints
-    COMPANY_SEARCH_URL = "https://trustpilot-company-and-reviews-data.p.rapidapi.com/company-search"
-    COMPANY_REVIEWS_URL = "https://trustpilot-company-and-reviews-data.p.rapidapi.com/company-reviews"
+    RAPIDAPI_BASE_URL = os.getenv("RAPIDAPI_BASE_URL", "https://trustpilot-company-and-reviews-data.p.rapidapi.com")  # point at bench/fake_rapidapi.py for benchmarks
+    COMPANY_SEARCH_URL = f"{RAPIDAPI_BASE_URL}/company-search"
+    COMPANY_REVIEWS_URL = f"{RAPIDAPI_BASE_URL}/company-reviews"
     
+    # Upstream fetching
+    FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", 8))
+    UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", 15))
+    ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv("ASYNC_HTTP_MAX_CONNECTIONS", 50))  # request-path client pool
+    SYNC_MAX_PAGES = int(os.getenv("SYNC_MAX_PAGES", 10))  # forward pages per domain per run
+    BACKFILL_PAGES_PER_RUN = int(os.getenv("BACKFILL_PAGES_PER_RUN", 2))  # older pages per domain per backfill run
+    BACKFILL_INTERVAL_MINUTES = int(os.getenv("BACKFILL_INTERVAL_MINUTES", 30))
+
+    # Upstream rate limiting, quota budget and circuit breaking
+    UPSTREAM_RATE_PER_SECOND = float(os.getenv("UPSTREAM_RATE_PER_SECOND", 5))  # ceiling; halves on 429, recovers on success
+    UPSTREAM_MIN_RATE_PER_SECOND = float(os.getenv("UPSTREAM_MIN_RATE_PER_SECOND", 0.2))
+    UPSTREAM_BURST = float(os.getenv("UPSTREAM_BURST", 10))
+    UPSTREAM_INTERACTIVE_RESERVE_TOKENS = float(os.getenv("UPSTREAM_INTERACTIVE_RESERVE_TOKENS", 2))  # burst tokens background fetches leave for search
+    UPSTREAM_MONTHLY_QUOTA = int(os.getenv("UPSTREAM_MONTHLY_QUOTA", 0))  # 0 = learn it from RapidAPI's x-ratelimit-requests-* headers
+    UPSTREAM_QUOTA_RESET_DAY = int(os.getenv("UPSTREAM_QUOTA_RESET_DAY", 1))  # day of month the billing period starts (1-28)
+    UPSTREAM_INTERACTIVE_QUOTA_SHARE = float(os.getenv("UPSTREAM_INTERACTIVE_QUOTA_SHARE", 0.1))  # share of the quota background fetches never spend
+    UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", 3))
+    UPSTREAM_INTERACTIVE_RETRIES = int(os.getenv("UPSTREAM_INTERACTIVE_RETRIES", 1))
+    UPSTREAM_BACKOFF_BASE_SECONDS = float(os.getenv("UPSTREAM_BACKOFF_BASE_SECONDS", 0.5))
+    UPSTREAM_BACKOFF_MAX_SECONDS = float(os.getenv("UPSTREAM_BACKOFF_MAX_SECONDS", 10))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))  # consecutive failures before failing fast
+    CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("CIRCUIT_COOLDOWN_SECONDS", 30))
+
+    # Adaptive fetch scheduling
+    SCHEDULER_TICK_SECONDS = int(os.getenv("SCHEDULER_TICK_SECONDS", 60))
+    SCHEDULER_MAX_DOMAINS_PER_TICK = int(os.getenv("SCHEDULER_MAX_DOMAINS_PER_TICK", 200))
+    FETCH_MIN_INTERVAL_MINUTES = float(os.getenv("FETCH_MIN_INTERVAL_MINUTES", 5))
+    FETCH_MAX_INTERVAL_MINUTES = float(os.getenv("FETCH_MAX_INTERVAL_MINUTES", 360))
+    FETCH_BACKOFF_FACTOR = float(os.getenv("FETCH_BACKOFF_FACTOR", 1.5))
+    TARGET_NEW_REVIEWS_PER_FETCH = float(os.getenv("TARGET_NEW_REVIEWS_PER_FETCH", 5))
+
+    # Durable fetch queue: each due domain becomes a task, leased by one fetch worker at a time and checkpointed per page
+    FETCH_QUEUE_INLINE = os.getenv("FETCH_QUEUE_INLINE", "True").lower() == "true"  # the scheduler leader drains the queue itself; False leaves it to fetch_worker.py
+    FETCH_TASK_LEASE_SECONDS = float(os.getenv("FETCH_TASK_LEASE_SECONDS", 120))  # a task not checkpointed for this long goes to another worker
+    FETCH_TASK_MAX_ATTEMPTS = int(os.getenv("FETCH_TASK_MAX_ATTEMPTS", 3))  # before the domain waits for its next scheduled fetch
+    FETCH_TASK_RETRY_SECONDS = float(os.getenv("FETCH_TASK_RETRY_SECONDS", 30))  # first retry delay, doubling per attempt
+    FETCH_TASK_TIMEOUT_SECONDS = float(os.getenv("FETCH_TASK_TIMEOUT_SECONDS", 300))  # a sync still paging after this long is requeued from its checkpoint; 0 = no limit
+    FETCH_WORKER_PROCESSES = int(os.getenv("FETCH_WORKER_PROCESSES", 2))  # default for python fetch_worker.py
+    FETCH_WORKER_POLL_SECONDS = float(os.getenv("FETCH_WORKER_POLL_SECONDS", 5))  # how often idle fetch workers check the queue
+
+    # Company search cache
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 1024))
+    SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", 600))
+
+    # Encoded review pages, keyed by ETag so new reviews never serve a stale page
+    REVIEW_PAGE_CACHE_SIZE = int(os.getenv("REVIEW_PAGE_CACHE_SIZE", 512))
+    REVIEW_PAGE_CACHE_TTL_SECONDS = int(os.getenv("REVIEW_PAGE_CACHE_TTL_SECONDS", 300))
+
+    # Bulk endpoints
+    BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 1000))  # changes per bulk track call, domains per latest-reviews call
+
+    # Full-text review search (the index is built at startup and kept in memory)
+    REVIEW_SEARCH_ENABLED = os.getenv("REVIEW_SEARCH_ENABLED", "True").lower() == "true"
+
+    # Review change feed (Server-Sent Events)
+    REVIEW_FEED_BUFFER_SIZE = int(os.getenv("REVIEW_FEED_BUFFER_SIZE", 10000))  # recent events kept in memory for resuming clients
+    REVIEW_FEED_CATCHUP_BATCH = int(os.getenv("REVIEW_FEED_CATCHUP_BATCH", 500))  # rows per storage read for clients further behind
+    REVIEW_FEED_HEARTBEAT_SECONDS = float(os.getenv("REVIEW_FEED_HEARTBEAT_SECONDS", 15))
+
+    # Review enrichment: lexicon sentiment and keyword tagging, scored in worker processes off the fetch path
+    ENRICHMENT_ENABLED = os.getenv("ENRICHMENT_ENABLED", "False").lower() == "true"
+    ENRICHMENT_WORKERS = int(os.getenv("ENRICHMENT_WORKERS", 2))  # scoring processes
+    ENRICHMENT_BATCH_SIZE = int(os.getenv("ENRICHMENT_BATCH_SIZE", 500))  # reviews per task handed to a process
+    ENRICHMENT_INTERVAL_SECONDS = float(os.getenv("ENRICHMENT_INTERVAL_SECONDS", 30))  # backlog check when the fetch job has not signalled new reviews
+    ENRICHMENT_MAX_KEYWORDS = int(os.getenv("ENRICHMENT_MAX_KEYWORDS", 5))
+    ENRICHMENT_LEXICON_FILE = os.getenv("ENRICHMENT_LEXICON_FILE", "")  # "word valence" lines replacing the built-in lexicon
+
+    # Review retention: recent reviews stay hot (index and reviews table), older ones move to compressed archive segments
+    REVIEW_HOT_WINDOW_DAYS = int(os.getenv("REVIEW_HOT_WINDOW_DAYS", 365))  # 0 = keep every review hot
+    UNTRACKED_REVIEWS_POLICY = os.getenv("UNTRACKED_REVIEWS_POLICY", "archive")  # archive, purge or keep reviews of domains nobody tracks
+    REVIEW_ARCHIVE_SEGMENT_SIZE = int(os.getenv("REVIEW_ARCHIVE_SEGMENT_SIZE", 5000))  # reviews per compressed segment
+    COMPACTION_INTERVAL_HOURS = float(os.getenv("COMPACTION_INTERVAL_HOURS", 24))
+
+    # Job history retention
+    JOB_LOG_MAX_ENTRIES = int(os.getenv("JOB_LOG_MAX_ENTRIES", 1000))
+    JOB_LOG_MAX_AGE_DAYS = int(os.getenv("JOB_LOG_MAX_AGE_DAYS", 30))
+
     # Data storage paths
-    DATA_DIR = "data"
+    DATA_DIR = os.getenv("DATA_DIR", "data")
     USERS_FILE = os.path.join(DATA_DIR, "users.json")
     TRACKED_COMPANIES_FILE = os.path.join(DATA_DIR, "tracked_companies.json")
     REVIEWS_FILE = os.path.join(DATA_DIR, "reviews.json")
     LOGS_FILE = os.path.join(DATA_DIR, "job_logs.json")
 
+    # Storage backend (legacy JSON files above are imported once on startup)
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+    DATABASE_FILE = os.getenv("DATABASE_FILE", os.path.join(DATA_DIR, "company_review.db"))
+
+    # Multi-worker coordination
+    SCHEDULER_LOCK_FILE = os.getenv("SCHEDULER_LOCK_FILE", os.path.join(DATA_DIR, "scheduler.lock"))
+    LEADER_RETRY_SECONDS = int(os.getenv("LEADER_RETRY_SECONDS", 15))  # how often followers try to take over
+    INDEX_REFRESH_SECONDS = int(os.getenv("INDEX_REFRESH_SECONDS", 5))  # how often workers pick up other workers' writes
+
+    # Logging
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text, or json for one object per line with correlation IDs as fields
+    LOG_FILE = os.getenv("LOG_FILE", os.path.join("logs", "app.log"))  # empty = console only
+    LOG_ENQUEUE = os.getenv("LOG_ENQUEUE", "True").lower() == "true"  # write from a background thread so callers never wait on the console or disk
+    LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0.1))  # share of requests and per-company job steps whose detail lines are kept
+    LOG_DETAIL_RATE_PER_SECOND = float(os.getenv("LOG_DETAIL_RATE_PER_SECOND", 20))  # detail lines per call site, after sampling
+    LOG_FULL_DETAIL = os.getenv("LOG_FULL_DETAIL", "False").lower() == "true"  # keep every detail line and show variables in tracebacks
+
     # Server settings
     DEBUG = os.getenv("DEBUG", "False").lower() == "true"
     PORT = int(os.getenv("PORT", 8000))
@@ -0,0 +1,68 @@
+"""Standalone fetch workers draining the durable fetch task queue.
+
+    python fetch_worker.py [--processes N]
+
+The scheduler leader queues a task for every due domain each tick. With
+FETCH_QUEUE_INLINE=False it leaves the fetching to these processes, which
+lease tasks from the same database, so upstream fetching scales out of the
+API workers. A worker that dies mid-task loses nothing committed: its lease
+expires and the next worker resumes the task from its last checkpoint.
+"""
+import argparse
+import multiprocessing
+import time
+from loguru import logger
+
+from config import settings
+from services.job_service import drain_fetch_queue, fetch_run_status, worker_name
+from storage import init_storage
+from upstream import upstream_policy
+
+
+def run_worker(processes: int):
+    """Body of one worker process: drain the queue, wait for more work, repeat"""
+    init_storage()
+    # Every process has its own limiter and budget; together they keep to the configured ones
+    upstream_policy.share_with(processes)
+    worker = worker_name()
+    logger.info(f"🛠️ Fetch worker {worker} started")
+    try:
+        while True:
+            outcomes, new_reviews = drain_fetch_queue(worker)
+            tasks = sum(outcomes.values())
+            if tasks:
+                logger.info(f"✅ Fetch worker {worker} ran {tasks} tasks ({fetch_run_status(outcomes)}), {new_reviews} new reviews")
+            if not tasks or outcomes.get("error"):
+                # Nothing due, or storage is failing: wait rather than spin
+                time.sleep(settings.FETCH_WORKER_POLL_SECONDS)
+    except KeyboardInterrupt:
+        # A task cut short here is retried from its checkpoint once its lease expires
+        logger.info(f"👋 Fetch worker {worker} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run fetch worker processes that drain the review fetch queue")
+    parser.add_argument("--processes", type=int, default=settings.FETCH_WORKER_PROCESSES, help="worker processes to run")
+    args = parser.parse_args()
+
+    # Migrate once here rather than racing in every child
+    init_storage()
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=run_worker, args=(args.processes,), name=f"fetch-worker-{i}") for i in range(args.processes)]
+    for worker in workers:
+        worker.start()
+    logger.info(f"🚀 Started {args.processes} fetch worker processes")
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        # Tasks cut short are retried from their checkpoints once their leases expire
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+        logger.info("👋 Fetch workers stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import fcntl
+import os
+from typing import Optional
+from loguru import logger
+
+from config import settings
+
+
+class SchedulerLease:
+    """Exclusive lease on the background jobs, held by one worker process at a time.
+
+    Backed by a non-blocking flock on SCHEDULER_LOCK_FILE. The kernel drops
+    the lock when the holding process exits or crashes, so another worker can
+    take over on its next attempt.
+    """
+
+    def __init__(self, lock_path: str):
+        self.lock_path = lock_path
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        """Try to take the lease without waiting; returns whether this process holds it"""
+        if self._fd is not None:
+            return True
+
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+
+        # Record the holder for operators; the lock itself is what counts
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        logger.info(f"👑 Worker {os.getpid()} acquired the scheduler lease")
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+        logger.info(f"👋 Worker {os.getpid()} released the scheduler lease")
+
+
+scheduler_lease = SchedulerLease(settings.SCHEDULER_LOCK_FILE)
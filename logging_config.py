@@ -0,0 +1,242 @@
+import contextlib
+import contextvars
+import functools
+import multiprocessing
+import multiprocessing.context
+import os
+import sys
+import threading
+import time
+import traceback
+import uuid
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+import orjson
+from loguru import logger
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+from metrics import LOG_LINES_DROPPED
+
+# Correlation IDs, added to every log record made while they are set
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+job_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("job_id", default=None)
+
+# Per-request and per-company lines: sampled and rate limited unless LOG_FULL_DETAIL is on
+detail_logger = logger.bind(detail=True)
+
+TEXT_FILE_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level} | {name}:{function}:{line} | {message}"
+TEXT_CONSOLE_FORMAT = "<green>{time:HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{message}</cyan>"
+INTERNAL_EXTRA = ("detail", "drop", "json")
+MAX_REQUEST_ID_LENGTH = 64
+WARNING_LEVEL = 30  # warnings and errors are never sampled
+POOL_WORKER_PREFIX = "pool-worker"
+
+
+def current_job_id() -> str:
+    """ID of the job run in progress, or a fresh one outside a job context"""
+    return job_id_var.get() or str(uuid.uuid4())
+
+
+@contextlib.contextmanager
+def job_scope(job_type: str, job_id: Optional[str] = None):
+    """Run a block under a job ID (a fresh one unless given), shown on every log line it makes"""
+    token = job_id_var.set(job_id or str(uuid.uuid4()))
+    try:
+        with logger.contextualize(job_type=job_type):
+            yield
+    finally:
+        job_id_var.reset(token)
+
+
+def job_context(job_type: str):
+    """Decorator running a background job with its own job ID on every log line it makes"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with job_scope(job_type):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class DetailSampler:
+    """Decides once per record whether a detail line is kept.
+
+    Whole requests and whole per-company job steps are kept or dropped
+    together, by hashing their correlation ID against LOG_SAMPLE_RATE, so a
+    kept request can still be followed from start to finish. Kept lines are
+    then capped per call site at LOG_DETAIL_RATE_PER_SECOND.
+    """
+
+    def __init__(self, sample_rate: float, rate_per_second: float):
+        self.threshold = int(sample_rate * 10000)
+        self.rate = rate_per_second
+        self._lock = threading.Lock()
+        # call site -> [tokens, last refill, lines dropped since the last kept one]
+        self._sites: Dict[Tuple[str, int], list] = {}
+
+    def sampled(self, key: Optional[str]) -> bool:
+        return key is None or zlib.crc32(key.encode()) % 10000 < self.threshold
+
+    def allow(self, site: Tuple[str, int]) -> Tuple[bool, int]:
+        """Take a token for a call site; returns whether the line may go out and how many were dropped before it"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._sites.get(site)
+            if bucket is None:
+                bucket = self._sites[site] = [self.rate, now, 0]
+            bucket[0] = min(self.rate, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False, 0
+            bucket[0] -= 1
+            dropped, bucket[2] = bucket[2], 0
+            return True, dropped
+
+    def __call__(self, record: Dict[str, Any]):
+        """Patcher: runs once per record, before any sink, and marks dropped lines"""
+        extra = record["extra"]
+        request_id, job_id = request_id_var.get(), job_id_var.get()
+        if request_id is not None:
+            extra["request_id"] = request_id
+        if job_id is not None:
+            extra["job_id"] = job_id
+        if not extra.get("detail") or settings.LOG_FULL_DETAIL or record["level"].no >= WARNING_LEVEL:
+            return
+
+        key = request_id or (f"{job_id}:{extra.get('domain', '')}" if job_id else None)
+        if not self.sampled(key):
+            extra["drop"] = True
+            LOG_LINES_DROPPED.labels("sampled").inc()
+            return
+        allowed, dropped = self.allow((record["name"], record["line"]))
+        if not allowed:
+            extra["drop"] = True
+            LOG_LINES_DROPPED.labels("rate_limited").inc()
+        elif dropped:
+            extra["suppressed"] = dropped
+
+
+def _keep(record: Dict[str, Any]) -> bool:
+    return not record["extra"].get("drop")
+
+
+def _json_format(record: Dict[str, Any]) -> str:
+    """One JSON object per line; loguru substitutes the pre-encoded object into the template"""
+    payload = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+    }
+    payload.update((key, value) for key, value in record["extra"].items() if key not in INTERNAL_EXTRA)
+    if record["exception"] is not None:
+        payload["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    record["extra"]["json"] = orjson.dumps(payload, default=str).decode()
+    return "{extra[json]}\n"
+
+
+def _text_format(base: str) -> Callable[[Dict[str, Any]], str]:
+    def format_record(record: Dict[str, Any]) -> str:
+        extra = record["extra"]
+        suffix = ""
+        if "request_id" in extra:
+            suffix += " | request={extra[request_id]}"
+        if "job_id" in extra:
+            suffix += " | job={extra[job_id]}"
+        if "suppressed" in extra:
+            suffix += " | +{extra[suppressed]} similar lines suppressed"
+        return base + suffix + "\n{exception}"
+    return format_record
+
+
+class PoolWorkerProcess(multiprocessing.context.SpawnProcess):
+    """Spawned process for helper pools (e.g. enrichment scoring).
+
+    Spawned children re-import the main module, and with it the
+    configure_logging() call in main.py. The name is set before that import
+    runs, so configure_logging can tell these apart from API workers, which
+    uvicorn --workers and --reload also spawn.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.name = f"{POOL_WORKER_PREFIX}-{self.name}"
+
+
+class PoolWorkerContext(multiprocessing.context.SpawnContext):
+    Process = PoolWorkerProcess
+
+
+def configure_logging():
+    """Replace loguru's default handler with the console and file sinks chosen in settings"""
+    # Pool workers keep loguru's default handler rather than opening the file sink and a queue thread each
+    if multiprocessing.current_process().name.startswith(POOL_WORKER_PREFIX):
+        return
+
+    logger.remove()
+    logger.configure(patcher=DetailSampler(settings.LOG_SAMPLE_RATE, settings.LOG_DETAIL_RATE_PER_SECOND))
+    json_output = settings.LOG_FORMAT == "json"
+    common = dict(
+        level=settings.LOG_LEVEL,
+        filter=_keep,
+        # Formatting stays on the calling thread; console and disk writes move to a background thread
+        enqueue=settings.LOG_ENQUEUE,
+        backtrace=settings.LOG_FULL_DETAIL,
+        # Variable values in tracebacks are slow to render and can leak secrets, so only when debugging
+        diagnose=settings.LOG_FULL_DETAIL,
+    )
+
+    if settings.LOG_FILE:
+        os.makedirs(os.path.dirname(settings.LOG_FILE) or ".", exist_ok=True)
+        logger.add(
+            settings.LOG_FILE,
+            rotation="10 MB",
+            retention="7 days",
+            format=_json_format if json_output else _text_format(TEXT_FILE_FORMAT),
+            **common
+        )
+    logger.add(
+        sys.stdout,
+        format=_json_format if json_output else _text_format(TEXT_CONSOLE_FORMAT),
+        colorize=not json_output,
+        **common
+    )
+
+
+class RequestIdMiddleware:
+    """ASGI middleware giving every request a correlation ID.
+
+    An incoming X-Request-ID is reused so IDs carry across services, otherwise
+    one is generated; either way it is echoed in the response.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:MAX_REQUEST_ID_LENGTH]
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_with_request_id(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
@@ -5,44 +5,79 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from loguru import logger
 
+from storage import init_storage
 from services.auth_service import create_default_user
-from services.job_service import fetch_reviews_for_tracked_companies
+from services.review_index import review_index
+from services.review_enrichment import review_enricher
+from services.job_service import fetch_reviews_for_tracked_companies, backfill_reviews_for_tracked_companies, compact_reviews
 from routes.auth import router as auth_router
 from routes.company import router as company_router
 from routes.review import router as review_router
+from routes.job import router as job_router
+from routes.metrics import router as metrics_router
+from leader import scheduler_lease
+from metrics import MetricsMiddleware
+from logging_config import RequestIdMiddleware, configure_logging
+from responses import FastJSONResponse
 from config import settings
+from utils import close_async_http_client
 
-# Create logs directory if it doesn't exist
-import os
-os.makedirs("logs", exist_ok=True)
-
-# Configure loguru logging
-logger.add(
-    "logs/app.log",
-    rotation="10 MB",
-    retention="7 days",
-    level="INFO",
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {name}:{function}:{line} | {message}",
-    backtrace=True,
-    diagnose=True
-)
-
-# Add console logger with emoji formatting
-logger.add(
-    lambda msg: print(msg, end=""),
-    level="INFO",
-    format="<green>{time:HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{message}</cyan>",
-    colorize=True
-)
+# Console and file sinks, JSON or text, written from a background thread
+configure_logging()
 
 # Background scheduler for automatic review fetching
 scheduler = BackgroundScheduler()
 
+def schedule_fetch_jobs():
+    """Add the review fetching jobs; only called in the worker holding the scheduler lease"""
+    # Tick the review fetcher often; each tick only fetches domains whose adaptive schedule is due
+    scheduler.add_job(
+        fetch_reviews_for_tracked_companies,
+        trigger=IntervalTrigger(seconds=settings.SCHEDULER_TICK_SECONDS),
+        id="review_fetcher",
+        name="Fetch reviews for tracked companies that are due",
+        replace_existing=True
+    )
+    logger.info(f"📊 Scheduled review fetching job to check for due companies every {settings.SCHEDULER_TICK_SECONDS} seconds")
+
+    # Walk older review pages at a lower frequency
+    scheduler.add_job(
+        backfill_reviews_for_tracked_companies,
+        trigger=IntervalTrigger(minutes=settings.BACKFILL_INTERVAL_MINUTES),
+        id="review_backfill",
+        name="Backfill older reviews for tracked companies",
+        replace_existing=True
+    )
+    logger.info(f"🕰️ Scheduled review backfill job to run every {settings.BACKFILL_INTERVAL_MINUTES} minutes")
+
+    # Keep the hot tier bounded: archive old reviews and clear out untracked domains
+    scheduler.add_job(
+        compact_reviews,
+        trigger=IntervalTrigger(hours=settings.COMPACTION_INTERVAL_HOURS),
+        id="review_compaction",
+        name="Archive old reviews and untracked domains",
+        replace_existing=True
+    )
+    logger.info(f"🧹 Scheduled review compaction job to run every {settings.COMPACTION_INTERVAL_HOURS} hours")
+
+    # Score new and backlogged reviews in worker processes, off the fetch path
+    if settings.ENRICHMENT_ENABLED:
+        review_enricher.start()
+        logger.info(f"🏷️ Review enrichment started with {settings.ENRICHMENT_WORKERS} worker processes")
+
+def elect_leader():
+    """Take the scheduler lease if it is free and start the fetch jobs in this worker"""
+    if scheduler_lease.acquire():
+        schedule_fetch_jobs()
+        scheduler.remove_job("leader_election")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Starting Company Review Monitor API")
-    logger.info("📁 Data will be stored in JSON files in the 'data/' directory")
+    init_storage()
+    logger.info(f"📁 Data will be stored in {settings.DATABASE_FILE} ({settings.STORAGE_BACKEND})")
+    review_index.load()
 
     create_default_user()
     logger.info("✅ Default user created: admin/admin123")
@@ -50,33 +85,53 @@ async def lifespan(app: FastAPI):
     scheduler.start()
     logger.info("⏰ Background scheduler started")
 
-    # Schedule review fetching job every 5 minutes
+    # Every worker keeps its index in step with writes made by the others
     scheduler.add_job(
-        fetch_reviews_for_tracked_companies,
-        trigger=IntervalTrigger(minutes=5),
-        id="review_fetcher",
-        name="Fetch reviews for tracked companies every 5 minutes",
+        review_index.refresh,
+        trigger=IntervalTrigger(seconds=settings.INDEX_REFRESH_SECONDS),
+        id="review_index_refresh",
+        name="Refresh the review index from storage",
+        replace_existing=True
+    )
+
+    # Only the worker holding the scheduler lease runs the fetch jobs; the rest keep trying to take over
+    scheduler.add_job(
+        elect_leader,
+        trigger=IntervalTrigger(seconds=settings.LEADER_RETRY_SECONDS),
+        id="leader_election",
+        name="Acquire the scheduler lease",
+        next_run_time=datetime.now(),
         replace_existing=True
     )
-    logger.info("📊 Scheduled review fetching job to run every 5 minutes")
 
     yield
 
     # Shutdown
     logger.info("🛑 Shutting down Company Review Monitor API")
     scheduler.shutdown()
+    review_enricher.stop()
+    scheduler_lease.release()
     logger.info("✅ Background scheduler stopped")
+    await close_async_http_client()
 
 app = FastAPI(
     title="Company Review Monitor API",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Per-route latency and in-flight requests for /metrics
+app.add_middleware(MetricsMiddleware)
+# Correlation ID on every log line made while serving a request
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(company_router)
 app.include_router(review_router)
+app.include_router(job_router)
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,307 @@
+import threading
+from bisect import bisect_left
+import time
+from contextlib import ContextDecorator
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond storage reads to slow upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named metric family with a fixed set of label names.
+
+    Children for each combination of label values are created on first use
+    and live for the lifetime of the process.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class CallbackGauge(Metric):
+    """Gauge whose samples are computed at scrape time, keyed by label values"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], callback: Callable[[], Dict[LabelValues, float]]):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self):
+        for key, value in self.callback().items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class _Timer(ContextDecorator):
+    def __init__(self, child: "_HistogramValue"):
+        self.child = child
+
+    def _recreate_cm(self):
+        # Used as a decorator, each call gets its own start time
+        return _Timer(self.child)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            position = bisect_left(self.buckets, value)
+            if position < len(self.counts):
+                self.counts[position] += 1
+
+    def time(self) -> _Timer:
+        """Context manager or decorator observing the elapsed seconds"""
+        return _Timer(self)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(float(bound))))} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# HTTP API
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to serve an API request, until the response body is sent",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "API requests currently being served", ["method", "route"])
+
+# Upstream RapidAPI calls
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "upstream_request_duration_seconds", "RapidAPI call latency by endpoint (search or reviews) and status code",
+    ["endpoint", "status"],
+)
+UPSTREAM_RETRIES = Counter("upstream_retries_total", "RapidAPI calls retried after a 429, 5xx or transport error", ["endpoint"])
+UPSTREAM_RATE_LIMIT = Gauge("upstream_rate_limit_per_second", "Current adaptive RapidAPI request rate limit")
+UPSTREAM_QUOTA_REMAINING = Gauge("upstream_quota_remaining", "RapidAPI calls left in the billing period, as last reported or counted")
+UPSTREAM_CIRCUIT_OPEN = Gauge("upstream_circuit_open", "1 while RapidAPI calls are short-circuited after repeated failures")
+
+# Storage
+STORAGE_OPERATION_DURATION = Histogram(
+    "storage_operation_duration_seconds", "Storage backend call duration by operation", ["operation"],
+)
+STORAGE_BYTES = Counter(
+    "storage_bytes_total", "Approximate payload bytes read from or written to storage", ["operation", "direction"],
+)
+
+# Background jobs
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Background job run duration", ["job_type", "status"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+JOB_NEW_REVIEWS = Histogram(
+    "job_new_reviews", "New reviews stored per background job run", ["job_type"],
+    buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000),
+)
+JOB_COMPANIES_PER_SECOND = Gauge(
+    "job_companies_per_second", "Companies processed per second in the latest background job run", ["job_type"],
+)
+FETCH_TASKS = Counter(
+    "fetch_tasks_total", "Fetch queue tasks run by this process, by outcome (done, failed, retried, deferred, timeout, lost, error)", ["outcome"],
+)
+REVIEWS_COMPACTED = Counter("reviews_compacted_total", "Hot reviews moved to the archive or purged by compaction", ["action"])
+
+# Review enrichment
+REVIEWS_ENRICHED = Counter("reviews_enriched_total", "Reviews scored by the enrichment stage, by source (backlog or reenrich)", ["source"])
+REVIEW_ENRICHMENT_BACKLOG = Gauge("review_enrichment_backlog", "Stored reviews the enrichment stage has not reached yet")
+
+# Review change feed
+REVIEW_FEED_SUBSCRIBERS = Gauge("review_feed_subscribers", "Clients connected to the review change feed")
+REVIEW_FEED_EVENTS = Counter("review_feed_events_total", "Review events sent to feed subscribers, by source (live or catchup)", ["source"])
+
+# Logging
+LOG_LINES_DROPPED = Counter("log_lines_dropped_total", "Detail log lines dropped, by reason (sampled or rate_limited)", ["reason"])
+
+# Caches
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by cache and result (hit, miss, coalesced)", ["cache", "result"])
+
+
+def _cache_hit_ratios() -> Dict[LabelValues, float]:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), child in list(CACHE_LOOKUPS._children.items()):
+        hits_and_total = totals.setdefault(cache, [0.0, 0.0])
+        if result != "miss":
+            hits_and_total[0] += child.value
+        hits_and_total[1] += child.value
+    return {(cache,): round(hits / total, 4) for cache, (hits, total) in totals.items() if total}
+
+
+CACHE_HIT_RATIO = CallbackGauge(
+    "cache_hit_ratio", "Share of cache lookups served without loading (hits and coalesced waits)", ["cache"], _cache_hit_ratios,
+)
+
+
+def payload_bytes(rows: Iterable[Sequence]) -> int:
+    """Rough size of row values: string lengths plus 8 bytes per other value"""
+    return sum(len(v) if isinstance(v, str) else 8 for row in rows for v in row)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and in-flight requests.
+
+    Requests are labelled with the route template (e.g. /reviews/{domain}) so
+    label cardinality stays bounded; unknown paths share one label.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    def _route_path(self, scope: Scope) -> str:
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method, route = scope["method"], self._route_path(scope)
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_DURATION.labels(method, route, status).observe(time.perf_counter() - start)
+            in_flight.dec()
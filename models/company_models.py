@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class Company(BaseModel):
@@ -15,3 +15,24 @@ class TrackedCompany(BaseModel):
     name: str
     added_at: datetime
     user: str
+
+class TrackedDomain(BaseModel):
+    domain: str
+    name: str
+    subscribers: int
+    latest_added_at: datetime
+
+class BulkTrackRequest(BaseModel):
+    track: List[Company] = []
+    untrack: List[str] = []  # domains
+
+class BulkTrackResult(BaseModel):
+    domain: str
+    action: str  # track, untrack
+    status: str  # tracked, already_tracked, untracked, not_tracked, invalid
+    detail: Optional[str] = None
+
+class BulkTrackResponse(BaseModel):
+    results: List[BulkTrackResult]  # track items first, then untrack items, each in request order
+    tracked: int
+    untracked: int
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class JobLog(BaseModel):
@@ -11,3 +11,35 @@ class JobLog(BaseModel):
     error_message: Optional[str] = None
     companies_processed: Optional[int] = 0
     reviews_fetched: Optional[int] = 0
+
+class JobStep(BaseModel):
+    job_id: str
+    domain: str
+    status: str  # success, error
+    started_at: datetime
+    fetch_ms: float
+    store_ms: float
+    new_reviews: int = 0
+
+class JobLogDetail(JobLog):
+    steps: List[JobStep] = []
+
+class FetchQueueStatus(BaseModel):
+    """Fetch tasks by status; done and failed ones are kept as long as their run's job log"""
+    pending: int = 0  # including tasks waiting to be retried
+    leased: int = 0
+    done: int = 0
+    failed: int = 0
+
+class DomainSyncState(BaseModel):
+    domain: str
+    last_review_time: Optional[datetime] = None  # watermark: newest review we have stored
+    last_review_id: Optional[str] = None
+    backfill_page: int = 2  # next older page for the backfill job to walk
+    backfill_complete: bool = False
+    updated_at: Optional[datetime] = None
+    # Adaptive scheduling
+    next_due_at: Optional[datetime] = None
+    interval_seconds: Optional[float] = None
+    review_velocity: float = 0.0  # smoothed new reviews per hour
+    last_checked_at: Optional[datetime] = None
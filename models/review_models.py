@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+from typing import Dict, List, Optional
 
 class Review(BaseModel):
     id: str
@@ -9,3 +10,64 @@ class Review(BaseModel):
     rating: int
     date: datetime
     author: str
+    # Set by the enrichment stage some time after ingest; None until then or when it is disabled
+    sentiment: Optional[float] = None  # -1 (negative) to 1 (positive)
+    sentiment_label: Optional[str] = None  # positive, neutral, negative
+    keywords: Optional[List[str]] = None
+
+class ReviewQuery(BaseModel):
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    min_rating: Optional[int] = None
+    max_rating: Optional[int] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    sort: str = "newest"  # newest, oldest
+    fields: Optional[List[str]] = None
+    sentiment: Optional[str] = None  # positive, neutral, negative
+    keyword: Optional[str] = None
+
+class LatestReviewsRequest(BaseModel):
+    domains: List[str]
+    limit: int = Field(10, ge=1, le=100)  # newest reviews per domain
+
+class LatestReviews(BaseModel):
+    reviews: Dict[str, List[Review]]  # domain -> newest first
+    untracked: List[str]  # requested domains the user does not track
+
+class ReviewSearchQuery(BaseModel):
+    q: str
+    domain: Optional[str] = None  # one of the caller's tracked domains; all of them when omitted
+    min_rating: Optional[int] = None
+    max_rating: Optional[int] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    sentiment: Optional[str] = None  # positive, neutral, negative
+    keyword: Optional[str] = None
+    sort: str = "relevance"  # relevance, newest
+    limit: int = 20
+    offset: int = 0
+
+class ReviewSearchHit(Review):
+    score: float
+
+class RollingRating(BaseModel):
+    days: int
+    count: int
+    average_rating: Optional[float] = None
+
+class ReviewSeriesPoint(BaseModel):
+    period_start: date
+    count: int
+    average_rating: Optional[float] = None
+
+class ReviewAnalytics(BaseModel):
+    domain: str
+    total_reviews: int
+    average_rating: Optional[float] = None
+    rating_histogram: Dict[int, int]  # stars -> number of reviews
+    first_review_at: Optional[datetime] = None
+    last_review_at: Optional[datetime] = None
+    rolling: List[RollingRating]  # 7, 30 and 90 days up to today
+    bucket: str  # day, week, month
+    series: List[ReviewSeriesPoint]  # oldest period first, ending with the current one
@@ -0,0 +1,24 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from utils import json_dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson.
+
+    Routes can return their pydantic models wrapped in this response to skip
+    FastAPI's response_model validation; the response_model on the route still
+    documents the schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
+class PreEncodedJSONResponse(JSONResponse):
+    """JSON response whose body was encoded ahead of time, e.g. from a cache"""
+
+    def render(self, content: bytes) -> bytes:
+        return content
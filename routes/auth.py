@@ -2,16 +2,17 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from loguru import logger
 
-from services.auth_service import authenticate_user, create_access_token
+from logging_config import detail_logger
+from services.auth_service import authenticate_user_async, create_access_token
 from models.auth_models import Token
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 @router.post("/login", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    logger.info(f"🔐 Login attempt for user: {form_data.username}")
+    detail_logger.info(f"🔐 Login attempt for user: {form_data.username}")
 
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user_async(form_data.username, form_data.password)
     if not user:
         logger.warning(f"❌ Failed login attempt for user: {form_data.username}")
         raise HTTPException(
@@ -21,7 +22,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
         )
 
     access_token = create_access_token(data={"sub": user.username})
-    logger.success(f"✅ Successful login for user: {form_data.username}")
+    detail_logger.success(f"✅ Successful login for user: {form_data.username}")
     return {
         "access_token": access_token,
         "token_type": "bearer",
@@ -1,34 +1,48 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from loguru import logger
+from typing import Any, Dict, List
 
-from services.company_service import search_companies, track_company, get_tracked_companies
+from logging_config import detail_logger
+from services.company_service import search_companies_async, track_company_async, bulk_update_tracking_async, get_tracked_companies_async, get_search_cache_stats
 from services.auth_service import get_current_active_user
-from models.company_models import Company, TrackedCompany
+from models.company_models import BulkTrackRequest, BulkTrackResponse, Company, TrackedCompany
 from models.auth_models import User
+from responses import FastJSONResponse
 
 router = APIRouter(prefix="/companies", tags=["companies"])
 
 @router.get("/search", response_model=List[Company])
 async def search_companies_endpoint(query: str, current_user: User = Depends(get_current_active_user)):
     """Search for companies by query"""
-    logger.info(f"🔍 Company search request from user '{current_user.username}': '{query}'")
-    companies = search_companies(query)
-    logger.info(f"📊 Found {len(companies)} companies for query: '{query}'")
-    return companies
+    detail_logger.info(f"🔍 Company search request from user '{current_user.username}': '{query}'")
+    companies = await search_companies_async(query)
+    detail_logger.info(f"📊 Found {len(companies)} companies for query: '{query}'")
+    return FastJSONResponse(companies)
+
+@router.get("/search/cache-stats")
+async def search_cache_stats_endpoint(current_user: User = Depends(get_current_active_user)) -> Dict[str, Any]:
+    """Get company search cache counters"""
+    return get_search_cache_stats()
 
 @router.post("/track", response_model=TrackedCompany)
 async def track_company_endpoint(company: Company, current_user: User = Depends(get_current_active_user)):
     """Add a company to tracking list"""
-    logger.info(f"➕ Tracking request from user '{current_user.username}' for company: {company.name} ({company.domain})")
-    tracked_company = track_company(company, current_user.username)
-    logger.success(f"✅ Successfully added company '{tracked_company.name}' to tracking for user '{current_user.username}'")
+    detail_logger.info(f"➕ Tracking request from user '{current_user.username}' for company: {company.name} ({company.domain})")
+    tracked_company = await track_company_async(company, current_user.username)
+    detail_logger.success(f"✅ Successfully added company '{tracked_company.name}' to tracking for user '{current_user.username}'")
     return tracked_company
 
+@router.post("/track/bulk", response_model=BulkTrackResponse)
+async def bulk_track_endpoint(request: BulkTrackRequest, current_user: User = Depends(get_current_active_user)):
+    """Track and untrack many companies in one transaction"""
+    detail_logger.info(f"📦 Bulk tracking request from user '{current_user.username}': {len(request.track)} to track, {len(request.untrack)} to untrack")
+    response = await bulk_update_tracking_async(request, current_user.username)
+    detail_logger.success(f"✅ Bulk tracking for user '{current_user.username}': {response.tracked} tracked, {response.untracked} untracked")
+    return FastJSONResponse(response)
+
 @router.get("/tracked", response_model=List[TrackedCompany])
 async def get_tracked_companies_endpoint(current_user: User = Depends(get_current_active_user)):
     """Get all tracked companies for the current user"""
-    logger.info(f"📋 Request for tracked companies from user: '{current_user.username}'")
-    tracked_companies = get_tracked_companies(current_user.username)
-    logger.info(f"📊 User '{current_user.username}' has {len(tracked_companies)} tracked companies")
-    return tracked_companies
+    detail_logger.info(f"📋 Request for tracked companies from user: '{current_user.username}'")
+    tracked_companies = await get_tracked_companies_async(current_user.username)
+    detail_logger.info(f"📊 User '{current_user.username}' has {len(tracked_companies)} tracked companies")
+    return FastJSONResponse(tracked_companies)
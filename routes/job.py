@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+
+from logging_config import detail_logger
+from services.job_service import get_current_job_async, get_job_history_async, get_job_async, get_fetch_queue_status_async
+from services.auth_service import get_current_active_user
+from models.job_models import FetchQueueStatus, JobLog, JobLogDetail
+from models.auth_models import User
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+@router.get("/current", response_model=JobLog)
+async def get_current_job_endpoint(current_user: User = Depends(get_current_active_user)):
+    """Get the review fetch run currently in progress"""
+    job_log = await get_current_job_async()
+    if job_log is None:
+        raise HTTPException(status_code=404, detail="No job running")
+    return job_log
+
+@router.get("/history", response_model=List[JobLog])
+async def get_job_history_endpoint(
+    limit: int = Query(20, ge=1, le=500),
+    job_type: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get recent job runs, newest first"""
+    detail_logger.info(f"📋 Job history request from user '{current_user.username}'")
+    return await get_job_history_async(limit, job_type)
+
+@router.get("/queue", response_model=FetchQueueStatus)
+async def get_fetch_queue_endpoint(current_user: User = Depends(get_current_active_user)):
+    """Get the number of review fetch tasks in each state"""
+    return await get_fetch_queue_status_async()
+
+@router.get("/{job_id}", response_model=JobLogDetail)
+async def get_job_endpoint(job_id: str, current_user: User = Depends(get_current_active_user)):
+    """Get a job run with per-company step timings"""
+    job_log = await get_job_async(job_id)
+    if job_log is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_log
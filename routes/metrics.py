@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from metrics import REGISTRY
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus metrics for this worker process"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
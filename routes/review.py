@@ -1,18 +1,174 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from loguru import logger
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import List, Literal, Optional
+import asyncio
 
-from services.review_service import get_reviews
+from logging_config import detail_logger
+from services.review_service import encode_reviews, etag_matches, get_archived_reviews_async, get_domain_reviews_async, get_latest_reviews_async, get_review_analytics_async, query_reviews, render_reviews_page_async, review_etag, search_reviews_async, stream_review_events, validate_fields
 from services.auth_service import get_current_active_user
-from models.review_models import Review
+from models.review_models import LatestReviews, LatestReviewsRequest, Review, ReviewAnalytics, ReviewQuery, ReviewSearchHit, ReviewSearchQuery
 from models.auth_models import User
+from responses import FastJSONResponse, PreEncodedJSONResponse
+from utils import json_dumps
 
 router = APIRouter(prefix="/reviews", tags=["reviews"])
 
+# Declared before /{domain} so "search" is not taken for a domain
+@router.get("/search", response_model=List[ReviewSearchHit])
+async def search_reviews_endpoint(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in review titles and content; all must match"),
+    domain: Optional[str] = Query(None, description="Limit to one tracked domain"),
+    min_rating: Optional[int] = Query(None, ge=1, le=5),
+    max_rating: Optional[int] = Query(None, ge=1, le=5),
+    since: Optional[datetime] = Query(None, description="Only reviews posted at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only reviews posted at or before this time"),
+    sentiment: Optional[Literal["positive", "neutral", "negative"]] = Query(None, description="Only reviews the enrichment stage labelled this way"),
+    keyword: Optional[str] = Query(None, description="Only reviews the enrichment stage tagged with this keyword"),
+    sort: Literal["relevance", "newest"] = "relevance",
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Search reviews of the current user's tracked companies"""
+    detail_logger.info(f"🔎 Review search from user '{current_user.username}': '{q}'")
+    query = ReviewSearchQuery(q=q, domain=domain, min_rating=min_rating, max_rating=max_rating, since=since, until=until, sentiment=sentiment, keyword=keyword, sort=sort, limit=limit, offset=offset)
+    hits, total = await search_reviews_async(current_user.username, query)
+    headers = {"X-Total-Count": str(total)}
+    if offset + len(hits) < total:
+        headers["X-Next-Offset"] = str(offset + len(hits))
+    detail_logger.info(f"📊 Review search '{q}' matched {total} reviews for user '{current_user.username}'")
+    return FastJSONResponse(hits, headers=headers)
+
+@router.get("/feed", response_class=StreamingResponse)
+async def review_feed_endpoint(
+    since: Optional[int] = Query(None, ge=0, description="Resume after this event id; Last-Event-ID takes precedence"),
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Server-Sent Events stream of newly stored reviews for the current user's tracked companies"""
+    if last_event_id is not None:
+        try:
+            since = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    detail_logger.info(f"📡 Review feed opened by user '{current_user.username}'" + (f", resuming after {since}" if since is not None else ""))
+    return StreamingResponse(
+        stream_review_events(current_user.username, since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/latest", response_model=LatestReviews)
+async def get_latest_reviews_endpoint(request: LatestReviewsRequest, current_user: User = Depends(get_current_active_user)):
+    """Get the newest reviews for many tracked company domains at once"""
+    detail_logger.info(f"📚 Latest reviews request from user '{current_user.username}' for {len(request.domains)} domains")
+    latest = await get_latest_reviews_async(request, current_user.username)
+    detail_logger.info(f"📊 Returned latest reviews for {len(latest.reviews)} domains to user '{current_user.username}'")
+    return FastJSONResponse(latest)
+
 @router.get("/{domain}", response_model=List[Review])
-async def get_reviews_endpoint(domain: str, current_user: User = Depends(get_current_active_user)):
+async def get_reviews_endpoint(
+    domain: str,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to return every matching review"),
+    cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    min_rating: Optional[int] = Query(None, ge=1, le=5),
+    max_rating: Optional[int] = Query(None, ge=1, le=5),
+    since: Optional[datetime] = Query(None, description="Only reviews posted at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only reviews posted at or before this time"),
+    sentiment: Optional[Literal["positive", "neutral", "negative"]] = Query(None, description="Only reviews the enrichment stage labelled this way"),
+    keyword: Optional[str] = Query(None, description="Only reviews the enrichment stage tagged with this keyword"),
+    sort: Literal["newest", "oldest"] = "newest",
+    fields: Optional[str] = Query(None, description="Comma-separated review fields to return"),
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson streams one review per line"),
+    current_user: User = Depends(get_current_active_user)
+):
     """Get reviews for a specific company domain"""
-    logger.info(f"📖 Reviews request from user '{current_user.username}' for domain: {domain}")
-    reviews = get_reviews(domain, current_user.username)
-    logger.info(f"📊 Returned {len(reviews)} reviews for domain '{domain}' to user '{current_user.username}'")
-    return reviews
+    detail_logger.info(f"📖 Reviews request from user '{current_user.username}' for domain: {domain}")
+
+    query = ReviewQuery(
+        limit=limit,
+        cursor=cursor,
+        min_rating=min_rating,
+        max_rating=max_rating,
+        since=since,
+        until=until,
+        sentiment=sentiment,
+        keyword=keyword,
+        sort=sort,
+        fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    )
+    validate_fields(query.fields)
+
+    domain_reviews = await get_domain_reviews_async(domain, current_user.username)
+
+    # Unchanged polls get a 304 without running the query
+    etag = review_etag(domain, domain_reviews, query, format)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        detail_logger.info(f"📭 Reviews for domain '{domain}' unchanged for user '{current_user.username}'")
+        return Response(status_code=304, headers=headers)
+
+    if format == "ndjson":
+        reviews, next_cursor = await asyncio.to_thread(query_reviews, domain_reviews, query)
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        detail_logger.info(f"📊 Returned {len(reviews)} reviews for domain '{domain}' to user '{current_user.username}'")
+        include = set(query.fields) if query.fields else None
+        lines = (json_dumps(review.dict(include=include)) + b"\n" for review in reviews)
+        return StreamingResponse(lines, media_type="application/x-ndjson", headers=headers)
+
+    # The body is encoded straight from the indexed reviews, without response_model revalidation
+    body, next_cursor, count = await render_reviews_page_async(domain_reviews, query, etag)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    detail_logger.info(f"📊 Returned {count} reviews for domain '{domain}' to user '{current_user.username}'")
+    return PreEncodedJSONResponse(body, headers=headers)
+
+@router.get("/{domain}/archive", response_model=List[Review])
+async def get_archived_reviews_endpoint(
+    domain: str,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to return every matching review"),
+    cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    min_rating: Optional[int] = Query(None, ge=1, le=5),
+    max_rating: Optional[int] = Query(None, ge=1, le=5),
+    since: Optional[datetime] = Query(None, description="Only reviews posted at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only reviews posted at or before this time"),
+    sentiment: Optional[Literal["positive", "neutral", "negative"]] = Query(None, description="Only reviews the enrichment stage labelled this way"),
+    keyword: Optional[str] = Query(None, description="Only reviews the enrichment stage tagged with this keyword"),
+    sort: Literal["newest", "oldest"] = "newest",
+    fields: Optional[str] = Query(None, description="Comma-separated review fields to return"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get archived reviews, those older than the hot window, for a specific company domain"""
+    detail_logger.info(f"🗄️ Archived reviews request from user '{current_user.username}' for domain: {domain}")
+    query = ReviewQuery(
+        limit=limit,
+        cursor=cursor,
+        min_rating=min_rating,
+        max_rating=max_rating,
+        since=since,
+        until=until,
+        sentiment=sentiment,
+        keyword=keyword,
+        sort=sort,
+        fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    )
+    validate_fields(query.fields)
+
+    reviews, next_cursor = await get_archived_reviews_async(domain, current_user.username, query)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    detail_logger.info(f"📊 Returned {len(reviews)} archived reviews for domain '{domain}' to user '{current_user.username}'")
+    return PreEncodedJSONResponse(encode_reviews(reviews, query.fields), headers=headers)
+
+@router.get("/{domain}/analytics", response_model=ReviewAnalytics)
+async def get_review_analytics_endpoint(
+    domain: str,
+    bucket: Literal["day", "week", "month"] = Query("week", description="Period length of the series"),
+    periods: int = Query(12, ge=1, le=366, description="Number of periods in the series, ending with the current one"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get rating counts, histogram, rolling averages and a time series for a company domain"""
+    detail_logger.info(f"📈 Analytics request from user '{current_user.username}' for domain: {domain}")
+    return FastJSONResponse(await get_review_analytics_async(domain, current_user.username, bucket, periods))
@@ -1,32 +1,86 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from datetime import datetime, timedelta
+import asyncio
+import threading
+import time
 from loguru import logger
 
-from utils import verify_password, get_password_hash, create_access_token, decode_token, read_json_file, write_json_file
+from utils import verify_password_async, get_password_hash, create_access_token, decode_token_claims
 from config import settings
+from metrics import CACHE_LOOKUPS
 from models.auth_models import UserInDB
+from storage import get_storage
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# In-memory user directory, invalidated whenever a user is written
+_user_cache: Dict[str, UserInDB] = {}
+# Decoded token claims: token -> (username, expiry as unix time)
+_token_cache: Dict[str, Tuple[str, float]] = {}
+_cache_lock = threading.Lock()
+_user_cache_hits, _user_cache_misses = CACHE_LOOKUPS.labels("users", "hit"), CACHE_LOOKUPS.labels("users", "miss")
+_token_cache_hits, _token_cache_misses = CACHE_LOOKUPS.labels("tokens", "hit"), CACHE_LOOKUPS.labels("tokens", "miss")
+
 def get_user(username: str) -> Optional[UserInDB]:
-    users_data = read_json_file(settings.USERS_FILE)
-    for user_data in users_data:
-        if user_data["username"] == username:
-            return UserInDB(**user_data)
-    return None
+    user = _user_cache.get(username)
+    if user is not None:
+        _user_cache_hits.inc()
+        return user
+    _user_cache_misses.inc()
+    user_data = get_storage().get_user(username)
+    if user_data is None:
+        return None
+    user = UserInDB(**user_data)
+    with _cache_lock:
+        _user_cache[username] = user
+    return user
 
-def authenticate_user(username: str, password: str):
-    user = get_user(username)
+def invalidate_user(username: str):
+    with _cache_lock:
+        _user_cache.pop(username, None)
+
+def get_token_username(token: str) -> Optional[str]:
+    """Decode a JWT once and reuse its claims until the token expires"""
+    now = time.time()
+    cached = _token_cache.get(token)
+    if cached is not None:
+        username, expires_at = cached
+        if expires_at > now:
+            _token_cache_hits.inc()
+            return username
+        with _cache_lock:
+            _token_cache.pop(token, None)
+        return None
+
+    _token_cache_misses.inc()
+    payload = decode_token_claims(token)
+    if payload is None:
+        return None
+
+    with _cache_lock:
+        if len(_token_cache) >= settings.TOKEN_CACHE_SIZE:
+            # Drop expired tokens first, then the oldest entries
+            for expired in [t for t, (_, exp) in _token_cache.items() if exp <= now]:
+                del _token_cache[expired]
+            while len(_token_cache) >= settings.TOKEN_CACHE_SIZE:
+                del _token_cache[next(iter(_token_cache))]
+        _token_cache[token] = (payload["sub"], float(payload.get("exp", now)))
+    return payload["sub"]
+
+async def authenticate_user_async(username: str, password: str):
+    """Check a username and password without blocking the event loop: the user lookup
+    runs in a worker thread and bcrypt on the password executor"""
+    user = await asyncio.to_thread(get_user, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
     return user
 
 def get_current_user(token: str = Depends(oauth2_scheme)):
-    username = decode_token(token)
+    username = get_token_username(token)
     if username is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -48,8 +102,8 @@ def get_current_active_user(current_user: UserInDB = Depends(get_current_user)):
     return current_user
 
 def create_default_user():
-    users_data = read_json_file(settings.USERS_FILE)
-    if not any(user["username"] == "admin" for user in users_data):
+    storage = get_storage()
+    if storage.get_user("admin") is None:
         default_user = UserInDB(
             username="admin",
             email="admin@example.com",
@@ -57,6 +111,6 @@ def create_default_user():
             hashed_password=get_password_hash("admin123"),
             disabled=False
         )
-        users_data.append(default_user.dict())
-        write_json_file(settings.USERS_FILE, users_data)
+        storage.add_user(default_user.dict())
+        invalidate_user(default_user.username)
         logger.success("✅ Default user created: admin/admin123")
@@ -1,23 +1,40 @@
 from fastapi import HTTPException
-from typing import List
+from typing import Any, Dict, List
+import asyncio
+import httpx
+import requests
+from loguru import logger
 
-from utils import search_companies as search_companies_api, read_json_file, write_json_file
+from cache import TTLCache
 from config import settings
-from models.company_models import Company, TrackedCompany
+from upstream import UpstreamError
+from utils import async_fetch_companies as async_fetch_companies_api
+from models.company_models import BulkTrackRequest, BulkTrackResponse, BulkTrackResult, Company, TrackedCompany
+from services.review_index import review_index
+from storage import get_storage, trusted_model
 from datetime import datetime
 
-def search_companies(query: str) -> List[Company]:
-    """Search for companies using the Trustpilot API"""
-    return search_companies_api(query)
+# Search results keyed by normalized query; identical concurrent queries share one upstream call
+search_cache = TTLCache(max_size=settings.SEARCH_CACHE_SIZE, ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS, name="search")
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+async def search_companies_async(query: str) -> List[Company]:
+    """Search for companies without blocking the event loop"""
+    normalized = normalize_query(query)
+    try:
+        return await search_cache.get_or_load_async(normalized, lambda: async_fetch_companies_api(normalized))
+    except (httpx.HTTPError, requests.RequestException, UpstreamError) as e:
+        logger.error(f"❌ Error searching companies: {e}")
+        return []
+
+def get_search_cache_stats() -> Dict[str, Any]:
+    """Hit, miss and eviction counters for the company search cache"""
+    return search_cache.stats()
 
 def track_company(company: Company, username: str) -> TrackedCompany:
     """Add a company to tracking list"""
-    tracked_companies = read_json_file(settings.TRACKED_COMPANIES_FILE)
-    
-    # Check if company is already tracked by this user
-    if any(tc["domain"] == company.domain and tc["user"] == username for tc in tracked_companies):
-        raise HTTPException(status_code=400, detail="Company already tracked")
-    
     tracked_company = TrackedCompany(
         domain=company.domain,
         name=company.name,
@@ -25,13 +42,69 @@ def track_company(company: Company, username: str) -> TrackedCompany:
         user=username
     )
     
-    tracked_companies.append(tracked_company.dict())
-    write_json_file(settings.TRACKED_COMPANIES_FILE, tracked_companies)
+    # (user, domain) is the primary key, so a duplicate insert is a no-op
+    if not get_storage().add_tracked_company(tracked_company.dict()):
+        raise HTTPException(status_code=400, detail="Company already tracked")
+    review_index.set_tracked(username, company.domain)
+    # A new subscriber bumps an already-tracked domain to the front of the fetch schedule
+    get_storage().mark_domain_due(company.domain, tracked_company.added_at)
     
     return tracked_company
 
+def bulk_update_tracking(request: BulkTrackRequest, username: str) -> BulkTrackResponse:
+    """Track and untrack many companies in one storage transaction, with a result per item"""
+    if len(request.track) + len(request.untrack) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BULK_MAX_ITEMS} changes per request")
+
+    now = datetime.now()
+    to_track = [c for c in request.track if c.domain.strip()]
+    to_untrack = [domain for domain in request.untrack if domain.strip()]
+    added, removed = get_storage().update_tracked_companies(
+        username,
+        [TrackedCompany(domain=c.domain, name=c.name, added_at=now, user=username).dict() for c in to_track],
+        to_untrack,
+    )
+    added_by_company = iter(added)
+    removed_by_domain = iter(removed)
+
+    results = []
+    for company in request.track:
+        if not company.domain.strip():
+            results.append(BulkTrackResult(domain=company.domain, action="track", status="invalid", detail="Empty domain"))
+        elif next(added_by_company):
+            review_index.set_tracked(username, company.domain)
+            results.append(BulkTrackResult(domain=company.domain, action="track", status="tracked"))
+        else:
+            results.append(BulkTrackResult(domain=company.domain, action="track", status="already_tracked"))
+    for domain in request.untrack:
+        if not domain.strip():
+            results.append(BulkTrackResult(domain=domain, action="untrack", status="invalid", detail="Empty domain"))
+        elif next(removed_by_domain):
+            review_index.set_tracked(username, domain, tracked=False)
+            results.append(BulkTrackResult(domain=domain, action="untrack", status="untracked"))
+        else:
+            results.append(BulkTrackResult(domain=domain, action="untrack", status="not_tracked"))
+
+    return BulkTrackResponse(
+        results=results,
+        tracked=sum(1 for r in results if r.status == "tracked"),
+        untracked=sum(1 for r in results if r.status == "untracked"),
+    )
+
 def get_tracked_companies(username: str) -> List[TrackedCompany]:
     """Get all tracked companies for a specific user"""
-    tracked_companies = read_json_file(settings.TRACKED_COMPANIES_FILE)
-    user_tracked = [TrackedCompany(**tc) for tc in tracked_companies if tc["user"] == username]
+    tracked_companies = get_storage().get_tracked_companies(username)
+    user_tracked = [trusted_model(TrackedCompany, tc, ("added_at",)) for tc in tracked_companies]
     return user_tracked
+
+async def track_company_async(company: Company, username: str) -> TrackedCompany:
+    """Add a company to tracking list, with the storage write off the event loop"""
+    return await asyncio.to_thread(track_company, company, username)
+
+async def bulk_update_tracking_async(request: BulkTrackRequest, username: str) -> BulkTrackResponse:
+    """Bulk track/untrack, with the storage transaction off the event loop"""
+    return await asyncio.to_thread(bulk_update_tracking, request, username)
+
+async def get_tracked_companies_async(username: str) -> List[TrackedCompany]:
+    """Get tracked companies for a user, with the storage read off the event loop"""
+    return await asyncio.to_thread(get_tracked_companies, username)
@@ -1,105 +1,489 @@
+import asyncio
+import os
+import socket
+import threading
+import time
 import uuid
-from datetime import datetime
-from typing import List
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import requests
 from loguru import logger
 
-from utils import get_company_reviews, read_json_file, write_json_file
+from utils import fetch_review_page
+from logging_config import current_job_id, detail_logger, job_context, job_scope
+from upstream import UpstreamError, upstream_policy
 from config import settings
-from models.job_models import JobLog
+from models.company_models import TrackedDomain
+from models.job_models import JobLog, JobLogDetail, JobStep, DomainSyncState, FetchQueueStatus
 from models.review_models import Review
+from services.review_index import review_index
+from services.review_enrichment import review_enricher
+from services.schedule_service import select_due_domains, plan_next_fetch, plan_retry
+from storage import get_storage
+from metrics import FETCH_TASKS, JOB_COMPANIES_PER_SECOND, JOB_DURATION, JOB_NEW_REVIEWS, REVIEWS_COMPACTED
 
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def _record_job_metrics(job_type: str, status: str, duration: float, companies_processed: int, new_reviews: int):
+    JOB_DURATION.labels(job_type, status).observe(duration)
+    JOB_NEW_REVIEWS.labels(job_type).observe(new_reviews)
+    JOB_COMPANIES_PER_SECOND.labels(job_type).set(companies_processed / duration if duration > 0 else 0.0)
+
+def hot_window_start() -> Optional[date]:
+    """First day of the hot review window, or None when every review stays hot"""
+    if settings.REVIEW_HOT_WINDOW_DAYS <= 0:
+        return None
+    return (datetime.now(timezone.utc) - timedelta(days=settings.REVIEW_HOT_WINDOW_DAYS)).date()
+
+def worker_name() -> str:
+    """How this process appears as a fetch task lease owner"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _known_review_ids(domain: str) -> Set[str]:
+    # Fetch worker processes have no review index and ask storage instead
+    return review_index.review_ids(domain) if review_index.loaded else get_storage().get_review_ids(domain)
+
+class SyncTimeout(Exception):
+    """A domain sync passed its deadline between pages; the pages before it stay committed"""
+
+
+def sync_domain(domain: str, state: Optional[DomainSyncState], checkpoint: Dict[str, Any], commit_page: Callable[[List[Review], Dict[str, Any]], bool],
+                deadline: Optional[float] = None) -> Optional[bool]:
+    """Page forward from the newest reviews until we reach ones we already have.
+
+    Each page's unseen reviews are handed to commit_page with the checkpoint
+    to store alongside them, so a retried task resumes at the page after the
+    last one committed. Returns whether we reached known reviews (or the end
+    of the listing) within SYNC_MAX_PAGES, or None if the lease was lost.
+    Fetch errors propagate; pages committed before them stay committed, and
+    so do those before SyncTimeout, raised when the time.monotonic() deadline
+    has passed before a page after the first.
+    """
+    if checkpoint.get("caught_up") is not None:
+        # Every page was committed before the last attempt stopped; only closing the task is left
+        return checkpoint["caught_up"]
+    # Reviews an earlier attempt committed do not count as known, or the resumed sync would stop at them
+    task_ids = set(checkpoint.get("review_ids", ()))
+    known_ids = _known_review_ids(domain) - task_ids
+    watermark = _as_utc(state.last_review_time) if state and state.last_review_time else None
+
+    first_page = checkpoint.get("page", 1)
+    for page in range(first_page, settings.SYNC_MAX_PAGES + 1):
+        if deadline is not None and page > first_page and time.monotonic() >= deadline:
+            raise SyncTimeout(f"Sync of {domain} timed out before page {page}")
+        page_reviews = fetch_review_page(domain, page=page)
+        fresh, reached_known = [], False
+        for review in page_reviews:
+            if review.id in known_ids or (watermark is not None and _as_utc(review.date) < watermark):
+                reached_known = True
+            elif review.id not in task_ids:
+                task_ids.add(review.id)
+                fresh.append(review)
+
+        newest = checkpoint.get("newest")
+        for review in fresh:
+            if newest is None or _as_utc(review.date) >= _as_utc(datetime.fromisoformat(newest[0])):
+                newest = [review.date.isoformat(), review.id]
+        # Stop at the end of the listing or once we reach reviews we already have.
+        # A brand new domain only needs its first page here; the backfill job walks the rest
+        caught_up = not page_reviews or reached_known or (not known_ids and watermark is None)
+        checkpoint = {
+            "page": page + 1,
+            "review_ids": sorted(task_ids),
+            "newest": newest,
+            "new_reviews": checkpoint.get("new_reviews", 0) + len(fresh),
+            "caught_up": True if caught_up else (False if page == settings.SYNC_MAX_PAGES else None),
+        }
+        if not commit_page(fresh, checkpoint):
+            return None
+        if caught_up:
+            return True
+
+    return False
+
+def update_sync_state(state: DomainSyncState, new_review_count: int, newest: Optional[Tuple[datetime, str]], caught_up: bool) -> List[str]:
+    """Advance the domain watermark and schedule its next fetch; returns the sync state columns to persist"""
+    if newest is not None:
+        newest_time, newest_id = newest
+        if state.last_review_time is None or _as_utc(newest_time) >= _as_utc(state.last_review_time):
+            state.last_review_time = newest_time
+            state.last_review_id = newest_id
+    if not caught_up:
+        # Forward sync hit its page cap before reaching known reviews; let backfill cover the gap
+        logger.warning(f"⚠️ {state.domain} has more than {settings.SYNC_MAX_PAGES} pages of new reviews, handing the rest to backfill")
+        state.backfill_page = min(state.backfill_page, settings.SYNC_MAX_PAGES + 1)
+        state.backfill_complete = False
+    now = datetime.now()
+    plan_next_fetch(state, new_review_count, now)
+    state.updated_at = now
+    # Leave the backfill cursor to the backfill job unless we just moved it
+    return [c for c in state.dict() if not caught_up or c not in ("backfill_page", "backfill_complete")]
+
+def run_fetch_task(task: Dict[str, Any]) -> Tuple[str, int]:
+    """Sync a leased task's domain from its checkpoint on, then close or requeue the task.
+
+    Returns the outcome (done, failed, retried, deferred, timeout or lost) and the
+    number of new reviews stored on this attempt.
+    """
+    storage = get_storage()
+    domain, lease = task["domain"], task["lease_owner"]
+    company_log = detail_logger.bind(domain=domain)
+    record = storage.get_sync_state(domain)
+    state = DomainSyncState(**record) if record else DomainSyncState(domain=domain)
+    progress = dict(task["checkpoint"])
+    stored = 0
+    store_ms = 0.0
+    lost = False
+    started_at = datetime.now()
+    start = time.perf_counter()
+
+    def commit_page(reviews: List[Review], checkpoint: Dict[str, Any]) -> bool:
+        nonlocal stored, store_ms, lost
+        store_start = time.perf_counter()
+        inserted = storage.checkpoint_fetch_task(task["id"], lease, checkpoint, [r.dict() for r in reviews], settings.FETCH_TASK_LEASE_SECONDS)
+        if inserted is None:
+            lost = True
+            return False
+        progress.clear()
+        progress.update(checkpoint)
+        if inserted:
+            stored += inserted
+            if review_index.loaded:
+                review_index.add_reviews(domain, reviews)
+                # Push them to change feed subscribers now rather than on the next index refresh
+                review_index.refresh(blocking=False)
+            review_enricher.notify()
+        store_ms += (time.perf_counter() - store_start) * 1000
+        return True
+
+    def finish(caught_up: bool = True, error: Optional[str] = None) -> bool:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        step = JobStep(
+            job_id=task["job_id"],
+            domain=domain,
+            status="error" if error else "success",
+            started_at=started_at,
+            fetch_ms=round(elapsed_ms - store_ms, 2),
+            store_ms=round(store_ms, 2),
+            new_reviews=progress.get("new_reviews", 0),
+        )
+        if error:
+            plan_retry(state, datetime.now())
+            columns = ["next_due_at"]
+            if progress.get("new_reviews"):
+                # The watermark stays put, so the next sync stops at the pages committed here; backfill covers what lay beyond them
+                state.backfill_page = min(state.backfill_page, progress["page"])
+                state.backfill_complete = False
+                columns += ["backfill_page", "backfill_complete"]
+        else:
+            newest = progress.get("newest")
+            columns = update_sync_state(
+                state, progress.get("new_reviews", 0), (datetime.fromisoformat(newest[0]), newest[1]) if newest else None, caught_up
+            )
+        return storage.finish_fetch_task(task["id"], lease, step.dict(), state.dict(), columns, error)
+
+    if task["attempts"] > settings.FETCH_TASK_MAX_ATTEMPTS:
+        # Its last lease expired without the task closing, e.g. because the worker crashed each time
+        logger.warning(f"⚠️ Giving up on {domain} after {task['attempts'] - 1} attempts")
+        return ("failed" if finish(error=task["last_error"] or "Lease expired") else "lost"), 0
+    if progress:
+        company_log.info(f"⏯️ Resuming {domain} at page {progress.get('page')} (attempt {task['attempts']})")
+
+    deadline = time.monotonic() + settings.FETCH_TASK_TIMEOUT_SECONDS if settings.FETCH_TASK_TIMEOUT_SECONDS > 0 else None
+    try:
+        caught_up = sync_domain(domain, state, progress, commit_page, deadline)
+    except SyncTimeout as e:
+        # Every page fetched so far is committed, so the task resumes where it stopped without using up an attempt
+        logger.warning(f"⚠️ Requeueing {domain}: {e}")
+        retry_at = datetime.now() + timedelta(seconds=settings.FETCH_TASK_RETRY_SECONDS)
+        return ("timeout" if storage.retry_fetch_task(task["id"], lease, str(e), retry_at, count_attempt=False) else "lost"), stored
+    except UpstreamError as e:
+        # The circuit is open or the budget is spent: not the task's fault, so the attempt is handed back
+        logger.warning(f"⚠️ Requeueing {domain}: {e}")
+        retry_at = datetime.now() + timedelta(seconds=settings.CIRCUIT_COOLDOWN_SECONDS)
+        return ("deferred" if storage.retry_fetch_task(task["id"], lease, str(e), retry_at, count_attempt=False) else "lost"), stored
+    except (requests.RequestException, ValueError, KeyError) as e:
+        # Committed pages stay; the watermark only moves once the task completes, so the retry leaves no gap
+        logger.error(f"❌ Error fetching page {progress.get('page', 1)} of reviews for {domain}: {e}")
+        if task["attempts"] < settings.FETCH_TASK_MAX_ATTEMPTS:
+            retry_at = datetime.now() + timedelta(seconds=settings.FETCH_TASK_RETRY_SECONDS * 2 ** (task["attempts"] - 1))
+            return ("retried" if storage.retry_fetch_task(task["id"], lease, str(e), retry_at) else "lost"), stored
+        logger.warning(f"⚠️ Failed to fetch reviews for {domain} after {task['attempts']} attempts")
+        return ("failed" if finish(error=str(e)) else "lost"), stored
+
+    if caught_up is None or lost or not finish(caught_up):
+        logger.warning(f"⚠️ Lease on {domain} expired and went to another worker; leaving the task to it")
+        return "lost", stored
+    if stored:
+        company_log.info(f"✨ Found {stored} new reviews for {domain}")
+    else:
+        company_log.info(f"📭 No new reviews found for {domain}")
+    return "done", stored
+
+def drain_fetch_queue(worker: str, stop: Optional[threading.Event] = None) -> Tuple[Dict[str, int], int]:
+    """Lease and run fetch tasks one at a time until none are due.
+
+    Returns the tasks run by outcome and the new reviews they stored. Each
+    task's log lines carry the job ID of the run that queued it. An unexpected
+    error, e.g. from storage, hands the task back and stops the drain; the
+    remaining tasks wait for the next one.
+    """
+    storage = get_storage()
+    outcomes: Dict[str, int] = Counter()
+    stored = 0
+    while not (stop and stop.is_set()) and not upstream_policy.breaker.is_open:
+        try:
+            # A lease is ours alone, so a slow attempt that lost its lease cannot close a retry of it
+            task = storage.lease_fetch_task(f"{worker}:{uuid.uuid4().hex[:8]}", settings.FETCH_TASK_LEASE_SECONDS)
+        except Exception as e:
+            logger.error(f"❌ Could not lease a fetch task: {e}")
+            outcomes["error"] += 1
+            break
+        if task is None:
+            break
+        with job_scope("review_fetch", task["job_id"]):
+            try:
+                outcome, new_reviews = run_fetch_task(task)
+            except Exception as e:
+                logger.error(f"❌ Fetch task for {task['domain']} failed unexpectedly: {e}")
+                outcome, new_reviews = "error", 0
+                _hand_back_fetch_task(task, str(e))
+        FETCH_TASKS.labels(outcome).inc()
+        outcomes[outcome] += 1
+        stored += new_reviews
+        if outcome == "error":
+            break
+    return outcomes, stored
+
+def _hand_back_fetch_task(task: Dict[str, Any], error: str):
+    """Requeue a task whose attempt raised; if storage is failing too, its lease expiring does the same"""
+    retry_at = datetime.now() + timedelta(seconds=settings.FETCH_TASK_RETRY_SECONDS)
+    try:
+        get_storage().retry_fetch_task(task["id"], task["lease_owner"], error, retry_at)
+    except Exception as e:
+        logger.error(f"❌ Could not requeue the fetch task for {task['domain']}, leaving it to its lease expiry: {e}")
+
+def fetch_run_status(outcomes: Dict[str, int]) -> str:
+    """error if any task failed, partial if some were handed back unfinished, success otherwise"""
+    if outcomes.get("failed") or outcomes.get("error"):
+        return "error"
+    if outcomes.get("retried") or outcomes.get("deferred") or outcomes.get("timeout") or outcomes.get("lost"):
+        return "partial"
+    return "success"
+
+@job_context("review_fetch")
 def fetch_reviews_for_tracked_companies():
-    """Background job to fetch reviews for all tracked companies"""
-    job_id = str(uuid.uuid4())
-    job_log = JobLog(
-        job_id=job_id,
-        job_type="review_fetch",
-        status="running",
-        start_time=datetime.now(),
-        companies_processed=0,
-        reviews_fetched=0
-    )
-
-    logger.info(f"🚀 Starting background job {job_id} - Review fetching")
-    logger.info("📊 Background job will fetch reviews for all tracked companies")
-
-    # Read current logs and add new job
-    logs = read_json_file(settings.LOGS_FILE)
-    logs.append(job_log.dict())
-    write_json_file(settings.LOGS_FILE, logs)
+    """Background job queueing a fetch task for each tracked company that is due, then draining the queue"""
+    storage = get_storage()
+    # One entry per distinct domain, newest subscription first, so a domain
+    # tracked by many users is only fetched once per run
+    tracked_domains = [TrackedDomain(**d) for d in storage.get_tracked_domains()]
+    sync_states = {domain: DomainSyncState(**state) for domain, state in storage.get_sync_states().items()}
+    due_domains = select_due_domains(tracked_domains, sync_states, datetime.now())
+    if upstream_policy.breaker.is_open:
+        logger.warning(f"⚠️ RapidAPI circuit is open, leaving {len(due_domains)} due domains for a later tick")
+        return
+    # Each domain costs at least one call; the rest wait for the budget to accrue
+    budget = upstream_policy.budget.background_calls_available()
+    if budget is not None and budget < len(due_domains):
+        logger.warning(f"⚠️ Monthly quota budget allows {budget} calls now, deferring {len(due_domains) - budget} due domains")
+        due_domains = due_domains[:budget]
+
+    run_start = time.perf_counter()
+    if due_domains:
+        # The run's log lines carry the same ID as its job history entry
+        job_id = current_job_id()
+        job_log = JobLog(
+            job_id=job_id,
+            job_type="review_fetch",
+            status="running",
+            start_time=datetime.now(),
+            companies_processed=0,
+            reviews_fetched=0
+        )
+        interrupted = storage.mark_interrupted_job_logs("review_fetch")
+        if interrupted:
+            logger.warning(f"⚠️ Marked {interrupted} interrupted review fetch runs as failed")
+        # Due domains whose task from an earlier run is still open (e.g. one a crash cut short) keep that task and its checkpoint
+        queued = storage.enqueue_fetch_tasks(job_log.dict(), [td.domain for td in due_domains])
+        if queued:
+            logger.info(f"🚀 Starting background job {job_id} - Review fetching")
+            logger.info(f"📊 Queued {queued} of {len(tracked_domains)} tracked domains that are due, never-fetched first, then most overdue")
+            pruned = storage.prune_job_logs(settings.JOB_LOG_MAX_ENTRIES, settings.JOB_LOG_MAX_AGE_DAYS)
+            if pruned:
+                logger.info(f"🧹 Pruned {pruned} old job logs")
+
+    if not settings.FETCH_QUEUE_INLINE:
+        return
+    # Each thread leases tasks until none are due, whichever run queued them
+    worker = worker_name()
+    with ThreadPoolExecutor(max_workers=settings.FETCH_CONCURRENCY, thread_name_prefix="review-fetch") as executor:
+        results = list(executor.map(lambda _: drain_fetch_queue(worker), range(settings.FETCH_CONCURRENCY)))
+    outcomes: Dict[str, int] = Counter()
+    for drained, _ in results:
+        outcomes.update(drained)
+    tasks = sum(outcomes.values())
+    new_reviews_count = sum(r[1] for r in results)
+    if not tasks:
+        return
+
+    status = fetch_run_status(outcomes)
+    _record_job_metrics("review_fetch", status, time.perf_counter() - run_start, tasks, new_reviews_count)
+    summary = f"Ran {tasks} fetch tasks with up to {settings.FETCH_CONCURRENCY} concurrent requests, {new_reviews_count} new reviews"
+    if status == "success":
+        logger.success(f"✅ {summary}")
+    else:
+        unfinished = ", ".join(f"{count} {outcome}" for outcome, count in sorted(outcomes.items()) if outcome != "done")
+        logger.warning(f"⚠️ {summary}; not done: {unfinished}")
+    logger.info(f"💾 Storage now holds {storage.count_reviews()} total reviews")
+
+def get_current_job(job_type: str = "review_fetch") -> Optional[JobLog]:
+    """The run currently in progress, if any"""
+    job_log = get_storage().get_running_job_log(job_type)
+    return JobLog(**job_log) if job_log else None
+
+def get_job_history(limit: int = 20, job_type: Optional[str] = None) -> List[JobLog]:
+    """Most recent job runs, newest first"""
+    return [JobLog(**job_log) for job_log in get_storage().get_job_logs(limit, job_type)]
+
+def get_job(job_id: str) -> Optional[JobLogDetail]:
+    """A job run with its per-company step timings"""
+    storage = get_storage()
+    job_log = storage.get_job_log(job_id)
+    if job_log is None:
+        return None
+    return JobLogDetail(**job_log, steps=[JobStep(**step) for step in storage.get_job_steps(job_id)])
+
+def get_fetch_queue_status() -> FetchQueueStatus:
+    """How many fetch tasks are queued, running, done and failed"""
+    return FetchQueueStatus(**get_storage().get_fetch_queue_counts())
+
+async def get_current_job_async(job_type: str = "review_fetch") -> Optional[JobLog]:
+    return await asyncio.to_thread(get_current_job, job_type)
+
+async def get_job_history_async(limit: int = 20, job_type: Optional[str] = None) -> List[JobLog]:
+    return await asyncio.to_thread(get_job_history, limit, job_type)
+
+async def get_job_async(job_id: str) -> Optional[JobLogDetail]:
+    return await asyncio.to_thread(get_job, job_id)
+
+async def get_fetch_queue_status_async() -> FetchQueueStatus:
+    return await asyncio.to_thread(get_fetch_queue_status)
+
+def backfill_domain(state: DomainSyncState, hot_start: Optional[date]) -> int:
+    """Walk up to BACKFILL_PAGES_PER_RUN older pages of a domain and save the backfill cursor.
+    Returns the reviews stored. Storage errors propagate."""
+    storage = get_storage()
+    company_domain = state.domain
+    stored = 0
+    for _ in range(settings.BACKFILL_PAGES_PER_RUN):
+        try:
+            page_reviews = fetch_review_page(company_domain, page=state.backfill_page)
+        except UpstreamError as e:
+            logger.warning(f"⚠️ Backfill paused: {e}")
+            break
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Backfill of page {state.backfill_page} failed for {company_domain}: {e}")
+            break
+
+        if not page_reviews:
+            state.backfill_complete = True
+            detail_logger.bind(domain=company_domain).info(f"🏁 Backfill complete for {company_domain}")
+            break
+        # Pages older than the hot window would only be archived again by the next compaction
+        if hot_start and all(_as_utc(r.date).date() < hot_start for r in page_reviews):
+            state.backfill_complete = True
+            detail_logger.bind(domain=company_domain).info(f"🏁 Backfill reached the end of the hot window for {company_domain}")
+            break
+
+        # The filter only saves writes; INSERT OR IGNORE is what keeps a review forward sync stored meanwhile from being stored twice
+        existing_review_ids = _known_review_ids(company_domain)
+        new_reviews = [r for r in page_reviews if r.id not in existing_review_ids and (hot_start is None or _as_utc(r.date).date() >= hot_start)]
+        if new_reviews:
+            inserted = storage.add_reviews([r.dict() for r in new_reviews])
+            if inserted:
+                if review_index.loaded:
+                    review_index.add_reviews(company_domain, new_reviews)
+                review_enricher.notify()
+            stored += inserted
+        state.backfill_page += 1
+
+    # Only touch backfill columns so we never clobber the fetch job's watermark or schedule
+    storage.save_sync_state(state.dict(), columns=["backfill_page", "backfill_complete"])
+    return stored
+
+@job_context("review_backfill")
+def backfill_reviews_for_tracked_companies():
+    """Low-priority job that walks older review pages for domains with incomplete history"""
+    storage = get_storage()
+    tracked_domains = [TrackedDomain(**d) for d in storage.get_tracked_domains()]
+    sync_states = {domain: DomainSyncState(**state) for domain, state in storage.get_sync_states().items()}
+    pending = [td.domain for td in tracked_domains if not (td.domain in sync_states and sync_states[td.domain].backfill_complete)]
+    # A domain whose fetch task is open is left to it: the task may move the backfill cursor when it finishes
+    busy = storage.get_open_fetch_domains()
+    skipped = [domain for domain in pending if domain in busy]
+    pending = [domain for domain in pending if domain not in busy]
+
+    logger.info(f"🕰️ Starting review backfill for {len(pending)} domains" + (f", skipping {len(skipped)} being fetched" if skipped else ""))
+    hot_start = hot_window_start()
+    backfilled_count = failed = 0
+    run_start = time.perf_counter()
+
+    # Sequential on purpose: backfill should not compete with the fetch job for upstream capacity
+    for company_domain in pending:
+        state = sync_states.get(company_domain) or DomainSyncState(domain=company_domain)
+        try:
+            backfilled_count += backfill_domain(state, hot_start)
+        except Exception as e:
+            # The cursor was not saved, so the next run repeats these pages
+            failed += 1
+            logger.error(f"❌ Backfill failed for {company_domain}: {e}")
+
+    _record_job_metrics("review_backfill", "error" if failed else "success", time.perf_counter() - run_start, len(pending), backfilled_count)
+    if failed:
+        logger.warning(f"⚠️ Backfill finished with {failed} failed domains: {backfilled_count} older reviews added")
+    else:
+        logger.success(f"✅ Backfill finished: {backfilled_count} older reviews added")
+
+@job_context("review_compaction")
+def compact_reviews():
+    """Retention job: move reviews older than the hot window to archive segments, and archive
+    or purge the reviews of domains nobody tracks any more"""
+    storage = get_storage()
+    segment_size = settings.REVIEW_ARCHIVE_SEGMENT_SIZE
+    logger.info("🧹 Starting review compaction")
+    run_start = time.perf_counter()
+    archived = purged = 0
+    status = "success"
 
     try:
-        tracked_companies = read_json_file(settings.TRACKED_COMPANIES_FILE)
-        all_reviews = read_json_file(settings.REVIEWS_FILE)
-
-        # Sort companies by added_at in descending order (newest first)
-        tracked_companies.sort(key=lambda x: datetime.fromisoformat(x["added_at"]), reverse=True)
-
-        logger.info(f"📈 Found {len(tracked_companies)} tracked companies")
-        logger.info(f"📚 Found {len(all_reviews)} existing reviews in storage")
-        logger.info("🔄 Processing companies in order of newest first (prioritizing recently added)")
-
-        new_reviews_count = 0
-        companies_processed = 0
-
-        for i, company_data in enumerate(tracked_companies, 1):
-            company_domain = company_data["domain"]
-            company_name = company_data["name"]
-            added_at = datetime.fromisoformat(company_data["added_at"]).strftime("%Y-%m-%d %H:%M:%S")
-            logger.info(f"🔄 [{i}/{len(tracked_companies)}] Processing company: {company_name} ({company_domain}) - Added: {added_at}")
-
-            # Fetch new reviews
-            new_reviews = get_company_reviews(company_domain)
-            if new_reviews:
-                # Filter out reviews we already have
-                existing_review_ids = {r["id"] for r in all_reviews if r["company_domain"] == company_domain}
-                new_reviews = [r for r in new_reviews if r.id not in existing_review_ids]
-
-                if new_reviews:
-                    logger.info(f"✨ Found {len(new_reviews)} new reviews for {company_domain}")
-                    # Add new reviews to storage
-                    all_reviews.extend([r.dict() for r in new_reviews])
-                    new_reviews_count += len(new_reviews)
-                else:
-                    logger.info(f"📭 No new reviews found for {company_domain}")
-            else:
-                logger.warning(f"⚠️ Failed to fetch reviews for {company_domain}")
-
-            companies_processed += 1
-
-        # Save updated reviews
-        write_json_file(settings.REVIEWS_FILE, all_reviews)
-        logger.info(f"💾 Saved {len(all_reviews)} total reviews to storage")
-
-        # Update job log with success
-        job_log.status = "success"
-        job_log.end_time = datetime.now()
-        job_log.reviews_fetched = new_reviews_count
-        job_log.companies_processed = companies_processed
-
-        logger.success(f"✅ Background job {job_id} completed successfully!")
-        logger.success(f"📊 Processed {companies_processed} companies in priority order (newest first), fetched {new_reviews_count} new reviews")
-        logger.info("🎯 Company processing priority: Recently tracked companies get reviews fetched first")
+        policy = settings.UNTRACKED_REVIEWS_POLICY
+        if policy == "purge":
+            for domain in storage.get_untracked_review_domains(include_archived=True):
+                purged += storage.purge_domain(domain)
+                detail_logger.bind(domain=domain).info(f"🗑️ Purged reviews of untracked domain {domain}")
+        elif policy == "archive":
+            for domain in storage.get_untracked_review_domains():
+                archived += storage.archive_reviews(domain, None, segment_size)
+                detail_logger.bind(domain=domain).info(f"📦 Archived all reviews of untracked domain {domain}")
 
+        hot_start = hot_window_start()
+        if hot_start is not None:
+            before = hot_start.isoformat()
+            for domain in storage.get_compactable_domains(before):
+                archived += storage.archive_reviews(domain, before, segment_size)
+
+        storage.prune_review_evictions(max_age_days=7)
+        # Drop what moved out of the reviews table from this worker's index now; the others follow on refresh
+        review_index.refresh()
+        logger.success(f"✅ Compaction finished: {archived} reviews archived, {purged} purged, {storage.count_reviews()} hot reviews left")
     except Exception as e:
-        # Update job log with error
-        job_log.status = "error"
-        job_log.end_time = datetime.now()
-        job_log.error_message = str(e)
-
-        logger.error(f"❌ Background job {job_id} failed with error: {e}")
-        logger.error("🚨 Background job execution stopped due to error")
-
-    finally:
-        # Update the job log in storage
-        logs = read_json_file(settings.LOGS_FILE)
-        for i, log in enumerate(logs):
-            if log["job_id"] == job_id:
-                logs[i] = job_log.dict()
-                break
-        write_json_file(settings.LOGS_FILE, logs)
-
-        if job_log.status == "success":
-            logger.info(f"📋 Job log updated in storage - Status: {job_log.status}")
-        else:
-            logger.warning(f"📋 Job log updated in storage - Status: {job_log.status} - Error: {job_log.error_message}")
+        status = "error"
+        logger.error(f"❌ Review compaction failed: {e}")
+
+    REVIEWS_COMPACTED.labels("archived").inc(archived)
+    REVIEWS_COMPACTED.labels("purged").inc(purged)
+    JOB_DURATION.labels("review_compaction", status).observe(time.perf_counter() - run_start)
@@ -0,0 +1,108 @@
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models.review_models import Review, ReviewAnalytics, ReviewSeriesPoint, RollingRating
+
+ROLLING_WINDOWS = (7, 30, 90)
+BUCKETS = ("day", "week", "month")
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    """First day of the day/week/month bucket containing day (weeks start on Monday)"""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def previous_bucket(start: date, bucket: str) -> date:
+    if bucket == "week":
+        return start - timedelta(days=7)
+    if bucket == "month":
+        return (start - timedelta(days=1)).replace(day=1)
+    return start - timedelta(days=1)
+
+
+def _average(count: int, rating_sum: int) -> Optional[float]:
+    return round(rating_sum / count, 3) if count else None
+
+
+class DomainAnalytics:
+    """Running rating aggregates for one domain.
+
+    Each ingested review updates a handful of counters, so reads cost the same
+    however many reviews the domain has: rolling windows add up at most 90
+    daily buckets and series read one bucket per period. Reviews compaction
+    moved to the archive stay counted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.rating_sum = 0
+        self.histogram = [0] * 6  # index = stars, 0 unused
+        self.first_review_at: Optional[datetime] = None
+        self.last_review_at: Optional[datetime] = None
+        # bucket -> period start -> [count, rating sum]
+        self.series: Dict[str, Dict[date, List[int]]] = {bucket: {} for bucket in BUCKETS}
+
+    def add(self, reviews: Iterable[Review]):
+        self.add_ratings((review.date, review.rating) for review in reviews)
+
+    def add_ratings(self, ratings: Iterable[Tuple[datetime, int]]):
+        """Count (date, rating) pairs, e.g. of archived reviews that are no longer loaded"""
+        with self._lock:
+            for reviewed_at, rating in ratings:
+                if not reviewed_at.tzinfo:
+                    reviewed_at = reviewed_at.replace(tzinfo=timezone.utc)
+                rating = min(max(rating, 1), 5)
+                self.count += 1
+                self.rating_sum += rating
+                self.histogram[rating] += 1
+                if self.first_review_at is None or reviewed_at < self.first_review_at:
+                    self.first_review_at = reviewed_at
+                if self.last_review_at is None or reviewed_at > self.last_review_at:
+                    self.last_review_at = reviewed_at
+
+                day = reviewed_at.astimezone(timezone.utc).date()
+                for bucket, buckets in self.series.items():
+                    totals = buckets.setdefault(bucket_start(day, bucket), [0, 0])
+                    totals[0] += 1
+                    totals[1] += rating
+
+    def snapshot(self, domain: str, now: datetime, bucket: str = "week", periods: int = 12) -> ReviewAnalytics:
+        today = now.astimezone(timezone.utc).date()
+        with self._lock:
+            days = self.series["day"]
+            rolling = []
+            for window in ROLLING_WINDOWS:
+                count = rating_sum = 0
+                for offset in range(window):
+                    totals = days.get(today - timedelta(days=offset))
+                    if totals:
+                        count += totals[0]
+                        rating_sum += totals[1]
+                rolling.append(RollingRating(days=window, count=count, average_rating=_average(count, rating_sum)))
+
+            buckets = self.series[bucket]
+            points = []
+            start = bucket_start(today, bucket)
+            for _ in range(periods):
+                count, rating_sum = buckets.get(start, (0, 0))
+                points.append(ReviewSeriesPoint(period_start=start, count=count, average_rating=_average(count, rating_sum)))
+                start = previous_bucket(start, bucket)
+            points.reverse()
+
+            return ReviewAnalytics(
+                domain=domain,
+                total_reviews=self.count,
+                average_rating=_average(self.count, self.rating_sum),
+                rating_histogram={stars: self.histogram[stars] for stars in range(1, 6)},
+                first_review_at=self.first_review_at,
+                last_review_at=self.last_review_at,
+                rolling=rolling,
+                bucket=bucket,
+                series=points,
+            )
@@ -0,0 +1,268 @@
+"""Sentiment scoring and keyword tagging of stored reviews.
+
+    python -m services.review_enrichment [--domain example.com ...] [--all]
+
+Reviews are scored with a word lexicon and a few rules (negation, intensifiers)
+in a pool of worker processes, in batches, by a background thread in the
+scheduler leader that works through reviews in ingest order. Run as a module
+this re-enriches historical reviews: those never scored or scored by an older
+ENRICHER_VERSION, or every review with --all.
+"""
+import argparse
+import math
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+from config import settings
+from logging_config import PoolWorkerContext, job_context
+from metrics import REVIEW_ENRICHMENT_BACKLOG, REVIEWS_ENRICHED
+from services.review_index import review_index
+from services.review_search import STOPWORDS, TOKEN_PATTERN, TITLE_WEIGHT
+from storage import get_storage
+
+# Bump when the built-in lexicon or the rules change, so the command knows what to re-score
+ENRICHER_VERSION = 1
+
+# Valence of opinion words, roughly -4 (worst) to 4 (best)
+LEXICON: Dict[str, float] = {
+    "amazing": 3.0, "awesome": 3.1, "best": 3.2, "brilliant": 2.8, "excellent": 3.2, "exceptional": 3.0,
+    "fantastic": 3.0, "great": 3.1, "love": 3.2, "loved": 2.9, "outstanding": 3.0, "perfect": 2.9,
+    "superb": 3.1, "wonderful": 2.9, "happy": 2.7, "impressed": 2.1, "pleased": 2.2, "delighted": 2.8,
+    "good": 1.9, "nice": 1.8, "helpful": 1.9, "friendly": 2.0, "satisfied": 1.9, "easy": 1.9,
+    "recommend": 1.5, "recommended": 1.5, "reliable": 1.8, "efficient": 1.8, "professional": 1.6,
+    "polite": 1.7, "seamless": 1.6, "smooth": 1.4, "responsive": 1.4, "thanks": 1.9, "thank": 1.5,
+    "fast": 1.2, "quick": 1.2, "quickly": 1.1, "prompt": 1.2, "affordable": 1.3, "fair": 1.3,
+    "resolved": 1.3, "worth": 0.9, "works": 0.8, "well": 1.0, "fine": 0.8, "ok": 0.6, "okay": 0.6,
+    "terrible": -3.0, "awful": -3.1, "horrible": -3.0, "worst": -3.1, "nightmare": -2.9, "scam": -3.2,
+    "fraud": -3.0, "ripoff": -2.8, "hate": -2.7, "useless": -2.5, "incompetent": -2.5, "bad": -2.5,
+    "angry": -2.3, "unacceptable": -2.3, "disappointed": -2.2, "disappointing": -2.2,
+    "unprofessional": -2.2, "poor": -2.1, "wrong": -2.1, "misleading": -2.1, "rude": -2.0,
+    "broken": -2.0, "failed": -2.0, "frustrating": -2.0, "frustrated": -2.0, "unhelpful": -1.9,
+    "wasted": -1.9, "waste": -1.8, "avoid": -1.8, "annoying": -1.8, "overpriced": -1.8, "damaged": -1.8,
+    "ignored": -1.7, "problem": -1.7, "problems": -1.7, "complaint": -1.5, "difficult": -1.5,
+    "error": -1.4, "slow": -1.3, "delayed": -1.3, "confusing": -1.3, "lost": -1.3, "missing": -1.2,
+    "issue": -1.0, "issues": -1.0, "late": -1.0, "expensive": -1.0, "cancelled": -1.0, "refund": -0.5,
+}
+# "don't" tokenizes to "don", "t"
+NEGATIONS = frozenset("not no never nothing nobody none neither nor without hardly barely cannot t".split())
+NEGATION_WINDOW = 3  # words before an opinion word that can negate it
+NEGATION_FACTOR = -0.6
+INTENSIFIERS = frozenset("very really extremely so super incredibly absolutely highly totally completely".split())
+INTENSIFIER_BOOST = 1.3
+NORMALIZATION_ALPHA = 15  # how quickly the summed valence saturates towards -1/1
+NEUTRAL_THRESHOLD = 0.05
+KEYWORD_STOPWORDS = STOPWORDS | NEGATIONS | INTENSIFIERS | frozenset(
+    "about after again all also am any been before being can could did do does just more most much "
+    "one only other our out over same should some than then there these those too up us very what "
+    "when which while who will would get got im ive dont company service".split()
+)
+MIN_KEYWORD_LENGTH = 3
+
+# Set in each worker process by _init_worker
+_lexicon: Dict[str, float] = LEXICON
+_max_keywords = 5
+
+
+def load_lexicon(path: str) -> Dict[str, float]:
+    """Read a lexicon file of "word valence" lines; blank lines and # comments are skipped"""
+    lexicon = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            word, valence = line.rsplit(None, 1)
+            lexicon[word.lower()] = float(valence)
+    return lexicon
+
+
+def _valence(tokens: List[str], lexicon: Dict[str, float]) -> float:
+    total = 0.0
+    for position, token in enumerate(tokens):
+        valence = lexicon.get(token)
+        if valence is None:
+            continue
+        if position and tokens[position - 1] in INTENSIFIERS:
+            valence *= INTENSIFIER_BOOST
+        if any(word in NEGATIONS for word in tokens[max(0, position - NEGATION_WINDOW):position]):
+            valence *= NEGATION_FACTOR
+        total += valence
+    return total
+
+
+def score_sentiment(title_tokens: List[str], content_tokens: List[str], lexicon: Dict[str, float]) -> Tuple[float, str]:
+    """Sentiment between -1 and 1 and its label (positive, neutral, negative)"""
+    total = TITLE_WEIGHT * _valence(title_tokens, lexicon) + _valence(content_tokens, lexicon)
+    score = total / math.sqrt(total * total + NORMALIZATION_ALPHA)
+    if score >= NEUTRAL_THRESHOLD:
+        return round(score, 4), "positive"
+    if score <= -NEUTRAL_THRESHOLD:
+        return round(score, 4), "negative"
+    return round(score, 4), "neutral"
+
+
+def extract_keywords(title_tokens: List[str], content_tokens: List[str], lexicon: Dict[str, float], limit: int) -> List[str]:
+    """Most frequent topic words, title words counting double; opinion and filler words are left out"""
+    counts: Dict[str, int] = {}
+    for tokens, weight in ((title_tokens, TITLE_WEIGHT), (content_tokens, 1)):
+        for token in tokens:
+            if len(token) < MIN_KEYWORD_LENGTH or token.isdigit() or token in KEYWORD_STOPWORDS or token in lexicon:
+                continue
+            counts[token] = counts.get(token, 0) + weight
+    # Ties keep first-seen order, since dicts preserve insertion order and the sort is stable
+    return sorted(counts, key=counts.get, reverse=True)[:limit]
+
+
+def enrich_batch(reviews: List[Tuple[str, str, str]]) -> List[Dict]:
+    """Score (id, title, content) tuples; runs in the worker processes"""
+    enriched = []
+    for review_id, title, content in reviews:
+        title_tokens = TOKEN_PATTERN.findall(title.lower())
+        content_tokens = TOKEN_PATTERN.findall(content.lower())
+        sentiment, label = score_sentiment(title_tokens, content_tokens, _lexicon)
+        enriched.append({
+            "review_id": review_id,
+            "sentiment": sentiment,
+            "sentiment_label": label,
+            "keywords": extract_keywords(title_tokens, content_tokens, _lexicon, _max_keywords),
+            "version": ENRICHER_VERSION,
+        })
+    return enriched
+
+
+def _init_worker(lexicon_path: str, max_keywords: int):
+    global _lexicon, _max_keywords
+    if lexicon_path:
+        _lexicon = load_lexicon(lexicon_path)
+    _max_keywords = max_keywords
+
+
+class ReviewEnricher:
+    """Works through stored reviews in ingest order, scoring them in a process pool.
+
+    The position reached is kept in storage next to the results, so a restart
+    or a new scheduler leader carries on where the last one stopped. The fetch
+    job only signals that new reviews are waiting; scoring and writing the
+    results happen on this thread and in the pool, never on the fetch path.
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned rather than forked: the API process runs scheduler and storage threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=settings.ENRICHMENT_WORKERS,
+                mp_context=PoolWorkerContext(),
+                initializer=_init_worker,
+                initargs=(settings.ENRICHMENT_LEXICON_FILE, settings.ENRICHMENT_MAX_KEYWORDS),
+            )
+        return self._pool
+
+    def _score(self, reviews: List[Dict]) -> List[Dict]:
+        """Score reviews across the pool, one task per ENRICHMENT_BATCH_SIZE reviews"""
+        size = settings.ENRICHMENT_BATCH_SIZE
+        batches = [[(r["id"], r["title"], r["content"]) for r in reviews[start:start + size]] for start in range(0, len(reviews), size)]
+        enriched_at = datetime.now()
+        results = []
+        for batch in self._get_pool().map(enrich_batch, batches):
+            for enrichment in batch:
+                enrichment["enriched_at"] = enriched_at
+            results.extend(batch)
+        return results
+
+    def start(self):
+        """Start working through the backlog; called in the worker holding the scheduler lease"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="review-enrichment", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def notify(self):
+        """Signal that new reviews have been stored; cheap enough for the fetch loop"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.clear()
+            try:
+                while not self._stopping.is_set() and self.drain_once():
+                    pass
+            except Exception as e:
+                logger.error(f"❌ Review enrichment failed: {e}")
+            self._wake.wait(settings.ENRICHMENT_INTERVAL_SECONDS)
+
+    @job_context("review_enrichment")
+    def drain_once(self) -> bool:
+        """Score the next chunk of the backlog. Returns whether there may be more."""
+        storage = get_storage()
+        cursor = storage.get_enrichment_cursor()
+        limit = settings.ENRICHMENT_BATCH_SIZE * settings.ENRICHMENT_WORKERS
+        rows = list(storage.get_reviews_since(cursor, limit=limit))
+        if not rows:
+            REVIEW_ENRICHMENT_BACKLOG.labels().set(0)
+            return False
+
+        start = time.perf_counter()
+        # Reviews the command has already scored are passed over
+        pending = [review for _, review in rows if review["sentiment"] is None]
+        enrichments = self._score(pending)
+        storage.save_enrichments(enrichments, cursor=rows[-1][0])
+        REVIEWS_ENRICHED.labels("backlog").inc(len(enrichments))
+        REVIEW_ENRICHMENT_BACKLOG.labels().set(storage.count_reviews_since(rows[-1][0]))
+        logger.info(f"🏷️ Enriched {len(enrichments)} reviews in {time.perf_counter() - start:.2f}s")
+        # Put the results in this worker's index now; the others pick them up on their next refresh
+        review_index.refresh(blocking=False)
+        return len(rows) == limit
+
+    def reenrich(self, domains: Optional[List[str]] = None, rescore_all: bool = False) -> int:
+        """Score stored reviews that were never enriched or were enriched by an older version
+        (every review with rescore_all), optionally for some domains only. Returns the number scored."""
+        storage = get_storage()
+        version = None if rescore_all else ENRICHER_VERSION
+        limit = settings.ENRICHMENT_BATCH_SIZE * settings.ENRICHMENT_WORKERS
+        after = total = 0
+        while True:
+            rows = storage.get_reviews_to_enrich(after, limit, version, domains)
+            if not rows:
+                return total
+            enrichments = self._score([review for _, review in rows])
+            storage.save_enrichments(enrichments)
+            REVIEWS_ENRICHED.labels("reenrich").inc(len(enrichments))
+            total += len(enrichments)
+            after = rows[-1][0]
+            logger.info(f"🏷️ Re-enriched {total} reviews so far")
+
+
+review_enricher = ReviewEnricher()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-enrich stored reviews with sentiment and keywords")
+    parser.add_argument("--domain", action="append", dest="domains", help="Only this company domain; repeat for several")
+    parser.add_argument("--all", action="store_true", dest="rescore_all", help="Re-score every review, not just unscored or outdated ones")
+    args = parser.parse_args()
+    try:
+        scored = review_enricher.reenrich(args.domains, args.rescore_all)
+    finally:
+        review_enricher.stop()
+    logger.success(f"✅ Re-enriched {scored} reviews")
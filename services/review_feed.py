@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from collections import deque
+from typing import Deque, List, NamedTuple, Optional, Set
+
+from metrics import REVIEW_FEED_SUBSCRIBERS
+from models.review_models import Review
+
+
+class FeedEvent(NamedTuple):
+    seq: int  # storage ingest sequence, doubling as the client's resume token
+    review: Review
+
+
+class ReviewFeed:
+    """Recent review ingests, in storage sequence order, for live subscribers.
+
+    Publishing appends to a bounded buffer and schedules one wake-up on the
+    event loop, so the ingest side never waits on subscribers however many
+    there are or however slowly they read. Subscribers that fall further
+    behind than the buffer reaches catch up from storage instead.
+    """
+
+    def __init__(self, buffer_size: int):
+        self._lock = threading.Lock()
+        self._events: Deque[FeedEvent] = deque(maxlen=buffer_size)
+        # Events at or below this sequence may no longer be buffered
+        self._floor = 0
+        self.last_seq = 0
+        self._subscribers: Set[asyncio.Event] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def reset(self, seq: int):
+        """Start the feed at a storage position, e.g. once the review index has loaded"""
+        with self._lock:
+            self._events.clear()
+            self._floor = self.last_seq = seq
+
+    def publish(self, events: List[FeedEvent]):
+        if not events:
+            return
+        with self._lock:
+            self._events.extend(events)
+            if len(self._events) == self._events.maxlen:
+                self._floor = max(self._floor, self._events[0].seq - 1)
+            self.last_seq = events[-1].seq
+            loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake_all)
+
+    def _wake_all(self):
+        for wake in self._subscribers:
+            wake.set()
+
+    def read(self, after: int) -> Optional[List[FeedEvent]]:
+        """Buffered events after a sequence, or None if some of them have been evicted"""
+        with self._lock:
+            if after < self._floor:
+                return None
+            events = []
+            for event in reversed(self._events):
+                if event.seq <= after:
+                    break
+                events.append(event)
+        events.reverse()
+        return events
+
+    def subscribe(self) -> asyncio.Event:
+        """Register a subscriber on the running loop; the event is set whenever something is published"""
+        self._loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        self._subscribers.add(wake)
+        REVIEW_FEED_SUBSCRIBERS.labels().inc()
+        return wake
+
+    def unsubscribe(self, wake: asyncio.Event):
+        self._subscribers.discard(wake)
+        REVIEW_FEED_SUBSCRIBERS.labels().dec()
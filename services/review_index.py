@@ -0,0 +1,301 @@
+import heapq
+import threading
+import uuid
+from bisect import bisect_left
+from operator import itemgetter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from loguru import logger
+
+from models.review_models import Review
+from services.review_analytics import DomainAnalytics
+from services.review_feed import FeedEvent, ReviewFeed
+from services.review_search import ReviewSearchIndex
+from config import settings
+from storage import get_storage, trusted_model
+
+SortKey = Tuple[float, str]
+
+
+def sort_key(date: datetime, review_id: str) -> SortKey:
+    """Chronological key for a review; ids break ties between equal dates"""
+    return ((date if date.tzinfo else date.replace(tzinfo=timezone.utc)).timestamp(), review_id)
+
+
+def review_sort_key(review: Review) -> SortKey:
+    return sort_key(review.date, review.id)
+
+
+class DomainReviews(NamedTuple):
+    reviews: List[Review]  # oldest first
+    keys: List[SortKey]  # review_sort_key of each review, for bisecting
+    ids: Set[str]
+    version: int  # bumped on every ingest that adds reviews, and when reviews are evicted or enriched
+
+
+EMPTY_DOMAIN = DomainReviews([], [], set(), 0)
+
+
+def build_domain_reviews(reviews: List[Review], version: int) -> DomainReviews:
+    reviews = sorted(reviews, key=review_sort_key)
+    return DomainReviews(reviews, [review_sort_key(r) for r in reviews], {r.id for r in reviews}, version)
+
+
+def add_to_domain_reviews(entry: DomainReviews, new_reviews: List[Review]) -> DomainReviews:
+    """A copy of entry with reviews it does not hold yet added and its version bumped.
+
+    Only the part of the domain from the oldest new review on is merged, and
+    the existing keys are reused rather than recomputed, so an ingest of
+    reviews newer than everything held, the usual case, amounts to an append.
+    """
+    new_reviews = sorted(new_reviews, key=review_sort_key)
+    new_keys = [review_sort_key(r) for r in new_reviews]
+    start = bisect_left(entry.keys, new_keys[0])
+    merged = list(heapq.merge(zip(entry.keys[start:], entry.reviews[start:]), zip(new_keys, new_reviews), key=itemgetter(0)))
+    reviews = entry.reviews[:start] + [review for _, review in merged]
+    keys = entry.keys[:start] + [key for key, _ in merged]
+    return DomainReviews(reviews, keys, entry.ids | {r.id for r in new_reviews}, entry.version + 1)
+
+
+class ReviewIndex:
+    """Process-resident index of stored reviews and tracking permissions.
+
+    Each domain's entry is replaced rather than mutated on ingest, so readers
+    can hand out the snapshot they got without holding the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._domains: Dict[str, DomainReviews] = {}
+        self._tracked: Set[Tuple[str, str]] = set()
+        # Rating aggregates, fed with the same new reviews as the domain entries
+        self._analytics: Dict[str, DomainAnalytics] = {}
+        self.search = ReviewSearchIndex()
+        # Every stored review in ingest order, whichever process stored it
+        self.feed = ReviewFeed(settings.REVIEW_FEED_BUFFER_SIZE)
+        self._refresh_lock = threading.Lock()
+        # Storage positions this index has caught up to
+        self.last_seq = 0
+        self.tracked_version = 0
+        self.eviction_seq = 0
+        self.enrichment_seq = 0
+        # Distinguishes versions handed out by this process from those of an earlier one
+        self.generation = uuid.uuid4().hex[:8]
+        self.loaded = False
+
+    def load(self):
+        """Build the index from storage. Called once at startup."""
+        storage = get_storage()
+        tracked_version = storage.get_tracked_version()
+        # Read before the reviews: an eviction that lands in between is then applied again, harmlessly
+        eviction_seq = storage.get_latest_eviction_seq()
+        # Reviews come with their enrichments; one written while they are read is applied on the first refresh
+        enrichment_seq = storage.get_latest_enrichment_seq()
+        tracked = {(tc["user"], tc["domain"]) for tc in storage.get_tracked_companies()}
+        grouped: Dict[str, List[Review]] = {}
+        last_seq = 0
+        for seq, review_data in storage.get_reviews_since(0):
+            review = trusted_model(Review, review_data, ("date",))
+            grouped.setdefault(review.company_domain, []).append(review)
+            last_seq = seq
+        domains = {domain: build_domain_reviews(reviews, 1) for domain, reviews in grouped.items()}
+        analytics = {}
+        search = ReviewSearchIndex()
+        for domain, reviews in grouped.items():
+            analytics[domain] = DomainAnalytics()
+            analytics[domain].add(reviews)
+            if settings.REVIEW_SEARCH_ENABLED:
+                search.add(domain, reviews)
+        archived: Dict[str, List[Tuple[datetime, int]]] = {}
+        for domain, date, rating in storage.get_archived_ratings():
+            archived.setdefault(domain, []).append((datetime.fromisoformat(date), rating))
+        for domain, ratings in archived.items():
+            analytics.setdefault(domain, DomainAnalytics()).add_ratings(ratings)
+
+        with self._lock:
+            self._domains = domains
+            self._analytics = analytics
+            self.search = search
+            self._tracked = tracked
+            self.last_seq = last_seq
+            self.tracked_version = tracked_version
+            self.eviction_seq = eviction_seq
+            self.enrichment_seq = enrichment_seq
+            self.loaded = True
+        self.feed.reset(last_seq)
+
+        logger.info(f"🗂️ Review index loaded: {sum(len(r) for r in grouped.values())} reviews across {len(domains)} domains")
+        if settings.REVIEW_SEARCH_ENABLED:
+            documents, terms = search.stats()
+            logger.info(f"🔎 Review search index built: {documents} reviews, {terms} distinct terms")
+
+    def refresh(self, blocking: bool = True):
+        """Pick up changes written by other processes, e.g. the fetch job in the scheduler leader.
+
+        Reviews are read incrementally by ingest sequence and published to the
+        change feed, reviews compaction moved to the archive are dropped, and
+        new enrichments are applied; tracking pairs are reloaded only when their
+        version counter has moved. With blocking=False this returns at once if
+        a refresh is already running.
+        """
+        if not self._refresh_lock.acquire(blocking):
+            return
+        try:
+            self._refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self):
+        storage = get_storage()
+        tracked_version = storage.get_tracked_version()
+        if tracked_version != self.tracked_version:
+            tracked = {(tc["user"], tc["domain"]) for tc in storage.get_tracked_companies()}
+            with self._lock:
+                self._tracked = tracked
+                self.tracked_version = tracked_version
+
+        # Evictions first, so a review stored after a compaction is not dropped with the ones before it
+        for seq, domain, before in storage.get_review_evictions(self.eviction_seq):
+            self.evict(domain, before)
+            self.eviction_seq = seq
+
+        grouped: Dict[str, List[Review]] = {}
+        events = []
+        for seq, review_data in storage.get_reviews_since(self.last_seq):
+            review = trusted_model(Review, review_data, ("date",))
+            grouped.setdefault(review.company_domain, []).append(review)
+            events.append(FeedEvent(seq, review))
+        # Reviews this process ingested itself are already indexed and are skipped here,
+        # but they still go out on the feed, which only ever learns seqs from storage
+        for domain, reviews in grouped.items():
+            self.add_reviews(domain, reviews)
+        if events:
+            self.last_seq = events[-1].seq
+            self.feed.publish(events)
+
+        # After the new reviews, which may be among the ones just enriched
+        enrichments: Dict[str, List[dict]] = {}
+        for seq, enrichment in storage.get_enrichments_since(self.enrichment_seq):
+            enrichments.setdefault(enrichment["company_domain"], []).append(enrichment)
+            self.enrichment_seq = seq
+        for domain, domain_enrichments in enrichments.items():
+            self.apply_enrichments(domain, domain_enrichments)
+
+    # Tracking permissions
+    def is_tracked(self, username: str, domain: str, check_storage: bool = True) -> bool:
+        if (username, domain) in self._tracked:
+            return True
+        # The pair may have been added by another worker since our last refresh
+        if check_storage and get_storage().is_tracked(username, domain):
+            self.set_tracked(username, domain)
+            return True
+        return False
+
+    def set_tracked(self, username: str, domain: str, tracked: bool = True):
+        with self._lock:
+            if tracked:
+                self._tracked.add((username, domain))
+            else:
+                self._tracked.discard((username, domain))
+
+    # Reviews
+    def get_domain(self, domain: str) -> DomainReviews:
+        return self._domains.get(domain, EMPTY_DOMAIN)
+
+    def get_reviews(self, domain: str) -> List[Review]:
+        return self.get_domain(domain).reviews
+
+    def review_ids(self, domain: str) -> Set[str]:
+        return self.get_domain(domain).ids
+
+    def get_analytics(self, domain: str) -> DomainAnalytics:
+        analytics = self._analytics.get(domain)
+        if analytics is None:
+            with self._lock:
+                analytics = self._analytics.setdefault(domain, DomainAnalytics())
+        return analytics
+
+    def version(self, domain_reviews: DomainReviews) -> str:
+        """A snapshot's version, qualified by this process so it stays unique across restarts"""
+        return f"{self.generation}.{domain_reviews.version}"
+
+    def add_reviews(self, domain: str, reviews: Iterable[Review]) -> List[Review]:
+        """Add freshly ingested reviews for a domain, returning the ones that were new"""
+        with self._lock:
+            entry = self.get_domain(domain)
+            known_ids = set(entry.ids)
+            new_reviews = []
+            for review in reviews:
+                if review.id not in known_ids:
+                    known_ids.add(review.id)
+                    new_reviews.append(review)
+            if new_reviews:
+                self._domains[domain] = add_to_domain_reviews(entry, new_reviews)
+            analytics = self._analytics.setdefault(domain, DomainAnalytics())
+
+        # new_reviews are ours alone, so the derived indexes can be fed outside the lock
+        if new_reviews:
+            analytics.add(new_reviews)
+            if settings.REVIEW_SEARCH_ENABLED:
+                self.search.add(domain, new_reviews)
+        return new_reviews
+
+
+    def apply_enrichments(self, domain: str, enrichments: List[dict]):
+        """Set sentiment and keywords on indexed reviews once the enrichment stage has stored them"""
+        with self._lock:
+            entry = self.get_domain(domain)
+            reviews = None
+            enriched = []
+            for enrichment in enrichments:
+                position = bisect_left(entry.keys, sort_key(datetime.fromisoformat(enrichment["date"]), enrichment["review_id"]))
+                if position == len(entry.reviews) or entry.reviews[position].id != enrichment["review_id"]:
+                    continue
+                # Readers may still hold the published snapshot, so its reviews are replaced, not assigned to
+                if reviews is None:
+                    reviews = list(entry.reviews)
+                reviews[position] = reviews[position].copy(update={
+                    "sentiment": enrichment["sentiment"],
+                    "sentiment_label": enrichment["sentiment_label"],
+                    "keywords": enrichment["keywords"],
+                })
+                enriched.append(reviews[position])
+            if not enriched:
+                return
+            # Order and ids are unchanged; the version bump changes the domain's ETags
+            self._domains[domain] = entry._replace(reviews=reviews, version=entry.version + 1)
+
+        if settings.REVIEW_SEARCH_ENABLED:
+            self.search.replace(domain, enriched)
+
+    def evict(self, domain: str, before: Optional[str]):
+        """Drop a domain's reviews dated before a day ("YYYY-MM-DD"), or all of them if None,
+        once compaction has moved them out of the reviews table. Archived reviews stay in the
+        domain's rating aggregates."""
+        analytics = None
+        if before is None:
+            # The whole domain was archived, or purged together with its archive: count only what the archive holds
+            analytics = DomainAnalytics()
+            analytics.add_ratings((datetime.fromisoformat(date), rating) for _, date, rating in get_storage().get_archived_ratings(domain))
+
+        with self._lock:
+            if analytics is not None:
+                self._analytics[domain] = analytics
+            entry = self.get_domain(domain)
+            start = len(entry.reviews)
+            if before is not None:
+                cutoff = datetime.fromisoformat(before).replace(tzinfo=timezone.utc).timestamp()
+                start = bisect_left(entry.keys, (cutoff, ""))
+            if not start:
+                return
+            kept = entry.reviews[start:]
+            # Keep the entry with a bumped version so ETags of the old contents stop matching
+            self._domains[domain] = DomainReviews(kept, entry.keys[start:], {r.id for r in kept}, entry.version + 1)
+
+        if settings.REVIEW_SEARCH_ENABLED:
+            self.search.drop(domain)
+            self.search.add(domain, kept)
+        logger.info(f"🧹 Evicted {start} archived reviews of {domain} from the review index")
+
+
+review_index = ReviewIndex()
@@ -0,0 +1,157 @@
+import math
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from models.review_models import Review
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from had has have i in is it its me my no not of on or so that the "
+    "their them they this to was we were with you your".split()
+)
+TITLE_WEIGHT = 2  # a title occurrence counts as this many content occurrences
+MAX_TERM_FREQUENCY = 255
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def query_terms(query: str) -> List[str]:
+    return list(dict.fromkeys(tokenize(query)))
+
+
+class _DomainPostings:
+    """Postings for one domain. Documents are numbered in ingest order; each
+    term's postings are an array of (ordinal << 8 | term frequency)."""
+
+    def __init__(self):
+        self.reviews: List[Review] = []
+        self.ordinals: Dict[str, int] = {}
+        self.lengths = array("I")
+        self.postings: Dict[str, array] = {}
+
+
+class SearchHit(NamedTuple):
+    review: Review
+    score: float
+
+
+class ReviewSearchIndex:
+    """Inverted index over review titles and content, partitioned by domain.
+
+    Queries only touch the postings of the domains they are limited to, and
+    ingest only appends, so adding reviews never rewrites existing postings.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._domains: Dict[str, _DomainPostings] = {}
+        self._document_frequency: Dict[str, int] = {}
+        self._documents = 0
+        self._total_length = 0
+
+    def add(self, domain: str, reviews: Iterable[Review]):
+        """Index newly ingested reviews; callers pass each review once"""
+        analysed = []
+        for review in reviews:
+            frequencies: Dict[str, int] = {}
+            for token in tokenize(review.title):
+                frequencies[token] = frequencies.get(token, 0) + TITLE_WEIGHT
+            for token in tokenize(review.content):
+                frequencies[token] = frequencies.get(token, 0) + 1
+            analysed.append((review, frequencies, sum(frequencies.values())))
+
+        with self._lock:
+            entry = self._domains.setdefault(domain, _DomainPostings())
+            for review, frequencies, length in analysed:
+                ordinal = len(entry.reviews)
+                entry.reviews.append(review)
+                entry.ordinals[review.id] = ordinal
+                entry.lengths.append(length)
+                for term, frequency in frequencies.items():
+                    postings = entry.postings.get(term)
+                    if postings is None:
+                        postings = entry.postings[term] = array("I")
+                    postings.append(ordinal << 8 | min(frequency, MAX_TERM_FREQUENCY))
+                    self._document_frequency[term] = self._document_frequency.get(term, 0) + 1
+                self._documents += 1
+                self._total_length += length
+
+    def replace(self, domain: str, reviews: Iterable[Review]):
+        """Swap indexed reviews for updated copies with the same title and content, e.g. once enriched"""
+        with self._lock:
+            entry = self._domains.get(domain)
+            if entry is None:
+                return
+            for review in reviews:
+                ordinal = entry.ordinals.get(review.id)
+                if ordinal is not None:
+                    entry.reviews[ordinal] = review
+
+    def drop(self, domain: str):
+        """Forget every review of a domain, e.g. before re-adding the ones compaction kept"""
+        with self._lock:
+            entry = self._domains.pop(domain, None)
+            if entry is None:
+                return
+            for term, postings in entry.postings.items():
+                remaining = self._document_frequency[term] - len(postings)
+                if remaining:
+                    self._document_frequency[term] = remaining
+                else:
+                    del self._document_frequency[term]
+            self._documents -= len(entry.reviews)
+            self._total_length -= sum(entry.lengths)
+
+    def search(self, terms: List[str], domains: Iterable[str]) -> List[SearchHit]:
+        """BM25-ranked reviews in the given domains containing every term, best first"""
+        if not terms:
+            return []
+
+        hits = []
+        with self._lock:
+            if not self._documents:
+                return []
+            average_length = self._total_length / self._documents
+            idf = {}
+            for term in terms:
+                frequency = self._document_frequency.get(term, 0)
+                idf[term] = math.log(1 + (self._documents - frequency + 0.5) / (frequency + 0.5))
+
+            for domain in domains:
+                entry = self._domains.get(domain)
+                if entry is None:
+                    continue
+                term_postings = [(term, entry.postings.get(term)) for term in terms]
+                if any(postings is None for _, postings in term_postings):
+                    continue
+
+                # Start from the rarest term and narrow down
+                term_postings.sort(key=lambda item: len(item[1]))
+                scores: Optional[Dict[int, float]] = None
+                for term, postings in term_postings:
+                    term_scores: Dict[int, float] = {}
+                    for posting in postings:
+                        ordinal = posting >> 8
+                        if scores is not None and ordinal not in scores:
+                            continue
+                        frequency = posting & 0xFF
+                        norm = K1 * (1 - B + B * entry.lengths[ordinal] / average_length)
+                        term_scores[ordinal] = (scores[ordinal] if scores is not None else 0.0) + idf[term] * frequency * (K1 + 1) / (frequency + norm)
+                    scores = term_scores
+                    if not scores:
+                        break
+
+                hits.extend(SearchHit(entry.reviews[ordinal], score) for ordinal, score in (scores or {}).items())
+
+        return hits
+
+    def stats(self) -> Tuple[int, int]:
+        """(indexed reviews, distinct terms)"""
+        return self._documents, len(self._document_frequency)
@@ -1,28 +1,276 @@
 from fastapi import HTTPException
-from typing import List
+from typing import AsyncIterator, List, Optional, Tuple, Union
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+import asyncio
+import base64
+import hashlib
+import json
 
-from utils import get_company_reviews as get_company_reviews_api, read_json_file, write_json_file
+from utils import async_get_company_reviews as async_get_company_reviews_api, json_dumps
+from cache import TTLCache
 from config import settings
-from models.review_models import Review
-from services.company_service import get_tracked_companies
-
-def get_reviews(domain: str, username: str) -> List[Review]:
-    """Get reviews for a specific company domain"""
-    # Check if user is tracking this company
-    tracked_companies = get_tracked_companies(username)
-    if not any(tc.domain == domain for tc in tracked_companies):
+from models.review_models import LatestReviews, LatestReviewsRequest, Review, ReviewAnalytics, ReviewQuery, ReviewSearchHit, ReviewSearchQuery
+from metrics import REVIEW_FEED_EVENTS
+from services.review_feed import FeedEvent
+from services.review_index import build_domain_reviews, review_index, review_sort_key, DomainReviews, SortKey
+from services.review_search import SearchHit, query_terms
+from storage import get_storage, trusted_model
+
+REVIEW_FIELDS = list(Review.__fields__.keys())
+MAX_REVIEW_ID = "\U0010ffff"
+
+# Encoded JSON pages keyed by ETag, which changes whenever the domain ingests reviews
+review_page_cache = TTLCache(max_size=settings.REVIEW_PAGE_CACHE_SIZE, ttl_seconds=settings.REVIEW_PAGE_CACHE_TTL_SECONDS, name="review_pages")
+
+async def get_domain_reviews_async(domain: str, username: str) -> DomainReviews:
+    """Get the indexed reviews for a domain; the API fallback and its storage write do not block the event loop"""
+    # Tracking checks can fall back to storage, so keep them off the event loop
+    if not await asyncio.to_thread(review_index.is_tracked, username, domain):
+        raise HTTPException(status_code=403, detail="Company not tracked by user")
+
+    # Only a domain the fetch job has never synced is fetched here; one whose reviews were all
+    # archived would otherwise have them stored again as new reviews
+    if not review_index.get_reviews(domain) and not await asyncio.to_thread(get_storage().has_sync_history, domain):
+        fetched_reviews = await async_get_company_reviews_api(domain)
+        if fetched_reviews:
+            await asyncio.to_thread(get_storage().add_reviews, [r.dict() for r in fetched_reviews])
+            review_index.add_reviews(domain, fetched_reviews)
+
+    return review_index.get_domain(domain)
+
+def get_latest_reviews(request: LatestReviewsRequest, username: str) -> LatestReviews:
+    """Newest reviews for many domains in one call, straight from the index.
+
+    Domains without indexed reviews come back empty rather than triggering an
+    upstream fetch per domain; the background job picks them up.
+    """
+    if len(request.domains) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BULK_MAX_ITEMS} domains per request")
+
+    latest, untracked = {}, []
+    for domain in dict.fromkeys(request.domains):
+        if not review_index.is_tracked(username, domain):
+            untracked.append(domain)
+            continue
+        reviews = review_index.get_reviews(domain)
+        latest[domain] = reviews[:-request.limit - 1:-1]
+    return LatestReviews.construct(reviews=latest, untracked=untracked)
+
+async def get_latest_reviews_async(request: LatestReviewsRequest, username: str) -> LatestReviews:
+    # Tracking checks can fall back to storage, so keep them off the event loop
+    return await asyncio.to_thread(get_latest_reviews, request, username)
+
+async def get_review_analytics_async(domain: str, username: str, bucket: str = "week", periods: int = 12) -> ReviewAnalytics:
+    """Precomputed rating aggregates for a domain, maintained as reviews are ingested"""
+    await get_domain_reviews_async(domain, username)
+    return review_index.get_analytics(domain).snapshot(domain, datetime.now(timezone.utc), bucket, periods)
+
+async def search_reviews_async(username: str, query: ReviewSearchQuery) -> Tuple[List[ReviewSearchHit], int]:
+    """Full-text search over the caller's tracked domains. Returns one page of hits and the total match count."""
+    if not settings.REVIEW_SEARCH_ENABLED:
+        raise HTTPException(status_code=503, detail="Review search is disabled")
+    terms = query_terms(query.q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Query has no searchable terms")
+
+    if query.domain is not None:
+        if not await asyncio.to_thread(review_index.is_tracked, username, query.domain):
+            raise HTTPException(status_code=403, detail="Company not tracked by user")
+        domains = [query.domain]
+    else:
+        domains = [tc["domain"] for tc in await asyncio.to_thread(get_storage().get_tracked_companies, username)]
+
+    hits = [hit for hit in await asyncio.to_thread(review_index.search.search, terms, domains) if _matches_filters(hit.review, query)]
+    if query.sort == "newest":
+        hits.sort(key=lambda hit: review_sort_key(hit.review), reverse=True)
+    else:
+        hits.sort(key=lambda hit: (hit.score, review_sort_key(hit.review)), reverse=True)
+
+    page = hits[query.offset:query.offset + query.limit]
+    return [_search_hit(hit) for hit in page], len(hits)
+
+def _matches_filters(review: Review, query: ReviewSearchQuery) -> bool:
+    if query.min_rating is not None and review.rating < query.min_rating:
+        return False
+    if query.max_rating is not None and review.rating > query.max_rating:
+        return False
+    if query.since is not None and _utc_timestamp(review.date) < _utc_timestamp(query.since):
+        return False
+    if query.until is not None and _utc_timestamp(review.date) > _utc_timestamp(query.until):
+        return False
+    return _matches_enrichment(review, query)
+
+def _matches_enrichment(review: Review, query: Union[ReviewQuery, ReviewSearchQuery]) -> bool:
+    """Sentiment and keyword filters, shared by ReviewQuery and ReviewSearchQuery; unenriched reviews never match"""
+    if query.sentiment is not None and review.sentiment_label != query.sentiment:
+        return False
+    if query.keyword is not None and query.keyword.lower() not in (review.keywords or ()):
+        return False
+    return True
+
+def _search_hit(hit: SearchHit) -> ReviewSearchHit:
+    return ReviewSearchHit(**hit.review.dict(), score=round(hit.score, 4))
+
+# Archive
+async def get_archived_reviews_async(domain: str, username: str, query: ReviewQuery) -> Tuple[List[Review], Optional[str]]:
+    """Query a tracked domain's archived reviews, decompressing only the segments that overlap the date range"""
+    if not await asyncio.to_thread(review_index.is_tracked, username, domain):
         raise HTTPException(status_code=403, detail="Company not tracked by user")
-    
-    # Get reviews from storage first
-    all_reviews = read_json_file(settings.REVIEWS_FILE)
-    company_reviews = [Review(**r) for r in all_reviews if r["company_domain"] == domain]
-    
-    # If no reviews in storage, fetch from API
-    if not company_reviews:
-        company_reviews = get_company_reviews_api(domain)
-        if company_reviews:
-            # Save fetched reviews
-            all_reviews.extend([r.dict() for r in company_reviews])
-            write_json_file(settings.REVIEWS_FILE, all_reviews)
-    
-    return company_reviews
+    # Segment bounds are ISO strings; widen the range to whole days and let query_reviews filter exactly
+    since = query.since.astimezone(timezone.utc).date().isoformat() if query.since else None
+    until = (query.until.astimezone(timezone.utc).date() + timedelta(days=1)).isoformat() if query.until else None
+    records = await asyncio.to_thread(get_storage().get_archived_reviews, domain, since, until)
+    # A review fetched again after it was archived can sit in two segments
+    unique = {record["id"]: record for record in records}
+    reviews = [trusted_model(Review, record, ("date",)) for record in unique.values()]
+    return query_reviews(build_domain_reviews(reviews, 0), query)
+
+# Change feed
+def _stored_feed_events(username: str, after: int, limit: int) -> Tuple[List[FeedEvent], int]:
+    """Up to `limit` events for the user's tracked domains after a sequence, read from storage,
+    plus the sequence the client has caught up to"""
+    storage = get_storage()
+    latest = storage.get_latest_review_seq()
+    domains = [tc["domain"] for tc in storage.get_tracked_companies(username)]
+    events = [FeedEvent(seq, trusted_model(Review, data, ("date",))) for seq, data in storage.get_reviews_since(after, domains, limit)] if domains else []
+    if len(events) == limit:
+        return events, events[-1].seq
+    return events, max([latest, after] + [event.seq for event in events[-1:]])
+
+def _sse_event(event: FeedEvent) -> bytes:
+    return b"id: %d\nevent: review\ndata: %s\n\n" % (event.seq, json_dumps(event.review))
+
+async def stream_review_events(username: str, after: Optional[int]) -> AsyncIterator[bytes]:
+    """Server-Sent Events for reviews stored in the user's tracked domains.
+
+    Each event's id is a resume token: passing it back as Last-Event-ID (or
+    `since`) replays what was stored after it, from the in-memory feed when it
+    still holds it and from storage otherwise. Without one the stream starts live.
+    """
+    feed = review_index.feed
+    wake = feed.subscribe()
+    try:
+        cursor = feed.last_seq if after is None else after
+        yield b": connected\n\n"
+        while True:
+            wake.clear()
+            events = feed.read(cursor)
+            if events is None:
+                # Too far behind for the buffer; storage already filters to tracked domains
+                events, cursor = await asyncio.to_thread(_stored_feed_events, username, cursor, settings.REVIEW_FEED_CATCHUP_BATCH)
+                if events:
+                    REVIEW_FEED_EVENTS.labels("catchup").inc(len(events))
+                    yield b"".join(_sse_event(event) for event in events)
+                continue
+
+            if events:
+                cursor = events[-1].seq
+                visible = [e for e in events if review_index.is_tracked(username, e.review.company_domain, check_storage=False)]
+                if visible:
+                    REVIEW_FEED_EVENTS.labels("live").inc(len(visible))
+                    yield b"".join(_sse_event(event) for event in visible)
+            try:
+                await asyncio.wait_for(wake.wait(), settings.REVIEW_FEED_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+    finally:
+        feed.unsubscribe(wake)
+
+# Pagination and filtering
+def _utc_timestamp(value: datetime) -> float:
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+def encode_cursor(key: SortKey) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> SortKey:
+    try:
+        timestamp, review_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return (float(timestamp), str(review_id))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def validate_fields(fields: Optional[List[str]]):
+    unknown = [f for f in fields or [] if f not in REVIEW_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown review fields: {', '.join(unknown)}")
+
+def query_reviews(domain_reviews: DomainReviews, query: ReviewQuery) -> Tuple[List[Review], Optional[str]]:
+    """Apply filters, sort order and keyset pagination to a domain's reviews.
+
+    Returns the page and the cursor for the next one, if any.
+    """
+    reviews, keys = domain_reviews.reviews, domain_reviews.keys
+    lo, hi = 0, len(reviews)
+
+    # Date range and cursor narrow the slice by bisecting the sorted keys
+    if query.since is not None:
+        lo = bisect_left(keys, (_utc_timestamp(query.since), ""))
+    if query.until is not None:
+        hi = bisect_right(keys, (_utc_timestamp(query.until), MAX_REVIEW_ID))
+    if query.cursor:
+        cursor_key = decode_cursor(query.cursor)
+        if query.sort == "newest":
+            hi = min(hi, bisect_left(keys, cursor_key))
+        else:
+            lo = max(lo, bisect_right(keys, cursor_key))
+
+    positions = range(hi - 1, lo - 1, -1) if query.sort == "newest" else range(lo, hi)
+    page, last_position = [], None
+    for position in positions:
+        review = reviews[position]
+        if query.min_rating is not None and review.rating < query.min_rating:
+            continue
+        if query.max_rating is not None and review.rating > query.max_rating:
+            continue
+        if (query.sentiment is not None or query.keyword is not None) and not _matches_enrichment(review, query):
+            continue
+        if query.limit is not None and len(page) == query.limit:
+            return page, encode_cursor(keys[last_position])
+        page.append(review)
+        last_position = position
+
+    return page, None
+
+def encode_reviews(reviews: List[Review], fields: Optional[List[str]] = None) -> bytes:
+    if fields:
+        include = set(fields)
+        return json_dumps([review.dict(include=include) for review in reviews])
+    return json_dumps(reviews)
+
+async def render_reviews_page_async(domain_reviews: DomainReviews, query: ReviewQuery, etag: str) -> Tuple[bytes, Optional[str], int]:
+    """Encoded JSON body, next cursor and review count for a page of reviews.
+
+    Paged queries are cached by ETag, which must come from review_etag for the
+    same domain_reviews snapshot; unpaged ones can be whole domains and are
+    encoded every time rather than held in memory. Querying and encoding run
+    on a worker thread, so a large page does not hold up the event loop.
+    """
+    def render():
+        reviews, next_cursor = query_reviews(domain_reviews, query)
+        return encode_reviews(reviews, query.fields), next_cursor, len(reviews)
+
+    if query.limit is None:
+        return await asyncio.to_thread(render)
+    return await review_page_cache.get_or_load_async(etag, lambda: asyncio.to_thread(render))
+
+def review_etag(domain: str, domain_reviews: DomainReviews, query: ReviewQuery, response_format: str) -> str:
+    """ETag for a reviews response, keyed on the query and the version of the snapshot the body is rendered from.
+
+    Reading the version from the index instead could pair an old body with a
+    newer ingest's ETag, and clients would then get 304s for reviews they never saw.
+    """
+    fingerprint = json.dumps([domain, review_index.version(domain_reviews), query.dict(), response_format], default=str, sort_keys=True)
+    return '"' + hashlib.sha1(fingerprint.encode()).hexdigest()[:20] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header lists the ETag or is "*". Tags are compared
+    weakly, ignoring W/ prefixes, as GET conditionals are."""
+    for candidate in (if_none_match or "").split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
@@ -0,0 +1,64 @@
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from config import settings
+from models.company_models import TrackedDomain
+from models.job_models import DomainSyncState
+
+# Weight of the latest observation in the review velocity moving average
+VELOCITY_SMOOTHING = 0.3
+
+
+def select_due_domains(tracked_domains: List[TrackedDomain], sync_states: Dict[str, DomainSyncState], now: datetime) -> List[TrackedDomain]:
+    """Domains whose next fetch is due, never-fetched and most overdue first.
+
+    At most SCHEDULER_MAX_DOMAINS_PER_TICK are returned; the rest stay due and
+    are picked up on the following ticks, which spreads bursts out.
+    """
+    never_fetched, overdue = [], []
+    for tracked_domain in tracked_domains:
+        state = sync_states.get(tracked_domain.domain)
+        if state is None or state.next_due_at is None:
+            never_fetched.append(tracked_domain)
+        elif state.next_due_at <= now:
+            overdue.append(tracked_domain)
+
+    # tracked_domains arrives newest subscription first, so new companies keep that priority
+    overdue.sort(key=lambda td: sync_states[td.domain].next_due_at)
+    return (never_fetched + overdue)[:settings.SCHEDULER_MAX_DOMAINS_PER_TICK]
+
+
+def plan_next_fetch(state: DomainSyncState, new_review_count: int, now: datetime):
+    """Update the domain's review velocity and choose when to fetch it next.
+
+    Busy domains are polled often enough to collect about
+    TARGET_NEW_REVIEWS_PER_FETCH reviews per fetch; quiet ones back off
+    geometrically up to FETCH_MAX_INTERVAL_MINUTES.
+    """
+    min_interval = settings.FETCH_MIN_INTERVAL_MINUTES * 60
+    max_interval = settings.FETCH_MAX_INTERVAL_MINUTES * 60
+
+    if state.last_checked_at is not None:
+        elapsed_hours = max((now - state.last_checked_at).total_seconds() / 3600, 1 / 60)
+        observed = new_review_count / elapsed_hours
+        state.review_velocity = VELOCITY_SMOOTHING * observed + (1 - VELOCITY_SMOOTHING) * state.review_velocity
+
+    if state.last_checked_at is None:
+        # Newly tracked: check again soon while we learn its velocity
+        interval = min_interval
+    elif new_review_count:
+        interval = settings.TARGET_NEW_REVIEWS_PER_FETCH / max(state.review_velocity, 1e-6) * 3600
+    else:
+        interval = (state.interval_seconds or min_interval) * settings.FETCH_BACKOFF_FACTOR
+    interval = min(max(interval, min_interval), max_interval)
+
+    state.interval_seconds = interval
+    state.last_checked_at = now
+    # Jitter keeps domains with equal intervals from landing on the same tick
+    state.next_due_at = now + timedelta(seconds=interval * random.uniform(0.9, 1.1))
+
+
+def plan_retry(state: DomainSyncState, now: datetime):
+    """Schedule a failed domain for another attempt without touching its velocity"""
+    state.next_due_at = now + timedelta(seconds=settings.FETCH_MIN_INTERVAL_MINUTES * 60 * random.uniform(0.9, 1.1))
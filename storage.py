@@ -0,0 +1,1110 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type, TypeVar
+import orjson
+from pydantic import BaseModel
+from loguru import logger
+
+from config import settings
+from metrics import STORAGE_BYTES, STORAGE_OPERATION_DURATION, payload_bytes
+from utils import ensure_data_dir, file_lock, read_json_file
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# Schema migrations, applied in order and tracked through PRAGMA user_version
+MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        email TEXT NOT NULL,
+        password TEXT NOT NULL,
+        hashed_password TEXT NOT NULL,
+        disabled INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS tracked_companies (
+        user TEXT NOT NULL,
+        domain TEXT NOT NULL,
+        name TEXT NOT NULL,
+        added_at TEXT NOT NULL,
+        PRIMARY KEY (user, domain)
+    );
+    CREATE INDEX IF NOT EXISTS idx_tracked_companies_domain ON tracked_companies (domain);
+    CREATE TABLE IF NOT EXISTS reviews (
+        id TEXT PRIMARY KEY,
+        company_domain TEXT NOT NULL,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL,
+        rating INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        author TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_reviews_company_domain ON reviews (company_domain, date);
+    CREATE TABLE IF NOT EXISTS job_logs (
+        job_id TEXT PRIMARY KEY,
+        job_type TEXT NOT NULL,
+        status TEXT NOT NULL,
+        start_time TEXT NOT NULL,
+        end_time TEXT,
+        error_message TEXT,
+        companies_processed INTEGER DEFAULT 0,
+        reviews_fetched INTEGER DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_job_logs_start_time ON job_logs (start_time);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS domain_sync_state (
+        domain TEXT PRIMARY KEY,
+        last_review_time TEXT,
+        last_review_id TEXT,
+        backfill_page INTEGER NOT NULL DEFAULT 2,
+        backfill_complete INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS job_steps (
+        job_id TEXT NOT NULL,
+        domain TEXT NOT NULL,
+        status TEXT NOT NULL,
+        started_at TEXT NOT NULL,
+        fetch_ms REAL NOT NULL,
+        store_ms REAL NOT NULL,
+        new_reviews INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_job_steps_job_id ON job_steps (job_id);
+    CREATE INDEX IF NOT EXISTS idx_job_logs_status ON job_logs (status, job_type);
+    """,
+    """
+    ALTER TABLE domain_sync_state ADD COLUMN next_due_at TEXT;
+    ALTER TABLE domain_sync_state ADD COLUMN interval_seconds REAL;
+    ALTER TABLE domain_sync_state ADD COLUMN review_velocity REAL NOT NULL DEFAULT 0;
+    ALTER TABLE domain_sync_state ADD COLUMN last_checked_at TEXT;
+    CREATE INDEX IF NOT EXISTS idx_domain_sync_state_next_due_at ON domain_sync_state (next_due_at);
+    """,
+    """
+    -- Monotonic ingest sequence so other processes can pick up new reviews incrementally
+    ALTER TABLE reviews ADD COLUMN seq INTEGER;
+    UPDATE reviews SET seq = rowid;
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_seq ON reviews (seq);
+    CREATE TRIGGER IF NOT EXISTS reviews_assign_seq AFTER INSERT ON reviews WHEN NEW.seq IS NULL
+    BEGIN
+        UPDATE reviews SET seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM reviews) WHERE id = NEW.id;
+    END;
+    -- Bumped on every tracking change so other processes know to reload permissions
+    CREATE TRIGGER IF NOT EXISTS tracked_companies_insert_version AFTER INSERT ON tracked_companies
+    BEGIN
+        INSERT INTO meta (key, value) VALUES ('tracked_version', 1)
+        ON CONFLICT (key) DO UPDATE SET value = value + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS tracked_companies_delete_version AFTER DELETE ON tracked_companies
+    BEGIN
+        INSERT INTO meta (key, value) VALUES ('tracked_version', 1)
+        ON CONFLICT (key) DO UPDATE SET value = value + 1;
+    END;
+    """,
+    """
+    -- Reviews moved out of the hot table, compressed in per-domain segments
+    CREATE TABLE IF NOT EXISTS review_archive_segments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        domain TEXT NOT NULL,
+        first_date TEXT NOT NULL,
+        last_date TEXT NOT NULL,
+        review_count INTEGER NOT NULL,
+        payload BLOB NOT NULL,
+        created_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_review_archive_segments_domain ON review_archive_segments (domain, last_date);
+    -- Hot reviews removed by compaction, so other processes can drop them from their index
+    CREATE TABLE IF NOT EXISTS review_evictions (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        domain TEXT NOT NULL,
+        before TEXT,
+        created_at TEXT NOT NULL
+    );
+    -- Compaction may delete the newest rows, so the ingest sequence keeps its own high-water mark
+    INSERT OR IGNORE INTO meta (key, value) SELECT 'review_seq', COALESCE(MAX(seq), 0) FROM reviews;
+    DROP TRIGGER IF EXISTS reviews_assign_seq;
+    CREATE TRIGGER reviews_assign_seq AFTER INSERT ON reviews WHEN NEW.seq IS NULL
+    BEGIN
+        UPDATE meta SET value = value + 1 WHERE key = 'review_seq';
+        UPDATE reviews SET seq = (SELECT value FROM meta WHERE key = 'review_seq') WHERE id = NEW.id;
+    END;
+    """,
+    """
+    -- Sentiment and keywords from the enrichment stage, one row per review. A rewrite replaces the
+    -- row under a new seq, so other processes can pick up enrichments incrementally
+    CREATE TABLE IF NOT EXISTS review_enrichments (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        review_id TEXT NOT NULL UNIQUE,
+        sentiment REAL NOT NULL,
+        sentiment_label TEXT NOT NULL,
+        keywords TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        enriched_at TEXT NOT NULL
+    );
+    """,
+    """
+    -- Durable queue of per-domain fetch tasks. A task is leased to one fetch worker at a time and
+    -- records how far it got, so a retry after a failure, crash or lease timeout resumes from there
+    CREATE TABLE IF NOT EXISTS fetch_tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id TEXT NOT NULL,
+        domain TEXT NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        available_at TEXT NOT NULL,
+        lease_owner TEXT,
+        lease_expires_at TEXT,
+        checkpoint TEXT,
+        last_error TEXT,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+    -- At most one open task per domain, however many runs find it due
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_fetch_tasks_open_domain ON fetch_tasks (domain) WHERE status IN ('pending', 'leased');
+    CREATE INDEX IF NOT EXISTS idx_fetch_tasks_job_id ON fetch_tasks (job_id);
+    """,
+    """
+    -- The JSON import stored dates as str(datetime), with a space where isoformat() writes 'T'.
+    -- Dates are compared as strings, so rewrite those rows the way every other row is written
+    UPDATE reviews SET date = substr(date, 1, 10) || 'T' || substr(date, 12) WHERE substr(date, 11, 1) = ' ';
+    UPDATE tracked_companies SET added_at = substr(added_at, 1, 10) || 'T' || substr(added_at, 12) WHERE substr(added_at, 11, 1) = ' ';
+    UPDATE job_logs SET start_time = substr(start_time, 1, 10) || 'T' || substr(start_time, 12) WHERE substr(start_time, 11, 1) = ' ';
+    UPDATE job_logs SET end_time = substr(end_time, 1, 10) || 'T' || substr(end_time, 12) WHERE substr(end_time, 11, 1) = ' ';
+    UPDATE review_archive_segments SET first_date = substr(first_date, 1, 10) || 'T' || substr(first_date, 12) WHERE substr(first_date, 11, 1) = ' ';
+    UPDATE review_archive_segments SET last_date = substr(last_date, 1, 10) || 'T' || substr(last_date, 12) WHERE substr(last_date, 11, 1) = ' ';
+    """,
+]
+
+REVIEW_COLUMNS = ["id", "company_domain", "title", "content", "rating", "date", "author"]
+ENRICHMENT_COLUMNS = ["review_id", "sentiment", "sentiment_label", "keywords", "version", "enriched_at"]
+# Reviews with whatever the enrichment stage has stored for them (NULLs until then)
+REVIEW_SELECT = (
+    f"SELECT r.seq, {', '.join('r.' + column for column in REVIEW_COLUMNS)}, e.sentiment, e.sentiment_label, e.keywords "
+    "FROM reviews r LEFT JOIN review_enrichments e ON e.review_id = r.id"
+)
+TRACKED_COLUMNS = ["domain", "name", "added_at", "user"]
+USER_COLUMNS = ["username", "email", "password", "hashed_password", "disabled"]
+SYNC_STATE_COLUMNS = [
+    "domain", "last_review_time", "last_review_id", "backfill_page", "backfill_complete", "updated_at",
+    "next_due_at", "interval_seconds", "review_velocity", "last_checked_at",
+]
+JOB_LOG_COLUMNS = ["job_id", "job_type", "status", "start_time", "end_time", "error_message", "companies_processed", "reviews_fetched"]
+JOB_STEP_COLUMNS = ["job_id", "domain", "status", "started_at", "fetch_ms", "store_ms", "new_reviews"]
+FETCH_TASK_COLUMNS = ["id", "job_id", "domain", "status", "attempts", "available_at", "lease_owner", "lease_expires_at", "checkpoint", "last_error"]
+OPEN_FETCH_TASK = "status IN ('pending', 'leased')"
+
+
+def _to_db(value: Any) -> Any:
+    """Convert a model value into something sqlite can store"""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _iso_datetime(value: Any) -> Any:
+    """A datetime string as isoformat() writes it; the legacy JSON files hold str(datetime)"""
+    if not isinstance(value, str):
+        return value
+    try:
+        return datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        return value
+
+
+def _row_values(record: Dict[str, Any], columns: List[str]) -> tuple:
+    return tuple(_to_db(record.get(column)) for column in columns)
+
+
+def _review_record(row: sqlite3.Row) -> Dict[str, Any]:
+    """A REVIEW_SELECT row as a review dict, keywords decoded"""
+    review = dict(row)
+    if review.get("keywords") is not None:
+        review["keywords"] = orjson.loads(review["keywords"])
+    return review
+
+
+def _fetch_task_record(row: sqlite3.Row) -> Dict[str, Any]:
+    """A fetch_tasks row as a task dict, checkpoint decoded (empty before the first page is committed)"""
+    task = dict(row)
+    task["checkpoint"] = orjson.loads(task["checkpoint"]) if task["checkpoint"] else {}
+    return task
+
+
+def trusted_model(model: Type[ModelT], record: Dict[str, Any], datetime_fields: Tuple[str, ...] = ()) -> ModelT:
+    """Build a model from a record we stored ourselves without running validation.
+
+    Datetime columns come back as ISO text and are parsed here; anything that
+    does not parse goes through normal validation instead.
+    """
+    try:
+        values = dict(record)
+        for field in datetime_fields:
+            if values.get(field) is not None:
+                values[field] = datetime.fromisoformat(values[field])
+        return model.construct(**values)
+    except (TypeError, ValueError):
+        return model(**record)
+
+
+def _timed(operation: str):
+    """Decorator recording a storage call's duration under the given operation name"""
+    return STORAGE_OPERATION_DURATION.labels(operation).time()
+
+
+class Storage(ABC):
+    """Interface implemented by every storage backend.
+
+    Records are exchanged as plain dicts shaped like the pydantic models,
+    the same way the JSON helpers in utils used to hand them around.
+    """
+
+    # Users
+    @abstractmethod
+    def get_user(self, username: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def add_user(self, user: Dict[str, Any]) -> bool:
+        ...
+
+    # Tracked companies
+    @abstractmethod
+    def get_tracked_companies(self, username: Optional[str] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_tracked_domains(self) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def is_tracked(self, username: str, domain: str) -> bool:
+        ...
+
+    @abstractmethod
+    def add_tracked_company(self, tracked_company: Dict[str, Any]) -> bool:
+        ...
+
+    @abstractmethod
+    def update_tracked_companies(self, username: str, added: List[Dict[str, Any]], removed: List[str]) -> Tuple[List[bool], List[bool]]:
+        """Apply many track/untrack changes for a user atomically; returns which ones changed anything"""
+
+    # Reviews
+    @abstractmethod
+    def get_reviews_since(self, seq: int, domains: Optional[List[str]] = None, limit: Optional[int] = None) -> Iterable[Tuple[int, Dict[str, Any]]]:
+        ...
+
+    @abstractmethod
+    def get_latest_review_seq(self) -> int:
+        ...
+
+    @abstractmethod
+    def get_tracked_version(self) -> int:
+        ...
+
+    @abstractmethod
+    def get_review_ids(self, domain: str) -> Set[str]:
+        ...
+
+    @abstractmethod
+    def add_reviews(self, reviews: Iterable[Dict[str, Any]]) -> int:
+        ...
+
+    @abstractmethod
+    def count_reviews(self) -> int:
+        ...
+
+    # Review enrichment
+    @abstractmethod
+    def get_reviews_to_enrich(self, after: int, limit: int, version: Optional[int] = None, domains: Optional[List[str]] = None) -> List[Tuple[int, Dict[str, Any]]]:
+        ...
+
+    @abstractmethod
+    def save_enrichments(self, enrichments: Iterable[Dict[str, Any]], cursor: Optional[int] = None) -> int:
+        ...
+
+    @abstractmethod
+    def get_enrichment_cursor(self) -> int:
+        ...
+
+    @abstractmethod
+    def count_reviews_since(self, seq: int) -> int:
+        ...
+
+    @abstractmethod
+    def get_enrichments_since(self, seq: int) -> List[Tuple[int, Dict[str, Any]]]:
+        ...
+
+    @abstractmethod
+    def get_latest_enrichment_seq(self) -> int:
+        ...
+
+    # Review archive
+    @abstractmethod
+    def get_compactable_domains(self, before: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    def get_untracked_review_domains(self, include_archived: bool = False) -> List[str]:
+        ...
+
+    @abstractmethod
+    def archive_reviews(self, domain: str, before: Optional[str], segment_size: int) -> int:
+        ...
+
+    @abstractmethod
+    def purge_domain(self, domain: str) -> int:
+        ...
+
+    @abstractmethod
+    def get_archived_reviews(self, domain: str, since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_archived_ratings(self, domain: Optional[str] = None) -> List[Tuple[str, str, int]]:
+        ...
+
+    @abstractmethod
+    def get_review_evictions(self, after: int) -> List[Tuple[int, str, Optional[str]]]:
+        ...
+
+    @abstractmethod
+    def get_latest_eviction_seq(self) -> int:
+        ...
+
+    @abstractmethod
+    def prune_review_evictions(self, max_age_days: int) -> int:
+        ...
+
+    # Per-domain sync state
+    @abstractmethod
+    def get_sync_states(self) -> Dict[str, Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def save_sync_state(self, state: Dict[str, Any], columns: Optional[List[str]] = None):
+        ...
+
+    @abstractmethod
+    def mark_domain_due(self, domain: str, due_at: datetime):
+        ...
+
+    @abstractmethod
+    def get_sync_state(self, domain: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def has_sync_history(self, domain: str) -> bool:
+        ...
+
+    # Fetch task queue
+    @abstractmethod
+    def enqueue_fetch_tasks(self, job_log: Dict[str, Any], domains: List[str]) -> int:
+        ...
+
+    @abstractmethod
+    def lease_fetch_task(self, owner: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def checkpoint_fetch_task(self, task_id: int, owner: str, checkpoint: Dict[str, Any], reviews: Iterable[Dict[str, Any]], lease_seconds: float) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def retry_fetch_task(self, task_id: int, owner: str, error: str, available_at: datetime, count_attempt: bool = True) -> bool:
+        ...
+
+    @abstractmethod
+    def finish_fetch_task(self, task_id: int, owner: str, step: Dict[str, Any], state: Dict[str, Any], state_columns: List[str], error: Optional[str] = None) -> bool:
+        ...
+
+    @abstractmethod
+    def get_fetch_queue_counts(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def get_open_fetch_domains(self) -> Set[str]:
+        ...
+
+    # Job logs
+    @abstractmethod
+    def get_job_log(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_job_logs(self, limit: int, job_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_running_job_log(self, job_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def mark_interrupted_job_logs(self, job_type: str) -> int:
+        ...
+
+    @abstractmethod
+    def get_job_steps(self, job_id: str) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def prune_job_logs(self, max_entries: int, max_age_days: int) -> int:
+        ...
+
+    @abstractmethod
+    def migrate_from_json(self):
+        ...
+
+
+class SQLiteStorage(Storage):
+    """SQLite storage in WAL mode with one connection per thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._apply_migrations()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            ensure_data_dir()
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _apply_migrations(self):
+        # Every worker process opens the database on startup; only one may migrate at a time
+        with file_lock(self.path + ".migrate.lock"):
+            conn = self.conn
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+                # executescript commits first, so the version bump goes in the same script
+                try:
+                    conn.executescript(f"BEGIN; {script} PRAGMA user_version = {number}; COMMIT;")
+                except sqlite3.Error:
+                    conn.rollback()
+                    raise
+                logger.info(f"🗄️ Applied storage schema migration {number}")
+
+    # Users
+    @_timed("get_user")
+    def get_user(self, username: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        if row is None:
+            return None
+        user = dict(row)
+        user["disabled"] = bool(user["disabled"])
+        return user
+
+    @_timed("add_user")
+    def add_user(self, user: Dict[str, Any]) -> bool:
+        with self.conn:
+            cursor = self.conn.execute(
+                f"INSERT OR IGNORE INTO users ({', '.join(USER_COLUMNS)}) VALUES (?, ?, ?, ?, ?)",
+                _row_values(user, USER_COLUMNS),
+            )
+        return cursor.rowcount == 1
+
+    # Tracked companies
+    @_timed("get_tracked_companies")
+    def get_tracked_companies(self, username: Optional[str] = None) -> List[Dict[str, Any]]:
+        if username is None:
+            rows = self.conn.execute("SELECT domain, name, added_at, user FROM tracked_companies")
+        else:
+            rows = self.conn.execute(
+                "SELECT domain, name, added_at, user FROM tracked_companies WHERE user = ?", (username,)
+            )
+        return [dict(row) for row in rows]
+
+    @_timed("get_tracked_domains")
+    def get_tracked_domains(self) -> List[Dict[str, Any]]:
+        """Distinct tracked domains with their subscriber count, newest subscription first"""
+        rows = self.conn.execute(
+            """
+            SELECT domain, MAX(name) AS name, COUNT(*) AS subscribers, MAX(added_at) AS latest_added_at
+            FROM tracked_companies
+            GROUP BY domain
+            ORDER BY latest_added_at DESC
+            """
+        )
+        return [dict(row) for row in rows]
+
+    @_timed("is_tracked")
+    def is_tracked(self, username: str, domain: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM tracked_companies WHERE user = ? AND domain = ?", (username, domain)
+        ).fetchone()
+        return row is not None
+
+    @_timed("add_tracked_company")
+    def add_tracked_company(self, tracked_company: Dict[str, Any]) -> bool:
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO tracked_companies (domain, name, added_at, user) VALUES (?, ?, ?, ?)",
+                _row_values(tracked_company, TRACKED_COLUMNS),
+            )
+        return cursor.rowcount == 1
+
+    @_timed("update_tracked_companies")
+    def update_tracked_companies(self, username: str, added: List[Dict[str, Any]], removed: List[str]) -> Tuple[List[bool], List[bool]]:
+        with self.conn:
+            added_results = []
+            for tracked_company in added:
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO tracked_companies (domain, name, added_at, user) VALUES (?, ?, ?, ?)",
+                    _row_values(tracked_company, TRACKED_COLUMNS),
+                )
+                added_results.append(cursor.rowcount == 1)
+                if cursor.rowcount == 1:
+                    # Same as mark_domain_due: a new subscriber moves the domain's next fetch forward
+                    self.conn.execute(
+                        "UPDATE domain_sync_state SET next_due_at = ? WHERE domain = ? AND (next_due_at IS NULL OR next_due_at > ?)",
+                        (_to_db(tracked_company["added_at"]), tracked_company["domain"], _to_db(tracked_company["added_at"])),
+                    )
+            removed_results = [
+                self.conn.execute("DELETE FROM tracked_companies WHERE user = ? AND domain = ?", (username, domain)).rowcount == 1
+                for domain in removed
+            ]
+        return added_results, removed_results
+
+    # Reviews
+    def get_reviews_since(self, seq: int, domains: Optional[List[str]] = None, limit: Optional[int] = None) -> Iterable[Tuple[int, Dict[str, Any]]]:
+        """Reviews ingested after the given sequence number, in ingest order, optionally for some domains only"""
+        # Timed by hand: only time spent in here counts, not the consumer's work between rows
+        elapsed, read_bytes = 0.0, 0
+        start = time.perf_counter()
+        query = f"{REVIEW_SELECT} WHERE r.seq > ?"
+        params: List[Any] = [seq]
+        if domains is not None:
+            query += f" AND r.company_domain IN ({', '.join('?' * len(domains))})"
+            params.extend(domains)
+        query += " ORDER BY r.seq"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = self.conn.execute(query, params)
+        try:
+            for row in rows:
+                review = _review_record(row)
+                read_bytes += payload_bytes((row,))
+                elapsed += time.perf_counter() - start
+                yield review.pop("seq"), review
+                start = time.perf_counter()
+            elapsed += time.perf_counter() - start
+        finally:
+            STORAGE_OPERATION_DURATION.labels("get_reviews_since").observe(elapsed)
+            STORAGE_BYTES.labels("get_reviews_since", "read").inc(read_bytes)
+
+    def get_latest_review_seq(self) -> int:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'review_seq'").fetchone()
+        return int(row[0]) if row else 0
+
+    def get_tracked_version(self) -> int:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'tracked_version'").fetchone()
+        return int(row[0]) if row else 0
+
+    @_timed("get_review_ids")
+    def get_review_ids(self, domain: str) -> Set[str]:
+        rows = self.conn.execute("SELECT id FROM reviews WHERE company_domain = ?", (domain,))
+        return {row[0] for row in rows}
+
+    @_timed("add_reviews")
+    def add_reviews(self, reviews: Iterable[Dict[str, Any]]) -> int:
+        """Insert reviews, skipping ids we already have. Returns the number inserted."""
+        rows = [_row_values(review, REVIEW_COLUMNS) for review in reviews]
+        with self.conn:
+            # rowcount, unlike total_changes, leaves out the seq trigger's updates
+            inserted = self.conn.executemany(
+                f"INSERT OR IGNORE INTO reviews ({', '.join(REVIEW_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            ).rowcount
+        STORAGE_BYTES.labels("add_reviews", "write").inc(payload_bytes(rows))
+        return inserted
+
+    def count_reviews(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+
+    # Review enrichment
+    @_timed("get_reviews_to_enrich")
+    def get_reviews_to_enrich(self, after: int, limit: int, version: Optional[int] = None, domains: Optional[List[str]] = None) -> List[Tuple[int, Dict[str, Any]]]:
+        """Reviews after a sequence, in ingest order, that have no enrichment or one older than version
+        (every review when version is None)"""
+        query = "SELECT r.seq, r.id, r.title, r.content FROM reviews r LEFT JOIN review_enrichments e ON e.review_id = r.id WHERE r.seq > ?"
+        params: List[Any] = [after]
+        if version is not None:
+            query += " AND (e.version IS NULL OR e.version < ?)"
+            params.append(version)
+        if domains is not None:
+            query += f" AND r.company_domain IN ({', '.join('?' * len(domains))})"
+            params.extend(domains)
+        rows = self.conn.execute(query + " ORDER BY r.seq LIMIT ?", params + [limit]).fetchall()
+        STORAGE_BYTES.labels("get_reviews_to_enrich", "read").inc(payload_bytes(rows))
+        return [(row[0], {"id": row[1], "title": row[2], "content": row[3]}) for row in rows]
+
+    @_timed("save_enrichments")
+    def save_enrichments(self, enrichments: Iterable[Dict[str, Any]], cursor: Optional[int] = None) -> int:
+        """Store enrichments, replacing older ones, and optionally advance the backlog cursor in the same transaction"""
+        rows = [
+            _row_values({**enrichment, "keywords": orjson.dumps(enrichment["keywords"]).decode()}, ENRICHMENT_COLUMNS)
+            for enrichment in enrichments
+        ]
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO review_enrichments ({', '.join(ENRICHMENT_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            if cursor is not None:
+                self.conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('enrichment_cursor', ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                    (cursor,),
+                )
+        STORAGE_BYTES.labels("save_enrichments", "write").inc(payload_bytes(rows))
+        return len(rows)
+
+    def get_enrichment_cursor(self) -> int:
+        """Review sequence up to which the enrichment backlog has been worked through"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'enrichment_cursor'").fetchone()
+        return int(row[0]) if row else 0
+
+    def count_reviews_since(self, seq: int) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM reviews WHERE seq > ?", (seq,)).fetchone()[0]
+
+    @_timed("get_enrichments_since")
+    def get_enrichments_since(self, seq: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """Enrichments written after a sequence, with the domain and date of their hot review"""
+        rows = self.conn.execute(
+            "SELECT e.seq, e.review_id, r.company_domain, r.date, e.sentiment, e.sentiment_label, e.keywords "
+            "FROM review_enrichments e JOIN reviews r ON r.id = e.review_id WHERE e.seq > ? ORDER BY e.seq",
+            (seq,),
+        ).fetchall()
+        return [(row[0], _review_record(row)) for row in rows]
+
+    def get_latest_enrichment_seq(self) -> int:
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM review_enrichments").fetchone()[0]
+
+    # Review archive. Dates are compared as ISO strings, so `before` is a day ("YYYY-MM-DD")
+    @_timed("get_compactable_domains")
+    def get_compactable_domains(self, before: str) -> List[str]:
+        """Domains with hot reviews dated before the given day"""
+        rows = self.conn.execute("SELECT DISTINCT company_domain FROM reviews WHERE date < ?", (before,))
+        return [row[0] for row in rows]
+
+    @_timed("get_untracked_review_domains")
+    def get_untracked_review_domains(self, include_archived: bool = False) -> List[str]:
+        """Domains holding reviews that no user tracks any more"""
+        query = "SELECT DISTINCT company_domain FROM reviews WHERE company_domain NOT IN (SELECT domain FROM tracked_companies)"
+        if include_archived:
+            query += " UNION SELECT DISTINCT domain FROM review_archive_segments WHERE domain NOT IN (SELECT domain FROM tracked_companies)"
+        return [row[0] for row in self.conn.execute(query)]
+
+    @_timed("archive_reviews")
+    def archive_reviews(self, domain: str, before: Optional[str], segment_size: int) -> int:
+        """Move a domain's reviews dated before a day (all of them if None) into compressed segments.
+        Returns the number of reviews moved."""
+        where, params = "company_domain = ?", [domain]
+        if before is not None:
+            where += " AND date < ?"
+            params.append(before)
+        now = datetime.now().isoformat()
+        written = 0
+        with self.conn:
+            # Take the write lock first so no review can land between the copy and the delete
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = self.conn.execute(f"{REVIEW_SELECT} WHERE r.id IN (SELECT id FROM reviews WHERE {where}) ORDER BY r.date", params).fetchall()
+            if not rows:
+                return 0
+            for start in range(0, len(rows), segment_size):
+                # Enrichments travel with their reviews into the segment
+                chunk = [_review_record(row) for row in rows[start:start + segment_size]]
+                for review in chunk:
+                    del review["seq"]
+                payload = zlib.compress(orjson.dumps(chunk))
+                written += len(payload)
+                self.conn.execute(
+                    "INSERT INTO review_archive_segments (domain, first_date, last_date, review_count, payload, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (domain, chunk[0]["date"], chunk[-1]["date"], len(chunk), payload, now),
+                )
+            self.conn.execute(f"DELETE FROM review_enrichments WHERE review_id IN (SELECT id FROM reviews WHERE {where})", params)
+            self.conn.execute(f"DELETE FROM reviews WHERE {where}", params)
+            self.conn.execute("INSERT INTO review_evictions (domain, before, created_at) VALUES (?, ?, ?)", (domain, before, now))
+        STORAGE_BYTES.labels("archive_reviews", "read").inc(payload_bytes(rows))
+        STORAGE_BYTES.labels("archive_reviews", "write").inc(written)
+        return len(rows)
+
+    @_timed("purge_domain")
+    def purge_domain(self, domain: str) -> int:
+        """Delete every hot and archived review and the sync state of a domain. Returns the hot reviews deleted."""
+        with self.conn:
+            self.conn.execute("DELETE FROM review_enrichments WHERE review_id IN (SELECT id FROM reviews WHERE company_domain = ?)", (domain,))
+            deleted = self.conn.execute("DELETE FROM reviews WHERE company_domain = ?", (domain,)).rowcount
+            self.conn.execute("DELETE FROM review_archive_segments WHERE domain = ?", (domain,))
+            self.conn.execute("DELETE FROM domain_sync_state WHERE domain = ?", (domain,))
+            self.conn.execute(
+                "INSERT INTO review_evictions (domain, before, created_at) VALUES (?, NULL, ?)", (domain, datetime.now().isoformat())
+            )
+        return deleted
+
+    @_timed("get_archived_reviews")
+    def get_archived_reviews(self, domain: str, since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Archived reviews of a domain from the segments overlapping a date range; may repeat ids across segments"""
+        query, params = "SELECT payload FROM review_archive_segments WHERE domain = ?", [domain]
+        if since is not None:
+            query += " AND last_date >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND first_date <= ?"
+            params.append(until)
+        reviews = []
+        read_bytes = 0
+        for (payload,) in self.conn.execute(query + " ORDER BY id", params):
+            read_bytes += len(payload)
+            reviews.extend(orjson.loads(zlib.decompress(payload)))
+        STORAGE_BYTES.labels("get_archived_reviews", "read").inc(read_bytes)
+        return reviews
+
+    @_timed("get_archived_ratings")
+    def get_archived_ratings(self, domain: Optional[str] = None) -> List[Tuple[str, str, int]]:
+        """(domain, date, rating) of each archived review, of one domain or all, for the rating aggregates"""
+        query, params = "SELECT domain, payload FROM review_archive_segments", []
+        if domain is not None:
+            query += " WHERE domain = ?"
+            params.append(domain)
+        ratings = []
+        seen: Set[Tuple[str, str]] = set()
+        read_bytes = 0
+        for segment_domain, payload in self.conn.execute(query + " ORDER BY id", params):
+            read_bytes += len(payload)
+            for review in orjson.loads(zlib.decompress(payload)):
+                # The same review can sit in more than one segment
+                if (segment_domain, review["id"]) not in seen:
+                    seen.add((segment_domain, review["id"]))
+                    ratings.append((segment_domain, review["date"], review["rating"]))
+        STORAGE_BYTES.labels("get_archived_ratings", "read").inc(read_bytes)
+        return ratings
+
+    def get_review_evictions(self, after: int) -> List[Tuple[int, str, Optional[str]]]:
+        """(seq, domain, before) for every compaction after the given sequence; before None means the whole domain"""
+        rows = self.conn.execute("SELECT seq, domain, before FROM review_evictions WHERE seq > ? ORDER BY seq", (after,))
+        return [tuple(row) for row in rows]
+
+    def get_latest_eviction_seq(self) -> int:
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM review_evictions").fetchone()[0]
+
+    def prune_review_evictions(self, max_age_days: int) -> int:
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+        with self.conn:
+            return self.conn.execute("DELETE FROM review_evictions WHERE created_at < ?", (cutoff,)).rowcount
+
+    # Per-domain sync state
+    @_timed("get_sync_states")
+    def get_sync_states(self) -> Dict[str, Dict[str, Any]]:
+        rows = self.conn.execute(f"SELECT {', '.join(SYNC_STATE_COLUMNS)} FROM domain_sync_state")
+        states = {}
+        for row in rows:
+            state = dict(row)
+            state["backfill_complete"] = bool(state["backfill_complete"])
+            states[state["domain"]] = state
+        return states
+
+    @_timed("get_sync_state")
+    def get_sync_state(self, domain: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(f"SELECT {', '.join(SYNC_STATE_COLUMNS)} FROM domain_sync_state WHERE domain = ?", (domain,)).fetchone()
+        if row is None:
+            return None
+        state = dict(row)
+        state["backfill_complete"] = bool(state["backfill_complete"])
+        return state
+
+    @_timed("has_sync_history")
+    def has_sync_history(self, domain: str) -> bool:
+        """Whether the fetch job has synced the domain or compaction has archived any of its reviews"""
+        row = self.conn.execute(
+            "SELECT EXISTS (SELECT 1 FROM domain_sync_state WHERE domain = ?) OR EXISTS (SELECT 1 FROM review_archive_segments WHERE domain = ?)",
+            (domain, domain),
+        ).fetchone()
+        return bool(row[0])
+
+    def _upsert_sync_state(self, state: Dict[str, Any], columns: Optional[List[str]]):
+        columns = ["domain"] + [c for c in (columns or SYNC_STATE_COLUMNS) if c != "domain"]
+        placeholders = ", ".join("?" for _ in columns)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != "domain")
+        self.conn.execute(
+            f"INSERT INTO domain_sync_state ({', '.join(columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT (domain) DO UPDATE SET {updates}",
+            _row_values(state, columns),
+        )
+
+    @_timed("save_sync_state")
+    def save_sync_state(self, state: Dict[str, Any], columns: Optional[List[str]] = None):
+        """Upsert a domain's sync state, optionally touching only the given columns"""
+        with self.conn:
+            self._upsert_sync_state(state, columns)
+
+    @_timed("mark_domain_due")
+    def mark_domain_due(self, domain: str, due_at: datetime):
+        """Pull a domain's next scheduled fetch forward to due_at"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE domain_sync_state SET next_due_at = ? WHERE domain = ? AND (next_due_at IS NULL OR next_due_at > ?)",
+                (due_at.isoformat(), domain, due_at.isoformat()),
+            )
+
+    # Fetch task queue. A lease is only honoured while lease_owner still matches, so a worker whose
+    # lease expired and was taken over cannot write over the new holder's progress
+    @_timed("enqueue_fetch_tasks")
+    def enqueue_fetch_tasks(self, job_log: Dict[str, Any], domains: List[str]) -> int:
+        """Queue a task for each domain without an open one, recording the run's job log if any were queued.
+        Returns the number queued."""
+        now = datetime.now().isoformat()
+        with self.conn:
+            queued = self.conn.executemany(
+                "INSERT OR IGNORE INTO fetch_tasks (job_id, domain, status, available_at, created_at, updated_at) "
+                "VALUES (?, ?, 'pending', ?, ?, ?)",
+                ((job_log["job_id"], domain, now, now, now) for domain in domains),
+            ).rowcount
+            if queued:
+                self.conn.execute(
+                    f"INSERT INTO job_logs ({', '.join(JOB_LOG_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    _row_values(job_log, JOB_LOG_COLUMNS),
+                )
+        return queued
+
+    @_timed("lease_fetch_task")
+    def lease_fetch_task(self, owner: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """Lease the oldest task that is due, or whose previous lease expired, counting it as an attempt"""
+        now = datetime.now()
+        with self.conn:
+            # Take the write lock first so two workers never lease the same task
+            self.conn.execute("BEGIN IMMEDIATE")
+            row = self.conn.execute(
+                "SELECT id FROM fetch_tasks WHERE (status = 'pending' AND available_at <= ?) "
+                "OR (status = 'leased' AND lease_expires_at <= ?) ORDER BY id LIMIT 1",
+                (now.isoformat(), now.isoformat()),
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE fetch_tasks SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires_at = ?, updated_at = ? "
+                "WHERE id = ?",
+                (owner, (now + timedelta(seconds=lease_seconds)).isoformat(), now.isoformat(), row[0]),
+            )
+            task = self.conn.execute(f"SELECT {', '.join(FETCH_TASK_COLUMNS)} FROM fetch_tasks WHERE id = ?", (row[0],)).fetchone()
+        return _fetch_task_record(task)
+
+    @_timed("checkpoint_fetch_task")
+    def checkpoint_fetch_task(self, task_id: int, owner: str, checkpoint: Dict[str, Any], reviews: Iterable[Dict[str, Any]], lease_seconds: float) -> Optional[int]:
+        """Store reviews together with the task's checkpoint and extend its lease, in one transaction.
+        Returns the number of reviews inserted, or None if the lease has been lost."""
+        now = datetime.now()
+        rows = [_row_values(review, REVIEW_COLUMNS) for review in reviews]
+        with self.conn:
+            leased = self.conn.execute(
+                "UPDATE fetch_tasks SET checkpoint = ?, lease_expires_at = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (orjson.dumps(checkpoint).decode(), (now + timedelta(seconds=lease_seconds)).isoformat(), now.isoformat(), task_id, owner),
+            ).rowcount
+            if not leased:
+                return None
+            # rowcount, unlike total_changes, leaves out the seq trigger's updates
+            inserted = self.conn.executemany(
+                f"INSERT OR IGNORE INTO reviews ({', '.join(REVIEW_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            ).rowcount
+        STORAGE_BYTES.labels("checkpoint_fetch_task", "write").inc(payload_bytes(rows))
+        return inserted
+
+    @_timed("retry_fetch_task")
+    def retry_fetch_task(self, task_id: int, owner: str, error: str, available_at: datetime, count_attempt: bool = True) -> bool:
+        """Hand a leased task back to the queue, keeping its checkpoint, to be retried from available_at.
+        Returns False if the lease has been lost."""
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE fetch_tasks SET status = 'pending', attempts = attempts - ?, available_at = ?, lease_owner = NULL, "
+                "lease_expires_at = NULL, last_error = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (0 if count_attempt else 1, available_at.isoformat(), error, datetime.now().isoformat(), task_id, owner),
+            )
+        return cursor.rowcount > 0
+
+    @_timed("finish_fetch_task")
+    def finish_fetch_task(self, task_id: int, owner: str, step: Dict[str, Any], state: Dict[str, Any], state_columns: List[str], error: Optional[str] = None) -> bool:
+        """Close a leased task as done (or failed, with an error) together with its job step, the domain's
+        sync state and its run's counters, in one transaction. The run is closed once it has no open tasks
+        left, as an error if any of them failed. Returns False if the lease has been lost."""
+        now = datetime.now().isoformat()
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE fetch_tasks SET status = ?, lease_owner = NULL, lease_expires_at = NULL, last_error = ?, updated_at = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                ("failed" if error else "done", error, now, task_id, owner),
+            )
+            if not cursor.rowcount:
+                return False
+            step_row = _row_values(step, JOB_STEP_COLUMNS)
+            self.conn.execute(f"INSERT INTO job_steps ({', '.join(JOB_STEP_COLUMNS)}) VALUES ({', '.join('?' for _ in step_row)})", step_row)
+            self._upsert_sync_state(state, state_columns)
+            self.conn.execute(
+                "UPDATE job_logs SET companies_processed = COALESCE(companies_processed, 0) + 1, "
+                "reviews_fetched = COALESCE(reviews_fetched, 0) + ? WHERE job_id = ?",
+                (step["new_reviews"], step["job_id"]),
+            )
+            failed = self.conn.execute(
+                "SELECT COUNT(*) FROM fetch_tasks WHERE job_id = ? AND status = 'failed'", (step["job_id"],)
+            ).fetchone()[0]
+            self.conn.execute(
+                "UPDATE job_logs SET status = ?, error_message = ?, end_time = ? WHERE job_id = ? AND status = 'running' "
+                f"AND NOT EXISTS (SELECT 1 FROM fetch_tasks WHERE job_id = ? AND {OPEN_FETCH_TASK})",
+                ("error" if failed else "success", f"{failed} fetch tasks failed" if failed else None, now, step["job_id"], step["job_id"]),
+            )
+        STORAGE_BYTES.labels("finish_fetch_task", "write").inc(payload_bytes([step_row]))
+        return True
+
+    def get_fetch_queue_counts(self) -> Dict[str, int]:
+        """Fetch tasks by status"""
+        rows = self.conn.execute("SELECT status, COUNT(*) FROM fetch_tasks GROUP BY status")
+        return {row[0]: row[1] for row in rows}
+
+    def get_open_fetch_domains(self) -> Set[str]:
+        """Domains with a fetch task that is queued or running"""
+        rows = self.conn.execute(f"SELECT domain FROM fetch_tasks WHERE {OPEN_FETCH_TASK}")
+        return {row[0] for row in rows}
+
+    # Job logs
+    @_timed("get_job_log")
+    def get_job_log(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT * FROM job_logs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    @_timed("get_job_logs")
+    def get_job_logs(self, limit: int, job_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        if job_type is None:
+            rows = self.conn.execute("SELECT * FROM job_logs ORDER BY start_time DESC LIMIT ?", (limit,))
+        else:
+            rows = self.conn.execute(
+                "SELECT * FROM job_logs WHERE job_type = ? ORDER BY start_time DESC LIMIT ?", (job_type, limit)
+            )
+        return [dict(row) for row in rows]
+
+    @_timed("get_running_job_log")
+    def get_running_job_log(self, job_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        query = "SELECT * FROM job_logs WHERE status = 'running'"
+        params: tuple = ()
+        if job_type is not None:
+            query += " AND job_type = ?"
+            params = (job_type,)
+        row = self.conn.execute(query + " ORDER BY start_time DESC LIMIT 1", params).fetchone()
+        return dict(row) if row else None
+
+    def mark_interrupted_job_logs(self, job_type: str) -> int:
+        """Close out runs left 'running' by a process that died mid-job. Runs with open fetch tasks are
+        still in progress: whichever worker finishes their last task closes them."""
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE job_logs SET status = 'error', error_message = 'Interrupted before completion' "
+                "WHERE status = 'running' AND job_type = ? "
+                f"AND NOT EXISTS (SELECT 1 FROM fetch_tasks WHERE fetch_tasks.job_id = job_logs.job_id AND {OPEN_FETCH_TASK})",
+                (job_type,),
+            )
+        return cursor.rowcount
+
+    @_timed("get_job_steps")
+    def get_job_steps(self, job_id: str) -> List[Dict[str, Any]]:
+        rows = self.conn.execute(
+            f"SELECT {', '.join(JOB_STEP_COLUMNS)} FROM job_steps WHERE job_id = ? ORDER BY rowid", (job_id,)
+        )
+        return [dict(row) for row in rows]
+
+    @_timed("prune_job_logs")
+    def prune_job_logs(self, max_entries: int, max_age_days: int) -> int:
+        """Keep at most max_entries job logs, none older than max_age_days"""
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+        with self.conn:
+            expired = [
+                row[0] for row in self.conn.execute(
+                    "SELECT job_id FROM job_logs WHERE start_time < ? OR job_id IN "
+                    "(SELECT job_id FROM job_logs ORDER BY start_time DESC LIMIT -1 OFFSET ?)",
+                    (cutoff, max_entries),
+                )
+            ]
+            self.conn.executemany("DELETE FROM job_steps WHERE job_id = ?", ((job_id,) for job_id in expired))
+            self.conn.executemany(f"DELETE FROM fetch_tasks WHERE job_id = ? AND NOT {OPEN_FETCH_TASK}", ((job_id,) for job_id in expired))
+            self.conn.executemany("DELETE FROM job_logs WHERE job_id = ?", ((job_id,) for job_id in expired))
+        return len(expired)
+
+    def migrate_from_json(self):
+        """One-shot import of the legacy data/*.json files"""
+        with file_lock(self.path + ".migrate.lock"):
+            self._migrate_from_json()
+
+    def _migrate_from_json(self):
+        sources = [
+            ("users", settings.USERS_FILE, USER_COLUMNS, ()),
+            ("tracked_companies", settings.TRACKED_COMPANIES_FILE, TRACKED_COLUMNS, ("added_at",)),
+            ("reviews", settings.REVIEWS_FILE, REVIEW_COLUMNS, ("date",)),
+            ("job_logs", settings.LOGS_FILE, JOB_LOG_COLUMNS, ("start_time", "end_time")),
+        ]
+        for table, file_path, columns, date_columns in sources:
+            marker = f"json_migrated:{table}"
+            if self.conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+                continue
+            if not os.path.exists(file_path):
+                continue
+
+            records = read_json_file(file_path)
+            placeholders = ", ".join("?" for _ in columns)
+            with self.conn:
+                self.conn.executemany(
+                    f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                    (_row_values({**record, **{c: _iso_datetime(record.get(c)) for c in date_columns}}, columns) for record in records),
+                )
+                self.conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (marker, file_path))
+            logger.success(f"📦 Migrated {len(records)} records from {file_path} into {table}")
+
+
+BACKENDS = {
+    "sqlite": lambda: SQLiteStorage(settings.DATABASE_FILE),
+}
+
+_storage: Optional[Storage] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> Storage:
+    """Return the process-wide storage backend selected by STORAGE_BACKEND"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                if settings.STORAGE_BACKEND not in BACKENDS:
+                    raise ValueError(f"Unknown storage backend: {settings.STORAGE_BACKEND}")
+                _storage = BACKENDS[settings.STORAGE_BACKEND]()
+    return _storage
+
+
+def init_storage():
+    """Open the storage backend and import any legacy JSON data"""
+    storage = get_storage()
+    storage.migrate_from_json()
+    return storage
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["migrate"]:
+        print("Usage: python storage.py migrate")
+        sys.exit(1)
+    init_storage()
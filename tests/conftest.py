@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# Settings are read at import time, so point data and logs somewhere disposable first
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="company-review-tests-"))
+os.environ.setdefault("LOG_FILE", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """A fresh SQLite database standing in for the process-wide storage backend"""
+    import storage as storage_module
+    backend = storage_module.SQLiteStorage(str(tmp_path / "reviews.db"))
+    monkeypatch.setattr(storage_module, "_storage", backend)
+    return backend
+
+
+@pytest.fixture
+def index(storage):
+    """The process-wide review index, rebuilt from the fresh database"""
+    from services.review_index import review_index
+    review_index.load()
+    return review_index
+
+
+# Builders shared by the test modules; import them with `from conftest import ...`
+DOMAIN = "example.com"
+
+
+def review_record(number, domain=DOMAIN, age_days=None, **fields):
+    """A review as storage takes it, with id r<number>. It is dated <number> days
+    into 2026, or age_days back from now when given."""
+    date = datetime.now() - timedelta(days=age_days) if age_days is not None else datetime(2026, 1, 1) + timedelta(days=number)
+    return {"id": f"r{number}", "company_domain": domain, "title": f"Review {number}", "content": "Fine", "rating": 4,
+            "date": date, "author": "someone", **fields}
+
+
+def make_review(number, domain=DOMAIN, age_days=None, **fields):
+    from models.review_models import Review
+    return Review(**review_record(number, domain, age_days, **fields))
+
+
+def track(storage, domain=DOMAIN, username="alice"):
+    storage.add_tracked_company({"user": username, "domain": domain, "name": domain, "added_at": datetime.now()})
+
+
+def job_log(job_id="job-1"):
+    from models.job_models import JobLog
+    return JobLog(job_id=job_id, job_type="review_fetch", status="running", start_time=datetime.now()).dict()
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+
+import utils
+from config import settings
+from services import auth_service
+from utils import create_access_token, get_password_hash
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    monkeypatch.setattr(auth_service, "_user_cache", {})
+    monkeypatch.setattr(auth_service, "_token_cache", {})
+
+
+def add_user(storage, username="alice", password="secret"):
+    storage.add_user({"username": username, "email": f"{username}@example.com", "password": "",
+                      "hashed_password": get_password_hash(password), "disabled": False})
+
+
+def test_users_are_read_from_storage_until_invalidated(storage, monkeypatch):
+    add_user(storage)
+    reads = []
+    get_user = storage.get_user
+    monkeypatch.setattr(storage, "get_user", lambda username: reads.append(username) or get_user(username))
+
+    assert auth_service.get_user("alice").email == "alice@example.com"
+    assert auth_service.get_user("alice") is auth_service.get_user("alice")
+    assert reads == ["alice"]
+    # Unknown users are not cached, so one added later is found
+    assert auth_service.get_user("bob") is None
+    assert auth_service.get_user("bob") is None
+    assert reads == ["alice", "bob", "bob"]
+
+    auth_service.invalidate_user("alice")
+    auth_service.get_user("alice")
+    assert reads == ["alice", "bob", "bob", "alice"]
+
+
+def test_token_claims_are_decoded_once_and_expire(monkeypatch):
+    decoded = []
+    decode_token_claims = auth_service.decode_token_claims
+    monkeypatch.setattr(auth_service, "decode_token_claims", lambda token: decoded.append(token) or decode_token_claims(token))
+    token = create_access_token({"sub": "alice"}, timedelta(minutes=5))
+
+    assert auth_service.get_token_username(token) == "alice"
+    assert auth_service.get_token_username(token) == "alice"
+    assert decoded == [token]
+    assert auth_service.get_token_username("not-a-token") is None
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 600)
+    assert auth_service.get_token_username(token) is None
+    assert token not in auth_service._token_cache
+
+
+def test_token_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "TOKEN_CACHE_SIZE", 3)
+    tokens = [create_access_token({"sub": f"user{i}"}) for i in range(5)]
+    for token in tokens:
+        auth_service.get_token_username(token)
+    # The oldest entries make room for the newest
+    assert list(auth_service._token_cache) == tokens[2:]
+
+
+def test_passwords_are_verified_off_the_event_loop(storage, monkeypatch):
+    add_user(storage)
+    threads = []
+    verify_password = utils.verify_password
+    monkeypatch.setattr(utils, "verify_password", lambda *args: threads.append(threading.current_thread().name) or verify_password(*args))
+
+    assert asyncio.run(auth_service.authenticate_user_async("alice", "secret")).username == "alice"
+    assert asyncio.run(auth_service.authenticate_user_async("alice", "wrong")) is False
+    assert asyncio.run(auth_service.authenticate_user_async("nobody", "secret")) is False
+    assert len(threads) == 2 and all(name.startswith("password-hash") for name in threads)
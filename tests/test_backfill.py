@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+
+from conftest import job_log, make_review, track
+from models.job_models import DomainSyncState
+from services import job_service
+
+
+def older_pages(pages):
+    """fetch_review_page stand-in serving the given pages of older reviews, then an empty one"""
+    def fetch(domain, page=1, timeout=None):
+        return pages.get(domain, {}).get(page, [])
+    return fetch
+
+
+def test_counts_only_the_reviews_it_inserts(storage, index, monkeypatch):
+    page = [make_review(10, "a.com", age_days=10), make_review(11, "a.com", age_days=11)]
+    monkeypatch.setattr(job_service, "fetch_review_page", older_pages({"a.com": {2: page}}))
+    # Stored by forward sync in another process, so not in this index yet
+    storage.add_reviews([page[0].dict()])
+
+    stored = job_service.backfill_domain(DomainSyncState(domain="a.com"), None)
+
+    assert stored == 1
+    assert storage.count_reviews() == 2
+    state = storage.get_sync_state("a.com")
+    assert state["backfill_page"] == 3
+    assert state["backfill_complete"]
+
+
+def test_skips_domains_being_fetched(storage, index, monkeypatch):
+    track(storage, "a.com")
+    monkeypatch.setattr(job_service, "fetch_review_page", lambda *args, **kwargs: pytest.fail("domain with an open fetch task was backfilled"))
+    storage.enqueue_fetch_tasks(job_log(), ["a.com"])
+
+    job_service.backfill_reviews_for_tracked_companies()
+
+    assert storage.get_sync_state("a.com") is None
+
+
+def test_storage_error_only_stops_its_domain(storage, index, monkeypatch):
+    track(storage, "a.com")
+    track(storage, "b.com")
+    monkeypatch.setattr(job_service, "fetch_review_page", older_pages({
+        "a.com": {2: [make_review(10, "a.com", age_days=10)]},
+        "b.com": {2: [make_review(20, "b.com", age_days=20)]},
+    }))
+    add_reviews = storage.add_reviews
+
+    def locked_for_a(reviews):
+        reviews = list(reviews)
+        if reviews[0]["company_domain"] == "a.com":
+            raise sqlite3.OperationalError("database is locked")
+        return add_reviews(reviews)
+
+    monkeypatch.setattr(storage, "add_reviews", locked_for_a)
+    job_service.backfill_reviews_for_tracked_companies()
+
+    # a.com keeps its cursor for the next run; b.com is backfilled regardless
+    assert storage.get_sync_state("a.com") is None
+    assert storage.get_sync_state("b.com")["backfill_complete"]
+    assert [r.id for r in index.get_reviews("b.com")] == ["r20"]
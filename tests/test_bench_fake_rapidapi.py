@@ -0,0 +1,67 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+from bench import synthetic
+from bench.fake_rapidapi import FakeRapidAPI, make_handler
+from utils import parse_companies, parse_reviews
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def serve(**options):
+        defaults = dict(companies=3, reviews=100, new_reviews=5, latency_ms=0, jitter_ms=0, error_rate=0, rate_limit_rate=0, quota=0, seed=1)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(FakeRapidAPI(**{**defaults, **options})))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_review_pages_put_new_reviews_on_top_of_the_generated_ones(serve):
+    base_url = serve()
+    domain = synthetic.company_domain(0)
+    stored = synthetic.review_counts(3, 100)[0]
+
+    def page(number, company_domain=domain):
+        response = requests.get(f"{base_url}/company-reviews", params={"company_domain": company_domain, "page": number})
+        assert response.status_code == 200
+        return parse_reviews(company_domain, response.json())
+
+    first, second = page(1), page(2)
+    assert len(first) == len(second) == synthetic.PAGE_SIZE
+    ids = [review.id for review in first + second]
+    # Newest first: the five the generator did not store, then the stored ones it wrote
+    assert ids == [f"{domain}-{k}" for k in range(stored + 4, stored + 4 - 2 * synthetic.PAGE_SIZE, -1)]
+    dates = [review.date for review in first + second]
+    assert dates == sorted(dates, reverse=True)
+    assert second[0].title == synthetic.review(domain, stored + 4 - synthetic.PAGE_SIZE, stored)["title"]
+    assert page(1, "unknown.com") == []
+
+
+def test_search_is_deterministic(serve):
+    base_url = serve()
+    results = [parse_companies(requests.get(f"{base_url}/company-search", params={"query": "Acme"}).json()) for _ in range(2)]
+    assert results[0] == results[1]
+    assert {company.domain for company in results[0]} <= {synthetic.company_domain(i) for i in range(3)}
+
+
+def test_quota_and_errors_are_injected(serve):
+    limited = serve(quota=2)
+    statuses = []
+    for _ in range(3):
+        response = requests.get(f"{limited}/company-search", params={"query": "x"})
+        statuses.append((response.status_code, response.headers["x-ratelimit-requests-remaining"]))
+    assert statuses == [(200, "1"), (200, "0"), (429, "0")]
+    assert response.headers["retry-after"] == "1"
+
+    failing = serve(error_rate=1)
+    assert requests.get(f"{failing}/company-search", params={"query": "x"}).status_code == 500
@@ -0,0 +1,55 @@
+import pytest
+from fastapi import HTTPException
+
+from conftest import DOMAIN, review_record, track
+from config import settings
+from models.company_models import BulkTrackRequest, Company
+from models.review_models import LatestReviewsRequest
+from services.company_service import bulk_update_tracking
+from services.review_service import get_latest_reviews
+
+
+def company(domain):
+    return Company(domain=domain, name=domain, website=f"https://{domain}")
+
+
+def test_bulk_tracking_reports_each_item(storage, index):
+    track(storage, "old.com")
+    track(storage, "gone.com")
+    request = BulkTrackRequest(track=[company("new.com"), company("old.com"), company(" ")], untrack=["gone.com", "never.com"])
+
+    response = bulk_update_tracking(request, "alice")
+
+    assert [(r.domain, r.action, r.status) for r in response.results] == [
+        ("new.com", "track", "tracked"),
+        ("old.com", "track", "already_tracked"),
+        (" ", "track", "invalid"),
+        ("gone.com", "untrack", "untracked"),
+        ("never.com", "untrack", "not_tracked"),
+    ]
+    assert (response.tracked, response.untracked) == (1, 1)
+    assert {tc["domain"] for tc in storage.get_tracked_companies("alice")} == {"new.com", "old.com"}
+    # The index follows without a storage round trip
+    assert index.is_tracked("alice", "new.com", check_storage=False)
+    assert not index.is_tracked("alice", "gone.com", check_storage=False)
+
+
+def test_bulk_requests_are_capped(storage, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_MAX_ITEMS", 2)
+    with pytest.raises(HTTPException) as too_many:
+        bulk_update_tracking(BulkTrackRequest(track=[company("a.com"), company("b.com")], untrack=["c.com"]), "alice")
+    assert too_many.value.status_code == 400
+    with pytest.raises(HTTPException):
+        get_latest_reviews(LatestReviewsRequest(domains=["a.com", "b.com", "c.com"]), "alice")
+
+
+def test_latest_reviews_per_tracked_domain(storage, index):
+    track(storage)
+    track(storage, "quiet.com")
+    storage.add_reviews([review_record(i) for i in range(1, 5)])
+    index.refresh()
+
+    latest = get_latest_reviews(LatestReviewsRequest(domains=[DOMAIN, "quiet.com", "other.com", DOMAIN], limit=3), "alice")
+
+    assert {domain: [r.id for r in reviews] for domain, reviews in latest.reviews.items()} == {DOMAIN: ["r4", "r3", "r2"], "quiet.com": []}
+    assert latest.untracked == ["other.com"]
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from cache import TTLCache
+
+
+def test_hit_miss_and_expiry(monkeypatch):
+    cache = TTLCache(max_size=10, ttl_seconds=60)
+    calls = []
+
+    def load():
+        calls.append(1)
+        return "value"
+
+    assert cache.get_or_load("key", load) == "value"
+    assert cache.get_or_load("key", load) == "value"
+    assert len(calls) == 1
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert cache.get_or_load("key", load) == "value"
+    assert len(calls) == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 2, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.get_or_load("a", lambda: 1)
+    cache.get_or_load("b", lambda: 2)
+    cache.get_or_load("a", lambda: 1)
+    cache.get_or_load("c", lambda: 3)
+
+    assert cache.get_or_load("a", lambda: "reloaded") == 1
+    assert cache.get_or_load("b", lambda: "reloaded") == "reloaded"
+    assert cache.stats()["evictions"] == 2
+
+
+def test_concurrent_sync_callers_share_one_load():
+    cache = TTLCache(max_size=10, ttl_seconds=60)
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        release.wait(1)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("key", load))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+
+
+def test_loader_error_reaches_waiters_and_is_not_cached():
+    cache = TTLCache(max_size=10, ttl_seconds=60)
+
+    async def run():
+        started = asyncio.Event()
+
+        async def failing():
+            started.set()
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream down")
+
+        loader = asyncio.ensure_future(cache.get_or_load_async("key", failing))
+        await started.wait()
+        waiter = asyncio.ensure_future(cache.get_or_load_async("key", failing))
+        results = await asyncio.gather(loader, waiter, return_exceptions=True)
+        return results, await cache.get_or_load_async("key", lambda: asyncio.sleep(0, "recovered"))
+
+    results, value = asyncio.run(run())
+    assert [type(r) for r in results] == [ValueError, ValueError]
+    assert value == "recovered"
+
+
+def test_cancelled_waiter_leaves_the_load_to_the_others():
+    cache = TTLCache(max_size=10, ttl_seconds=60)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "value"
+
+        loader = asyncio.ensure_future(cache.get_or_load_async("key", slow))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(cache.get_or_load_async("key", slow)) for _ in range(2)]
+        await asyncio.sleep(0)
+        # e.g. the client of the first waiter disconnected
+        waiters[0].cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await loader, await waiters[1], waiters[0]
+
+    loaded, waited, cancelled = asyncio.run(run())
+    assert (loaded, waited) == ("value", "value")
+    assert cancelled.cancelled()
+    assert cache.get_or_load("key", lambda: pytest.fail("result was not cached")) == "value"
@@ -0,0 +1,127 @@
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+
+from conftest import DOMAIN, job_log, make_review, review_record, track
+from config import settings
+from models.job_models import DomainSyncState, JobStep
+from services import job_service
+
+
+def finish(storage, task, owner):
+    step = JobStep(job_id=task["job_id"], domain=DOMAIN, status="success", started_at=datetime.now(), fetch_ms=1.0, store_ms=1.0, new_reviews=1)
+    state = DomainSyncState(domain=DOMAIN).dict()
+    return storage.finish_fetch_task(task["id"], owner, step.dict(), state, list(state))
+
+
+def test_expired_lease_is_taken_over_from_its_checkpoint(storage):
+    storage.enqueue_fetch_tasks(job_log(), [DOMAIN])
+    first = storage.lease_fetch_task("worker-a", 60)
+    assert storage.lease_fetch_task("worker-b", 60) is None
+
+    # Worker A commits a page, then stalls past its lease
+    assert storage.checkpoint_fetch_task(first["id"], "worker-a", {"page": 2}, [review_record(1)], lease_seconds=0) == 1
+    second = storage.lease_fetch_task("worker-b", 60)
+    assert second["id"] == first["id"]
+    assert second["attempts"] == 2
+    assert second["checkpoint"] == {"page": 2}
+
+    # The stale holder can neither store more progress nor close the task
+    assert storage.checkpoint_fetch_task(first["id"], "worker-a", {"page": 3}, [review_record(2)], 60) is None
+    assert not finish(storage, first, "worker-a")
+    assert storage.count_reviews() == 1
+    assert storage.get_job_log("job-1")["status"] == "running"
+
+    assert finish(storage, second, "worker-b")
+    assert storage.get_fetch_queue_counts() == {"done": 1}
+    assert storage.get_job_log("job-1")["status"] == "success"
+
+
+def test_task_whose_leases_keep_expiring_fails_its_run(storage, monkeypatch):
+    monkeypatch.setattr(settings, "FETCH_TASK_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(job_service, "fetch_review_page", lambda *args, **kwargs: pytest.fail("gave up task was fetched"))
+    storage.enqueue_fetch_tasks(job_log(), [DOMAIN])
+    for attempt in range(2):
+        # Each worker dies holding the lease
+        storage.lease_fetch_task(f"worker-{attempt}", 0)
+
+    task = storage.lease_fetch_task("worker-last", 60)
+    assert task["attempts"] == 3
+    assert job_service.run_fetch_task(task) == ("failed", 0)
+    assert storage.get_fetch_queue_counts() == {"failed": 1}
+    run = storage.get_job_log("job-1")
+    assert run["status"] == "error"
+    assert run["error_message"] == "1 fetch tasks failed"
+
+
+def test_unexpected_error_hands_the_task_back(storage, monkeypatch):
+    def locked(task):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(job_service, "run_fetch_task", locked)
+    storage.enqueue_fetch_tasks(job_log(), [DOMAIN, "other.com"])
+
+    outcomes, stored = job_service.drain_fetch_queue("worker")
+
+    assert outcomes == {"error": 1}
+    assert stored == 0
+    assert storage.get_fetch_queue_counts() == {"pending": 2}
+    assert storage.get_job_log("job-1")["status"] == "running"
+    assert job_service.fetch_run_status(outcomes) == "error"
+
+
+def test_slow_sync_is_requeued_from_its_checkpoint(storage, index, monkeypatch):
+    clock = [0.0]
+    pages = []
+
+    def slow_page(domain, page):
+        pages.append(page)
+        clock[0] += 100
+        return [make_review(page)] if page < 5 else []
+
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(job_service, "fetch_review_page", slow_page)
+    monkeypatch.setattr(settings, "FETCH_TASK_TIMEOUT_SECONDS", 250)
+    monkeypatch.setattr(settings, "FETCH_TASK_RETRY_SECONDS", 0)
+    storage.add_reviews([review_record(0)])
+    index.refresh()
+    storage.enqueue_fetch_tasks(job_log(), [DOMAIN])
+
+    assert job_service.run_fetch_task(storage.lease_fetch_task("worker", 60)) == ("timeout", 3)
+    assert pages == [1, 2, 3]
+
+    # The retry carries on at the next page without using up an attempt
+    task = storage.lease_fetch_task("worker", 60)
+    assert (task["attempts"], task["checkpoint"]["page"]) == (1, 4)
+    assert job_service.run_fetch_task(task) == ("done", 1)
+    assert pages == [1, 2, 3, 4, 5]
+    assert storage.get_fetch_queue_counts() == {"done": 1}
+
+
+@pytest.mark.parametrize("outcomes, status", [
+    ({"done": 3}, "success"),
+    ({"done": 2, "deferred": 1}, "partial"),
+    ({"done": 2, "retried": 1}, "partial"),
+    ({"done": 2, "timeout": 1}, "partial"),
+    ({"done": 1, "deferred": 1, "failed": 1}, "error"),
+])
+def test_run_status_reflects_task_outcomes(outcomes, status):
+    assert job_service.fetch_run_status(outcomes) == status
+
+
+def test_fetch_job_queues_each_tracked_domain_once(storage, monkeypatch):
+    monkeypatch.setattr(settings, "FETCH_QUEUE_INLINE", False)
+    for username in ("alice", "bob", "carol"):
+        track(storage, username=username)
+    track(storage, "newer.com", "bob")
+
+    domains = storage.get_tracked_domains()
+    assert [(d["domain"], d["subscribers"]) for d in domains] == [("newer.com", 1), (DOMAIN, 3)]
+
+    job_service.fetch_reviews_for_tracked_companies()
+    assert storage.get_fetch_queue_counts() == {"pending": 2}
+    leased = [storage.lease_fetch_task("worker", 60)["domain"] for _ in range(2)]
+    assert leased == ["newer.com", DOMAIN]
+    assert storage.lease_fetch_task("worker", 60) is None
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+from conftest import job_log
+from models.job_models import DomainSyncState, JobStep
+from services import job_service
+
+
+def run_task(storage, domain, new_reviews, error=None):
+    task = storage.lease_fetch_task("worker", 60)
+    assert task["domain"] == domain
+    step = JobStep(job_id=task["job_id"], domain=domain, status="error" if error else "success", started_at=datetime.now(),
+                   fetch_ms=12.5, store_ms=1.5, new_reviews=new_reviews)
+    state = DomainSyncState(domain=domain).dict()
+    assert storage.finish_fetch_task(task["id"], "worker", step.dict(), state, list(state), error)
+
+
+def started(job_id, days_ago):
+    return {**job_log(job_id), "start_time": datetime.now() - timedelta(days=days_ago)}
+
+
+def test_run_records_a_step_per_company_and_closes_with_the_last(storage):
+    storage.enqueue_fetch_tasks(job_log(), ["a.com", "b.com"])
+    run_task(storage, "a.com", 3)
+
+    current = job_service.get_current_job()
+    assert (current.job_id, current.status, current.companies_processed, current.reviews_fetched) == ("job-1", "running", 1, 3)
+
+    run_task(storage, "b.com", 0)
+    assert job_service.get_current_job() is None
+    job = job_service.get_job("job-1")
+    assert (job.status, job.companies_processed, job.reviews_fetched) == ("success", 2, 3)
+    assert [(step.domain, step.new_reviews, step.fetch_ms) for step in job.steps] == [("a.com", 3, 12.5), ("b.com", 0, 12.5)]
+    assert job_service.get_job("missing") is None
+
+
+def test_history_is_newest_first_and_filtered_by_type(storage):
+    for job_id, days_ago in (("job-1", 3), ("job-2", 2), ("job-3", 1)):
+        storage.enqueue_fetch_tasks(started(job_id, days_ago), [f"{job_id}.com"])
+
+    assert [job.job_id for job in job_service.get_job_history(2)] == ["job-3", "job-2"]
+    assert [job.job_id for job in job_service.get_job_history(job_type="review_fetch")] == ["job-3", "job-2", "job-1"]
+    assert job_service.get_job_history(job_type="review_backfill") == []
+
+
+def test_prune_keeps_the_newest_runs_and_open_tasks(storage):
+    storage.enqueue_fetch_tasks(started("ancient", 40), ["ancient.com"])
+    for job_id, days_ago in (("job-1", 3), ("job-2", 2), ("job-3", 1)):
+        storage.enqueue_fetch_tasks(started(job_id, days_ago), [f"{job_id}.com"])
+    # The ancient run finishes; job-1's task is still open
+    run_task(storage, "ancient.com", 1)
+
+    assert storage.prune_job_logs(max_entries=2, max_age_days=30) == 2
+    assert [job.job_id for job in job_service.get_job_history()] == ["job-3", "job-2"]
+    assert storage.get_job_steps("ancient") == []
+    # A pruned run's unfinished task is still fetched
+    assert storage.get_fetch_queue_counts() == {"pending": 3}
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+from leader import SchedulerLease
+
+HOLD_LEASE = """
+import sys
+from leader import SchedulerLease
+assert SchedulerLease(sys.argv[1]).acquire()
+print("held", flush=True)
+sys.stdin.read()
+"""
+
+
+def test_one_holder_at_a_time(tmp_path):
+    path = str(tmp_path / "locks" / "scheduler.lock")
+    first, second = SchedulerLease(path), SchedulerLease(path)
+
+    assert first.acquire() and first.held
+    assert first.acquire()
+    assert not second.acquire() and not second.held
+    with open(path) as f:
+        assert f.read() == f"{os.getpid()}\n"
+
+    first.release()
+    assert not first.held
+    assert second.acquire()
+    second.release()
+
+
+def test_lease_of_a_dead_worker_is_taken_over(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    holder = subprocess.Popen([sys.executable, "-c", HOLD_LEASE, path], cwd=root, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline() == "held\n"
+        lease = SchedulerLease(path)
+        assert not lease.acquire()
+
+        holder.kill()
+        holder.wait()
+        assert lease.acquire()
+        lease.release()
+    finally:
+        holder.kill()
+        holder.wait()
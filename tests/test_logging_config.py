@@ -0,0 +1,26 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from logging_config import PoolWorkerContext
+
+
+def _handler_levels():
+    """Run configure_logging in this process and report the levels of loguru's handlers"""
+    from loguru import logger
+    from logging_config import configure_logging
+    configure_logging()
+    return sorted(handler.levelno for handler in logger._core.handlers.values())
+
+
+def test_spawned_api_worker_configures_logging():
+    # uvicorn --workers starts API workers through the spawn context
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        levels = pool.submit(_handler_levels).result()
+    # Only the stdout sink at LOG_INFO (LOG_FILE is empty in tests), not loguru's default DEBUG handler
+    assert levels == [20]
+
+
+def test_pool_worker_keeps_default_handler():
+    with ProcessPoolExecutor(max_workers=1, mp_context=PoolWorkerContext()) as pool:
+        levels = pool.submit(_handler_levels).result()
+    assert levels == [10]
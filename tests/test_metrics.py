@@ -0,0 +1,73 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import metrics
+from metrics import Counter, Histogram, MetricsMiddleware, Registry
+from routes.metrics import router as metrics_router
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = Registry()
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    return registry
+
+
+def test_histogram_renders_cumulative_buckets(registry):
+    latency = Histogram("test_latency_seconds", "Test latency", ["route"], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        latency.labels("/a").observe(value)
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP test_latency_seconds Test latency", "# TYPE test_latency_seconds histogram"]
+    assert lines[2:] == [
+        'test_latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'test_latency_seconds_bucket{route="/a",le="1.0"} 3',
+        'test_latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'test_latency_seconds_sum{route="/a"} 4.25',
+        'test_latency_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_counter_escapes_label_values_and_checks_their_number(registry):
+    errors = Counter("test_errors_total", "Test errors", ["message"])
+    errors.labels('say "hi"\n').inc(2)
+
+    assert 'test_errors_total{message="say \\"hi\\"\\n"} 2.0' in registry.render().splitlines()
+    with pytest.raises(ValueError):
+        errors.labels("a", "b")
+
+
+def test_requests_are_timed_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    client = TestClient(app)
+
+    def count(route, status):
+        return metrics.HTTP_REQUEST_DURATION.labels("GET", route, status).count
+
+    items, missing = count("/items/{item_id}", "200"), count("unmatched", "404")
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/nowhere")
+    assert count("/items/{item_id}", "200") == items + 2
+    assert count("unmatched", "404") == missing + 1
+    assert metrics.HTTP_REQUESTS_IN_FLIGHT.labels("GET", "/items/{item_id}").value == 0
+
+    scrape = client.get("/metrics")
+    assert scrape.headers["content-type"].startswith("text/plain")
+    assert f'http_request_duration_seconds_count{{method="GET",route="/items/{{item_id}}",status="200"}} {items + 2}' in scrape.text
+
+
+def test_cache_hit_ratio_counts_coalesced_waits_as_hits(monkeypatch):
+    monkeypatch.setattr(metrics.CACHE_LOOKUPS, "_children", {})
+    for result, times in (("hit", 5), ("coalesced", 1), ("miss", 2)):
+        metrics.CACHE_LOOKUPS.labels("test", result).inc(times)
+    assert metrics.CACHE_HIT_RATIO.callback()[("test",)] == 0.75
@@ -0,0 +1,63 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from conftest import DOMAIN, make_review, review_record, track
+from services.review_analytics import DomainAnalytics, bucket_start, previous_bucket
+from services.review_service import get_review_analytics_async
+
+NOW = datetime(2026, 3, 18, 12, 0, tzinfo=timezone.utc)  # a Wednesday
+
+
+def days_ago(number, days, rating):
+    return make_review(number, date=NOW - timedelta(days=days), rating=rating)
+
+
+def test_buckets_start_on_mondays_and_first_days():
+    assert bucket_start(date(2026, 3, 18), "week") == date(2026, 3, 16)
+    assert bucket_start(date(2026, 3, 18), "month") == date(2026, 3, 1)
+    assert previous_bucket(date(2026, 3, 1), "month") == date(2026, 2, 1)
+    assert previous_bucket(date(2026, 3, 16), "week") == date(2026, 3, 9)
+
+
+def test_totals_histogram_and_rolling_windows():
+    analytics = DomainAnalytics()
+    analytics.add([days_ago(1, 0, 5), days_ago(2, 3, 4), days_ago(3, 20, 1)])
+    analytics.add([days_ago(4, 60, 2), days_ago(5, 200, 9)])  # out-of-range ratings are clamped
+
+    snapshot = analytics.snapshot(DOMAIN, NOW)
+    assert (snapshot.total_reviews, snapshot.average_rating) == (5, 3.4)
+    assert snapshot.rating_histogram == {1: 1, 2: 1, 3: 0, 4: 1, 5: 2}
+    assert snapshot.first_review_at == NOW - timedelta(days=200)
+    assert snapshot.last_review_at == NOW
+    assert [(r.days, r.count, r.average_rating) for r in snapshot.rolling] == [(7, 2, 4.5), (30, 3, 3.333), (90, 4, 3.0)]
+
+
+def test_series_ends_with_the_current_period_and_fills_gaps():
+    analytics = DomainAnalytics()
+    analytics.add([days_ago(1, 0, 5), days_ago(2, 1, 3), days_ago(3, 14, 2)])
+
+    series = analytics.snapshot(DOMAIN, NOW, "week", 3).series
+    assert [(p.period_start, p.count, p.average_rating) for p in series] == [
+        (date(2026, 3, 2), 1, 2.0),
+        (date(2026, 3, 9), 0, None),
+        (date(2026, 3, 16), 2, 4.0),
+    ]
+    assert [p.period_start for p in analytics.snapshot(DOMAIN, NOW, "month", 2).series] == [date(2026, 2, 1), date(2026, 3, 1)]
+
+
+def test_ingest_updates_a_tracked_domains_analytics(storage, index):
+    track(storage)
+    storage.add_reviews([review_record(1, rating=2), review_record(2, rating=4)])
+    index.refresh()
+
+    analytics = asyncio.run(get_review_analytics_async(DOMAIN, "alice"))
+    assert (analytics.total_reviews, analytics.average_rating) == (2, 3.0)
+    index.add_reviews(DOMAIN, [make_review(3, rating=5)])
+    assert asyncio.run(get_review_analytics_async(DOMAIN, "alice")).total_reviews == 3
+
+    with pytest.raises(HTTPException) as untracked:
+        asyncio.run(get_review_analytics_async(DOMAIN, "bob"))
+    assert untracked.value.status_code == 403
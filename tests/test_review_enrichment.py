@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from conftest import DOMAIN, review_record
+from services.review_enrichment import LEXICON, enrich_batch, extract_keywords, score_sentiment
+from services.review_search import TOKEN_PATTERN
+
+
+def tokens(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def test_sentiment_follows_the_lexicon_negation_and_intensifiers():
+    good, good_label = score_sentiment([], tokens("the support was good"), LEXICON)
+    very_good, _ = score_sentiment([], tokens("the support was very good"), LEXICON)
+    not_good, not_good_label = score_sentiment([], tokens("the support was not good"), LEXICON)
+
+    assert good_label == "positive" and 0 < good < very_good < 1
+    assert not_good_label == "negative"
+    assert score_sentiment([], tokens("the parcel arrived on tuesday"), LEXICON) == (0.0, "neutral")
+
+
+def test_keywords_skip_opinion_and_filler_words_and_weight_the_title():
+    keywords = extract_keywords(tokens("Delivery"), tokens("great delivery, the courier and the courier app"), LEXICON, 2)
+    assert keywords == ["delivery", "courier"]
+
+
+def test_enrich_batch_scores_each_review():
+    enriched = enrich_batch([("r1", "Terrible", "Awful refund process"), ("r2", "Great", "Loved it")])
+    assert [(e["review_id"], e["sentiment_label"]) for e in enriched] == [("r1", "negative"), ("r2", "positive")]
+    assert enriched[0]["keywords"] == ["process"]
+
+
+def enrich(storage, review_id, sentiment, label, keywords):
+    storage.save_enrichments([{"review_id": review_id, "sentiment": sentiment, "sentiment_label": label,
+                               "keywords": keywords, "version": 1, "enriched_at": datetime.now()}])
+
+
+def test_stored_enrichments_reach_a_new_snapshot_and_search(storage, index):
+    storage.add_reviews([review_record(1, content="Courier lost the parcel"), review_record(2)])
+    index.refresh()
+    before = index.get_domain(DOMAIN)
+
+    enrich(storage, "r1", -0.6, "negative", ["courier", "parcel"])
+    index.refresh()
+    after = index.get_domain(DOMAIN)
+
+    assert after.version == before.version + 1
+    assert (after.reviews[0].sentiment_label, after.reviews[0].keywords) == ("negative", ["courier", "parcel"])
+    # The snapshot readers already hold is left as it was
+    assert before.reviews[0].sentiment_label is None and before.reviews[0].keywords is None
+    # Untouched reviews are shared between the snapshots
+    assert after.reviews[1] is before.reviews[1]
+
+    [hit] = index.search.search(["parcel"], [DOMAIN])
+    assert hit.review.sentiment_label == "negative"
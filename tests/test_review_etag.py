@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from conftest import DOMAIN, make_review, review_record, track
+from models.auth_models import UserInDB
+from responses import FastJSONResponse
+from routes import review as review_routes
+from services import review_service
+from services.auth_service import get_current_active_user
+
+@pytest.fixture
+def client(storage, index):
+    track(storage)
+    storage.add_reviews([review_record(1)])
+    index.refresh()
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.include_router(review_routes.router)
+    app.dependency_overrides[get_current_active_user] = lambda: UserInDB(
+        username="alice", email="alice@example.com", password="", hashed_password="")
+    return TestClient(app)
+
+
+def ingest(index, *reviews):
+    index.add_reviews(DOMAIN, reviews)
+
+
+def test_unchanged_poll_gets_304_and_ingest_changes_the_etag(client, index):
+    first = client.get(f"/reviews/{DOMAIN}", params={"limit": 10})
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    again = client.get(f"/reviews/{DOMAIN}", params={"limit": 10}, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+
+    ingest(index, make_review(2))
+    changed = client.get(f"/reviews/{DOMAIN}", params={"limit": 10}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert [r["id"] for r in changed.json()] == ["r2", "r1"]
+
+
+def test_etag_matches_the_snapshot_the_body_was_rendered_from(client, index, monkeypatch):
+    get_domain_reviews = review_routes.get_domain_reviews_async
+
+    async def ingest_after_snapshot(domain, username):
+        # An ingest landing between the snapshot and the ETag
+        snapshot = await get_domain_reviews(domain, username)
+        ingest(index, make_review(2))
+        return snapshot
+
+    monkeypatch.setattr(review_routes, "get_domain_reviews_async", ingest_after_snapshot)
+    stale = client.get(f"/reviews/{DOMAIN}", params={"limit": 10})
+    monkeypatch.setattr(review_routes, "get_domain_reviews_async", get_domain_reviews)
+    assert [r["id"] for r in stale.json()] == ["r1"]
+
+    # The stale body's ETag must not match the current content, nor hand its body out from the page cache
+    current = client.get(f"/reviews/{DOMAIN}", params={"limit": 10}, headers={"If-None-Match": stale.headers["etag"]})
+    assert current.status_code == 200
+    assert [r["id"] for r in current.json()] == ["r2", "r1"]
+
+
+def test_if_none_match_compares_whole_tags(client):
+    etag = client.get(f"/reviews/{DOMAIN}", params={"limit": 10}).headers["etag"]
+
+    def status(if_none_match):
+        return client.get(f"/reviews/{DOMAIN}", params={"limit": 10}, headers={"If-None-Match": if_none_match}).status_code
+
+    assert status(f'"other", W/{etag}') == 304
+    assert status("*") == 304
+    # A list that merely contains the tag as a substring is not a match
+    assert status(etag[:-1] + 'a"') == 200
+    assert status(f'"x{etag[1:]}') == 200
+
+
+@pytest.mark.parametrize("params", [{"limit": 10}, {}, {"format": "ndjson"}])
+def test_pages_are_queried_off_the_event_loop(client, monkeypatch, params):
+    query_reviews = review_service.query_reviews
+    threads = []
+
+    def recording_query_reviews(*args):
+        try:
+            asyncio.get_running_loop()
+            threads.append("event loop")
+        except RuntimeError:
+            threads.append("worker")
+        return query_reviews(*args)
+
+    monkeypatch.setattr(review_service, "query_reviews", recording_query_reviews)
+    monkeypatch.setattr(review_routes, "query_reviews", recording_query_reviews)
+    review_service.review_page_cache.clear()
+    assert client.get(f"/reviews/{DOMAIN}", params=params).status_code == 200
+    assert threads == ["worker"]
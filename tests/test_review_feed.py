@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+from conftest import make_review, review_record, track
+from services import review_service
+from services.review_feed import FeedEvent, ReviewFeed
+
+
+def events(*seqs):
+    return [FeedEvent(seq, make_review(seq)) for seq in seqs]
+
+
+def test_read_returns_events_after_the_cursor():
+    feed = ReviewFeed(buffer_size=10)
+    feed.reset(3)
+    feed.publish(events(4, 5, 6))
+
+    assert [e.seq for e in feed.read(3)] == [4, 5, 6]
+    assert [e.seq for e in feed.read(5)] == [6]
+    assert feed.read(6) == []
+    assert feed.last_seq == 6
+
+
+def test_cursor_behind_the_buffer_must_catch_up_from_storage():
+    feed = ReviewFeed(buffer_size=3)
+    feed.reset(3)
+    # Before the reset nothing was buffered
+    assert feed.read(2) is None
+
+    feed.publish(events(4, 5, 6, 7))
+    # 4 was evicted, so a cursor at 3 would silently miss it
+    assert feed.read(3) is None
+    assert [e.seq for e in feed.read(4)] == [5, 6, 7]
+
+
+def test_publish_from_another_thread_wakes_subscribers():
+    async def run():
+        feed = ReviewFeed(buffer_size=10)
+        wake = feed.subscribe()
+        try:
+            threading.Thread(target=feed.publish, args=(events(1),)).start()
+            await asyncio.wait_for(wake.wait(), 1)
+        finally:
+            feed.unsubscribe(wake)
+        return feed.read(0)
+
+    assert [e.seq for e in asyncio.run(run())] == [1]
+
+
+def test_stream_replays_from_storage_then_goes_live(storage, index):
+    track(storage)
+    storage.add_reviews([review_record(1), review_record(2), review_record(3, "other.com")])
+    index.load()
+
+    async def run():
+        stream = review_service.stream_review_events("alice", 0)
+        received = [await stream.__anext__()]
+        # Seq 0 is behind the freshly reset feed, so the first batch comes from storage
+        received.append(await asyncio.wait_for(stream.__anext__(), 1))
+        index.feed.publish([FeedEvent(4, make_review(4, "other.com")), FeedEvent(5, make_review(5))])
+        received.append(await asyncio.wait_for(stream.__anext__(), 1))
+        await stream.aclose()
+        return received
+
+    connected, catchup, live = asyncio.run(run())
+    assert connected == b": connected\n\n"
+    assert catchup.count(b"event: review") == 2
+    assert catchup.startswith(b"id: 1\n") and b"id: 2\n" in catchup and b"other.com" not in catchup
+    # Untracked domains are filtered out of the live events too
+    assert live.startswith(b"id: 5\n") and live.count(b"event: review") == 1
@@ -0,0 +1,39 @@
+from conftest import DOMAIN, make_review
+from services.review_index import review_sort_key
+
+
+def ids(entry):
+    return [review.id for review in entry.reviews]
+
+
+def test_newer_reviews_are_appended_to_a_new_snapshot(index):
+    index.add_reviews(DOMAIN, [make_review(2), make_review(1)])
+    before = index.get_domain(DOMAIN)
+
+    added = index.add_reviews(DOMAIN, [make_review(4), make_review(3), make_review(2)])
+    after = index.get_domain(DOMAIN)
+
+    assert [review.id for review in added] == ["r4", "r3"]
+    assert ids(after) == ["r1", "r2", "r3", "r4"]
+    assert after.keys == [review_sort_key(review) for review in after.reviews]
+    assert after.ids == {"r1", "r2", "r3", "r4"}
+    assert after.version == before.version + 1
+    # Readers holding the earlier snapshot keep seeing it unchanged
+    assert ids(before) == ["r1", "r2"] and before.ids == {"r1", "r2"}
+
+
+def test_backfilled_reviews_are_merged_in_order(index):
+    index.add_reviews(DOMAIN, [make_review(2), make_review(5), make_review(8)])
+    index.add_reviews(DOMAIN, [make_review(9), make_review(1), make_review(6)])
+    entry = index.get_domain(DOMAIN)
+
+    assert ids(entry) == ["r1", "r2", "r5", "r6", "r8", "r9"]
+    assert entry.keys == sorted(entry.keys) == [review_sort_key(review) for review in entry.reviews]
+
+
+def test_ingest_without_new_reviews_keeps_the_snapshot(index):
+    index.add_reviews(DOMAIN, [make_review(1)])
+    entry = index.get_domain(DOMAIN)
+
+    assert index.add_reviews(DOMAIN, [make_review(1)]) == []
+    assert index.get_domain(DOMAIN) is entry
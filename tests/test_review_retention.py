@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from conftest import DOMAIN, make_review, review_record, track
+from config import settings
+from services import job_service, review_service
+
+
+def test_compaction_archives_old_reviews_and_reads_them_back(storage, index, monkeypatch):
+    monkeypatch.setattr(settings, "REVIEW_HOT_WINDOW_DAYS", 30)
+    monkeypatch.setattr(settings, "REVIEW_ARCHIVE_SEGMENT_SIZE", 2)
+    track(storage)
+    old = [review_record(i, age_days=100 + i) for i in range(5)]
+    storage.add_reviews(old + [review_record(9, age_days=1)])
+    index.refresh()
+
+    job_service.compact_reviews()
+
+    assert storage.count_reviews() == 1
+    assert [r.id for r in index.get_reviews(DOMAIN)] == ["r9"]
+    archived = {record["id"]: record for record in storage.get_archived_reviews(DOMAIN)}
+    assert set(archived) == {r["id"] for r in old}
+    assert archived["r0"]["title"] == "Review 0"
+    assert archived["r0"]["date"] == old[0]["date"].isoformat()
+    # Segments hold two reviews each, oldest first; the one ending before the range is not read
+    since = (datetime.now() - timedelta(days=101)).date().isoformat()
+    assert {record["id"] for record in storage.get_archived_reviews(DOMAIN, since=since)} == {"r0", "r1", "r2"}
+
+    # A second run finds nothing left to move
+    job_service.compact_reviews()
+    assert len(storage.get_archived_reviews(DOMAIN)) == 5
+
+
+def test_fully_archived_domain_is_not_fetched_again(storage, index, monkeypatch):
+    monkeypatch.setattr(settings, "REVIEW_HOT_WINDOW_DAYS", 30)
+    track(storage)
+    storage.add_reviews([review_record(i, age_days=100) for i in range(3)])
+    index.refresh()
+    job_service.compact_reviews()
+    latest_seq = storage.get_latest_review_seq()
+
+    async def fetch(domain):
+        raise AssertionError("archived domain fetched from upstream")
+
+    monkeypatch.setattr(review_service, "async_get_company_reviews_api", fetch)
+    domain_reviews = asyncio.run(review_service.get_domain_reviews_async(DOMAIN, "alice"))
+
+    assert domain_reviews.reviews == []
+    assert storage.count_reviews() == 0
+    assert storage.get_latest_review_seq() == latest_seq
+
+
+def test_never_synced_domain_falls_back_to_upstream(storage, index, monkeypatch):
+    track(storage)
+    fetched = [make_review(1, age_days=1)]
+
+    async def fetch(domain):
+        return fetched
+
+    monkeypatch.setattr(review_service, "async_get_company_reviews_api", fetch)
+    domain_reviews = asyncio.run(review_service.get_domain_reviews_async(DOMAIN, "alice"))
+
+    assert [r.id for r in domain_reviews.reviews] == ["r1"]
+    assert storage.count_reviews() == 1
+
+
+def test_compaction_leaves_rating_totals_unchanged(storage, index, monkeypatch):
+    monkeypatch.setattr(settings, "REVIEW_HOT_WINDOW_DAYS", 30)
+    track(storage)
+    storage.add_reviews([review_record(i, age_days=100 + i, rating=1 + i % 5) for i in range(4)] + [review_record(9, age_days=1, rating=5)])
+    index.refresh()
+
+    def totals():
+        analytics = index.get_analytics(DOMAIN).snapshot(DOMAIN, datetime.now().astimezone(), "month", 12)
+        return analytics.total_reviews, analytics.average_rating, analytics.rating_histogram, analytics.first_review_at, analytics.series
+
+    before = totals()
+    job_service.compact_reviews()
+    assert storage.count_reviews() == 1
+    assert totals() == before
+
+    # A restarted worker counts the archive as well
+    index.load()
+    assert totals() == before
+
+
+def test_purged_domain_leaves_the_rating_totals(storage, index, monkeypatch):
+    monkeypatch.setattr(settings, "UNTRACKED_REVIEWS_POLICY", "purge")
+    storage.add_reviews([review_record(1)])
+    index.refresh()
+    assert index.get_analytics(DOMAIN).count == 1
+
+    job_service.compact_reviews()
+    assert index.get_analytics(DOMAIN).count == 0
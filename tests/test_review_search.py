@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from conftest import DOMAIN, make_review, review_record, track
+from models.review_models import ReviewSearchQuery
+from services.review_search import ReviewSearchIndex, query_terms
+from services.review_service import search_reviews_async
+
+
+def test_query_terms_drop_stopwords_case_and_repeats():
+    assert query_terms("The Refund, the REFUND and my parcel_tracking") == ["refund", "parcel", "tracking"]
+
+
+def test_hits_contain_every_term_and_rank_by_bm25():
+    index = ReviewSearchIndex()
+    index.add(DOMAIN, [
+        make_review(1, title="Refund", content="Slow refund process"),
+        make_review(2, title="Delivery", content="The refund came after a slow delivery"),
+        make_review(3, title="Fine", content="Slow but fine"),
+    ])
+    index.add("other.com", [make_review(4, domain="other.com", title="Refund", content="Slow refund")])
+
+    hits = index.search(["slow", "refund"], [DOMAIN])
+    assert {hit.review.id for hit in hits} == {"r1", "r2"}
+    # Title matches weigh more
+    assert max(hits, key=lambda hit: hit.score).review.id == "r1"
+    assert index.search(["slow", "missing"], [DOMAIN]) == []
+    assert [hit.review.id for hit in index.search(["refund"], ["other.com"])] == ["r4"]
+
+
+def test_dropping_a_domain_forgets_its_postings():
+    index = ReviewSearchIndex()
+    index.add(DOMAIN, [make_review(1, content="Lost parcel")])
+    index.add("other.com", [make_review(2, domain="other.com", content="Parcel arrived")])
+    assert index.stats() == (2, 6)
+
+    index.drop(DOMAIN)
+    assert index.stats() == (1, 4)
+    assert index.search(["lost"], [DOMAIN]) == []
+    assert [hit.review.id for hit in index.search(["parcel"], ["other.com"])] == ["r2"]
+
+
+@pytest.fixture
+def searchable(storage, index):
+    track(storage)
+    track(storage, "other.com", "bob")
+    storage.add_reviews([
+        review_record(1, title="Courier", content="Courier was late", rating=2),
+        review_record(2, title="Great", content="Courier was quick", rating=5),
+        review_record(3, content="Courier lost it", rating=1),
+        review_record(4, domain="other.com", content="Courier again"),
+    ])
+    index.refresh()
+
+
+def search(username="alice", **query):
+    return asyncio.run(search_reviews_async(username, ReviewSearchQuery(**query)))
+
+
+def test_search_covers_only_the_users_tracked_domains(searchable):
+    hits, total = search(q="courier")
+    assert total == 3 and {hit.id for hit in hits} == {"r1", "r2", "r3"}
+    assert hits[0].id == "r1" and hits[0].score > hits[1].score
+
+    with pytest.raises(HTTPException) as untracked:
+        search(q="courier", domain="other.com")
+    assert untracked.value.status_code == 403
+    with pytest.raises(HTTPException) as no_terms:
+        search(q="the and")
+    assert no_terms.value.status_code == 400
+
+
+def test_search_filters_sorts_and_pages(searchable):
+    hits, total = search(q="courier", max_rating=2, sort="newest")
+    assert total == 2 and [hit.id for hit in hits] == ["r3", "r1"]
+
+    hits, total = search(q="courier", sort="newest", limit=1, offset=1)
+    assert total == 3 and [hit.id for hit in hits] == ["r2"]
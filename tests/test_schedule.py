@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from config import settings
+from models.company_models import TrackedDomain
+from models.job_models import DomainSyncState
+from services.schedule_service import plan_next_fetch, plan_retry, select_due_domains
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+@pytest.fixture(autouse=True)
+def intervals(monkeypatch):
+    monkeypatch.setattr(settings, "FETCH_MIN_INTERVAL_MINUTES", 5)
+    monkeypatch.setattr(settings, "FETCH_MAX_INTERVAL_MINUTES", 360)
+    monkeypatch.setattr(settings, "FETCH_BACKOFF_FACTOR", 2)
+    monkeypatch.setattr(settings, "TARGET_NEW_REVIEWS_PER_FETCH", 5)
+
+
+def tracked(domain):
+    return TrackedDomain(domain=domain, name=domain, subscribers=1, latest_added_at=NOW)
+
+
+def due_in(domain, minutes):
+    return DomainSyncState(domain=domain, next_due_at=NOW + timedelta(minutes=minutes))
+
+
+def test_never_fetched_domains_come_first_then_the_most_overdue(monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_MAX_DOMAINS_PER_TICK", 3)
+    domains = [tracked(d) for d in ("new.com", "late.com", "later.com", "fresh.com", "newer.com")]
+    states = {"late.com": due_in("late.com", -5), "later.com": due_in("later.com", -60), "fresh.com": due_in("fresh.com", 10)}
+
+    due = select_due_domains(domains, states, NOW)
+    assert [d.domain for d in due] == ["new.com", "newer.com", "later.com"]
+
+
+def test_new_domain_is_checked_again_soon():
+    state = DomainSyncState(domain="new.com")
+    plan_next_fetch(state, 20, NOW)
+    assert state.interval_seconds == 5 * 60
+    assert state.last_checked_at == NOW
+    assert NOW + timedelta(minutes=4.5) <= state.next_due_at <= NOW + timedelta(minutes=5.5)
+
+
+def test_busy_domain_is_polled_at_its_review_velocity():
+    state = DomainSyncState(domain="busy.com", last_checked_at=NOW - timedelta(hours=1), interval_seconds=3600, review_velocity=10)
+    plan_next_fetch(state, 10, NOW)
+    assert state.review_velocity == pytest.approx(10)
+    # Five reviews at ten an hour
+    assert state.interval_seconds == pytest.approx(1800)
+
+
+def test_quiet_domain_backs_off_up_to_the_maximum():
+    state = DomainSyncState(domain="quiet.com", last_checked_at=NOW - timedelta(hours=1), interval_seconds=3600, review_velocity=1)
+    plan_next_fetch(state, 0, NOW)
+    assert state.interval_seconds == 7200
+    assert state.review_velocity == pytest.approx(0.7)
+
+    for _ in range(5):
+        plan_next_fetch(state, 0, state.last_checked_at + timedelta(seconds=state.interval_seconds))
+    assert state.interval_seconds == 360 * 60
+
+
+def test_retry_keeps_the_velocity():
+    state = DomainSyncState(domain="flaky.com", last_checked_at=NOW - timedelta(hours=1), interval_seconds=3600, review_velocity=4)
+    plan_retry(state, NOW)
+    assert (state.review_velocity, state.interval_seconds, state.last_checked_at) == (4, 3600, NOW - timedelta(hours=1))
+    assert NOW + timedelta(minutes=4.5) <= state.next_due_at <= NOW + timedelta(minutes=5.5)
@@ -0,0 +1,58 @@
+import json
+from datetime import datetime
+
+import pytest
+
+import storage as storage_module
+from conftest import review_record
+from config import settings
+
+
+def test_add_reviews_counts_only_new_rows(storage):
+    assert storage.add_reviews([review_record(1), review_record(2), review_record(3)]) == 3
+    assert storage.add_reviews([review_record(3), review_record(4)]) == 1
+    assert storage.add_reviews([review_record(4)]) == 0
+    assert storage.count_reviews() == 4
+    assert storage.get_latest_review_seq() == 4
+
+
+def test_backend_missing_a_method_fails_when_constructed():
+    class PartialStorage(storage_module.Storage):
+        def get_user(self, username):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialStorage()
+
+
+def test_json_import_writes_dates_like_new_rows(tmp_path, monkeypatch):
+    legacy = review_record(1)
+    for name in ("USERS_FILE", "TRACKED_COMPANIES_FILE", "LOGS_FILE"):
+        monkeypatch.setattr(settings, name, str(tmp_path / f"{name}.json"))
+    monkeypatch.setattr(settings, "REVIEWS_FILE", str(tmp_path / "reviews.json"))
+    # The JSON files were written with default=str
+    (tmp_path / "reviews.json").write_text(json.dumps([legacy], default=str))
+    backend = storage_module.SQLiteStorage(str(tmp_path / "reviews.db"))
+
+    backend.migrate_from_json()
+    backend.add_reviews([review_record(2)])
+
+    dates = [record["date"] for _, record in backend.get_reviews_since(0)]
+    assert dates == [legacy["date"].isoformat(), review_record(2)["date"].isoformat()]
+
+
+def test_schema_migration_rewrites_dates_of_earlier_imports(tmp_path, monkeypatch):
+    path = str(tmp_path / "reviews.db")
+    migrations = storage_module.MIGRATIONS
+    monkeypatch.setattr(storage_module, "MIGRATIONS", migrations[:8])
+    backend = storage_module.SQLiteStorage(path)
+    with backend.conn:
+        backend.conn.execute(
+            "INSERT INTO reviews (id, company_domain, title, content, rating, date, author) VALUES ('r1', 'example.com', 't', 'c', 4, ?, 'a')",
+            (str(datetime(2026, 1, 1, 9, 30)),),
+        )
+
+    monkeypatch.setattr(storage_module, "MIGRATIONS", migrations)
+    storage_module.SQLiteStorage(path)
+
+    assert [record["date"] for _, record in backend.get_reviews_since(0)] == ["2026-01-01T09:30:00"]
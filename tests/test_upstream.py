@@ -0,0 +1,167 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+
+import utils
+from upstream import BACKGROUND, INTERACTIVE, CircuitOpenError, MonthlyBudget, QuotaExhaustedError, UpstreamPolicy
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeSession:
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+    def get(self, url, params=None, timeout=None):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    policy = UpstreamPolicy()
+    policy.max_attempts = lambda priority: 1
+    monkeypatch.setattr(utils, "upstream_policy", policy)
+    return policy
+
+
+def half_open(policy):
+    breaker = policy.breaker
+    breaker.failures = breaker.failure_threshold
+    breaker.opened_at = time.monotonic() - breaker.cooldown_seconds - 1
+
+
+def test_breaker_opens_after_threshold_and_fails_fast(policy):
+    for _ in range(policy.breaker.failure_threshold):
+        policy.after_error()
+    assert policy.breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        policy.before_call(BACKGROUND)
+
+
+def test_only_one_trial_while_half_open(policy):
+    half_open(policy)
+    assert policy.before_call(BACKGROUND) is True
+    with pytest.raises(CircuitOpenError):
+        policy.before_call(BACKGROUND)
+    policy.after_response(200, {})
+    assert policy.before_call(BACKGROUND) is False
+
+
+def test_quota_refusal_does_not_claim_the_trial(policy):
+    policy.budget = MonthlyBudget(monthly_quota=10, reset_day=1, interactive_share=0.0)
+    policy.budget.remaining = 0
+    half_open(policy)
+    with pytest.raises(QuotaExhaustedError):
+        policy.before_call(BACKGROUND)
+    assert not policy.breaker.trial_in_flight
+    policy.budget.remaining = 5
+    assert policy.before_call(INTERACTIVE) is True
+
+
+def test_circuit_refusal_refunds_the_budget(policy):
+    policy.budget = MonthlyBudget(monthly_quota=10, reset_day=1, interactive_share=0.0)
+    for _ in range(policy.breaker.failure_threshold):
+        policy.after_error()
+    with pytest.raises(CircuitOpenError):
+        policy.before_call(INTERACTIVE)
+    assert policy.budget.remaining == 10
+
+
+def test_rate_limited_trial_releases_the_slot(policy, monkeypatch):
+    half_open(policy)
+    monkeypatch.setattr(utils, "get_http_session", lambda: FakeSession(FakeResponse(429, {"retry-after": "0"})))
+    assert utils.upstream_get("reviews", "http://upstream", {}, 1).status_code == 429
+    assert not policy.breaker.trial_in_flight
+    assert policy.before_call(BACKGROUND) is True
+
+
+def test_unexpected_error_in_trial_releases_the_slot(policy, monkeypatch):
+    half_open(policy)
+    monkeypatch.setattr(utils, "get_http_session", lambda: FakeSession(requests.exceptions.InvalidURL("bad")))
+    with pytest.raises(requests.exceptions.InvalidURL):
+        utils.upstream_get("reviews", "http://upstream", {}, 1)
+    assert not policy.breaker.trial_in_flight
+
+
+def test_cancelled_trial_releases_the_slot(policy, monkeypatch):
+    half_open(policy)
+
+    class SlowClient:
+        async def get(self, url, params=None):
+            await asyncio.sleep(10)
+
+    monkeypatch.setattr(utils, "get_async_http_client", lambda: SlowClient())
+
+    async def cancel_mid_call():
+        task = asyncio.create_task(utils.async_upstream_get("search", "http://upstream", {}))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_mid_call())
+    assert not policy.breaker.trial_in_flight
+
+
+def test_failed_trial_reopens_the_circuit(policy, monkeypatch):
+    half_open(policy)
+    monkeypatch.setattr(utils, "get_http_session", lambda: FakeSession(requests.ConnectionError("down")))
+    with pytest.raises(requests.ConnectionError):
+        utils.upstream_get("reviews", "http://upstream", {}, 1)
+    assert policy.breaker.is_open
+
+
+def test_background_budget_paces_and_holds_back_interactive_share():
+    budget = MonthlyBudget(monthly_quota=1000, reset_day=1, interactive_share=0.5)
+    budget.remaining = 1000
+    # Only a share of what is left may be spent in the background, an hour's worth at a time
+    available = budget.background_calls_available()
+    assert 0 < available <= 500
+    budget.background_allowance = 0.5
+    with pytest.raises(QuotaExhaustedError):
+        budget.take(BACKGROUND)
+    budget.take(INTERACTIVE)
+    assert budget.remaining == 999
+
+
+def test_header_learned_quota_comes_back_when_the_period_rolls_over():
+    budget = MonthlyBudget(monthly_quota=0, reset_day=1, interactive_share=0.0)
+    budget.update_from_headers({"x-ratelimit-requests-remaining": "1", "x-ratelimit-requests-limit": "500", "x-ratelimit-requests-reset": "60"})
+    budget.take(INTERACTIVE)
+    with pytest.raises(QuotaExhaustedError):
+        budget.take(INTERACTIVE)
+
+    # The reported reset passes while nothing can be called to learn about the new period
+    budget.resets_at = datetime.now() - timedelta(seconds=1)
+    budget.take(INTERACTIVE)
+    assert budget.remaining == 499
+    assert budget.resets_at > datetime.now()
+
+
+@pytest.mark.parametrize("bad", ["", "n/a", "1e400", "-5", "nan"])
+def test_malformed_quota_headers_keep_the_previous_values(policy, bad):
+    policy.budget.update_from_headers({"x-ratelimit-requests-remaining": "100", "x-ratelimit-requests-limit": "500", "x-ratelimit-requests-reset": "60"})
+    resets_at = policy.budget.resets_at
+
+    assert policy.after_response(200, {
+        "x-ratelimit-requests-remaining": "99",
+        "x-ratelimit-requests-limit": bad,
+        "x-ratelimit-requests-reset": bad,
+        "x-ratelimit-remaining": "0",
+        "x-ratelimit-reset": bad,
+    }) is None
+    assert policy.budget.remaining == 99
+    assert policy.budget.limit == 500
+    assert policy.budget.resets_at == resets_at
+
+    policy.budget.update_from_headers({"x-ratelimit-requests-remaining": bad})
+    assert policy.budget.remaining == 99
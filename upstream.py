@@ -0,0 +1,360 @@
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Mapping, Optional
+
+from config import settings
+from metrics import UPSTREAM_CIRCUIT_OPEN, UPSTREAM_QUOTA_REMAINING, UPSTREAM_RATE_LIMIT
+
+INTERACTIVE = "interactive"  # request path: company search and the reviews fallback
+BACKGROUND = "background"  # scheduled fetch and backfill jobs
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """An upstream call refused locally, without contacting RapidAPI"""
+
+
+class CircuitOpenError(UpstreamError):
+    pass
+
+
+class QuotaExhaustedError(UpstreamError):
+    pass
+
+
+class TokenBucket:
+    """Rate limiter shared by every upstream call in the process.
+
+    The refill rate adapts: it halves on a 429 and creeps back up on success.
+    Background callers leave a few tokens for interactive ones and yield to
+    any interactive caller that is waiting.
+    """
+
+    def __init__(self, rate: float, capacity: float, min_rate: float, interactive_reserve: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity
+        self.interactive_reserve = interactive_reserve
+        self.tokens = capacity
+        self.paused_until = 0.0
+        self.interactive_waiting = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        UPSTREAM_RATE_LIMIT.labels().set(rate)
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, priority: str) -> float:
+        """Take a token and return 0, or return how long to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.paused_until:
+                return self.paused_until - now
+            needed = 1.0
+            if priority == BACKGROUND:
+                if self.interactive_waiting:
+                    return 0.05
+                needed += self.interactive_reserve
+            if self.tokens >= needed:
+                self.tokens -= 1
+                return 0.0
+            return (needed - self.tokens) / self.rate
+
+    def acquire(self, priority: str):
+        if priority == INTERACTIVE:
+            with self._lock:
+                self.interactive_waiting += 1
+        try:
+            while (wait := self.try_acquire(priority)) > 0:
+                time.sleep(wait)
+        finally:
+            if priority == INTERACTIVE:
+                with self._lock:
+                    self.interactive_waiting -= 1
+
+    async def acquire_async(self, priority: str):
+        if priority == INTERACTIVE:
+            with self._lock:
+                self.interactive_waiting += 1
+        try:
+            while (wait := self.try_acquire(priority)) > 0:
+                await asyncio.sleep(wait)
+        finally:
+            if priority == INTERACTIVE:
+                with self._lock:
+                    self.interactive_waiting -= 1
+
+    def on_success(self):
+        with self._lock:
+            # Additive increase back towards the configured rate
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+        UPSTREAM_RATE_LIMIT.labels().set(self.rate)
+
+    def on_rate_limited(self, retry_after: Optional[float]):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.paused_until = max(self.paused_until, time.monotonic() + (retry_after or 1 / self.rate))
+        UPSTREAM_RATE_LIMIT.labels().set(self.rate)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def scale(self, share: float):
+        """Shrink the rate and burst to a share of the configured ones"""
+        with self._lock:
+            self.max_rate *= share
+            self.rate = self.max_rate
+            self.min_rate *= share
+            self.capacity = max(self.capacity * share, 1.0)
+            self.tokens = min(self.tokens, self.capacity)
+        UPSTREAM_RATE_LIMIT.labels().set(self.rate)
+
+
+class MonthlyBudget:
+    """Spreads background calls evenly over what is left of the billing period.
+
+    The remaining quota and reset time come from RapidAPI's x-ratelimit-requests-*
+    headers when present, otherwise from UPSTREAM_MONTHLY_QUOTA and a local
+    call count. A share of the quota is held back for interactive calls.
+    """
+
+    def __init__(self, monthly_quota: int, reset_day: int, interactive_share: float):
+        self.monthly_quota = monthly_quota
+        self.reset_day = reset_day
+        self.interactive_share = interactive_share
+        self.limit = monthly_quota
+        self.remaining: Optional[int] = monthly_quota or None
+        self.resets_at = self._next_reset(datetime.now())
+        self.background_allowance: Optional[float] = None
+        self.share = 1.0  # of the background pace, when several processes spend the same quota
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _next_reset(self, now: datetime) -> datetime:
+        reset = now.replace(day=self.reset_day, hour=0, minute=0, second=0, microsecond=0)
+        if reset <= now:
+            reset = (reset + timedelta(days=32)).replace(day=self.reset_day)
+        return reset
+
+    @property
+    def enabled(self) -> bool:
+        return self.remaining is not None
+
+    def _roll_over(self, now: datetime):
+        """Start a new period once the reset time has passed, with the quota back in full: the configured
+        one, or the limit the headers reported. The next response's headers correct the reset guess."""
+        if now >= self.resets_at:
+            self.resets_at = self._next_reset(now)
+            self.remaining = self.monthly_quota or self.limit or self.remaining
+            UPSTREAM_QUOTA_REMAINING.labels().set(self.remaining)
+
+    def _background_rate(self, now: datetime) -> float:
+        """Background calls per second that would use up the spendable quota exactly at reset"""
+        self._roll_over(now)
+        reserve = (self.limit or self.remaining) * self.interactive_share
+        spendable = max(0.0, self.remaining - reserve)
+        return spendable * self.share / max((self.resets_at - now).total_seconds(), 1.0)
+
+    def _accrue(self):
+        """Add the background allowance earned since the last call, capped at an hour's worth"""
+        now = time.monotonic()
+        rate = self._background_rate(datetime.now())
+        cap = max(rate * 3600, 1.0) if rate > 0 else 0.0
+        if self.background_allowance is None:
+            # A fresh process starts with a full hour's allowance
+            self.background_allowance = cap
+        else:
+            self.background_allowance = min(self.background_allowance + (now - self._updated) * rate, cap)
+        self._updated = now
+
+    def background_calls_available(self) -> Optional[int]:
+        """Background calls that fit the plan right now, or None when no quota is configured"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._accrue()
+            return int(self.background_allowance)
+
+    def take(self, priority: str):
+        if not self.enabled:
+            return
+        with self._lock:
+            # An exhausted quota makes no calls, so no headers would ever report the new period
+            self._roll_over(datetime.now())
+            if self.remaining <= 0:
+                raise QuotaExhaustedError("Monthly RapidAPI quota used up")
+            if priority == BACKGROUND:
+                self._accrue()
+                if self.background_allowance < 1:
+                    raise QuotaExhaustedError("Background fetches are ahead of the monthly budget")
+                self.background_allowance -= 1
+            self.remaining -= 1
+            UPSTREAM_QUOTA_REMAINING.labels().set(self.remaining)
+
+    def refund(self, priority: str):
+        """Give back a call taken for one that was then refused locally"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if priority == BACKGROUND and self.background_allowance is not None:
+                self.background_allowance += 1
+            self.remaining += 1
+            UPSTREAM_QUOTA_REMAINING.labels().set(self.remaining)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Take the quota from the response headers; a header that is missing or malformed keeps the previous value"""
+        remaining = _header_number(headers, "x-ratelimit-requests-remaining")
+        if remaining is None:
+            return
+        limit = _header_number(headers, "x-ratelimit-requests-limit")
+        reset = _header_number(headers, "x-ratelimit-requests-reset")
+        with self._lock:
+            self.remaining = int(remaining)
+            if limit:
+                self.limit = int(limit)
+            if reset is not None:
+                self.resets_at = datetime.now() + timedelta(seconds=reset)
+            UPSTREAM_QUOTA_REMAINING.labels().set(self.remaining)
+
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream errors, then lets one trial call through after a cooldown"""
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are being refused; False once the cooldown allows a trial call"""
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown_seconds
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError if the call may not go ahead; returns whether it is the half-open trial"""
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            if time.monotonic() - self.opened_at < self.cooldown_seconds or self.trial_in_flight:
+                raise CircuitOpenError("RapidAPI circuit open after repeated failures")
+            # Half-open: this call is the trial
+            self.trial_in_flight = True
+            return True
+
+    def release_trial(self):
+        """End a trial call that gave no verdict (a 429, a cancellation, an unexpected error), so the next call can try"""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def on_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+        UPSTREAM_CIRCUIT_OPEN.labels().set(0)
+
+    def on_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                UPSTREAM_CIRCUIT_OPEN.labels().set(1)
+
+
+class UpstreamPolicy:
+    """Everything that decides whether, when and how often an upstream call is made"""
+
+    def __init__(self):
+        self.bucket = TokenBucket(
+            rate=settings.UPSTREAM_RATE_PER_SECOND,
+            capacity=settings.UPSTREAM_BURST,
+            min_rate=settings.UPSTREAM_MIN_RATE_PER_SECOND,
+            interactive_reserve=settings.UPSTREAM_INTERACTIVE_RESERVE_TOKENS,
+        )
+        self.budget = MonthlyBudget(settings.UPSTREAM_MONTHLY_QUOTA, settings.UPSTREAM_QUOTA_RESET_DAY, settings.UPSTREAM_INTERACTIVE_QUOTA_SHARE)
+        self.breaker = CircuitBreaker(settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_COOLDOWN_SECONDS)
+
+    def share_with(self, processes: int):
+        """Limit this process to its part of the rate and quota, as one of several fetch worker processes.
+        Fetch workers make no interactive calls, so nothing is held back for them."""
+        self.bucket.scale(1 / processes)
+        self.bucket.interactive_reserve = 0.0
+        self.budget.share = 1 / processes
+
+    @staticmethod
+    def max_attempts(priority: str) -> int:
+        # Interactive callers are waiting on a response, so they get fewer retries
+        retries = settings.UPSTREAM_INTERACTIVE_RETRIES if priority == INTERACTIVE else settings.UPSTREAM_MAX_RETRIES
+        return retries + 1
+
+    def before_call(self, priority: str) -> bool:
+        """Check the budget and the breaker; raises UpstreamError to skip the call.
+
+        Returns whether the call is the breaker's half-open trial, in which
+        case the caller must release_trial() once it is over, whatever happened.
+        """
+        # The budget goes first: refusing after claiming the trial slot would leave it claimed
+        self.budget.take(priority)
+        try:
+            return self.breaker.before_call()
+        except CircuitOpenError:
+            self.budget.refund(priority)
+            raise
+
+    def after_response(self, status_code: int, headers: Mapping[str, str]) -> Optional[float]:
+        """Record a response; returns the delay before retrying it, or None if it should not be retried"""
+        self.budget.update_from_headers(headers)
+        if status_code == 429:
+            retry_after = _retry_after(headers)
+            self.bucket.on_rate_limited(retry_after)
+            return retry_after or 0.0
+        if status_code >= 500:
+            self.breaker.on_failure()
+            return None if status_code not in RETRYABLE_STATUSES else 0.0
+        self.breaker.on_success()
+        self.bucket.on_success()
+        # Short-window limits, where the API sends them, pause the bucket until they reset
+        reset = _header_number(headers, "x-ratelimit-reset")
+        if headers.get("x-ratelimit-remaining") == "0" and reset is not None:
+            self.bucket.pause(reset)
+        return None
+
+    def after_error(self):
+        """Record a timeout or connection error"""
+        self.breaker.on_failure()
+
+    @staticmethod
+    def backoff(attempt: int, retry_after: Optional[float]) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After"""
+        delay = random.uniform(0, min(settings.UPSTREAM_BACKOFF_MAX_SECONDS, settings.UPSTREAM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    """A numeric header, or None when it is missing or not a finite, non-negative number"""
+    try:
+        value = float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return value if 0 <= value < float("inf") else None
+
+
+def _retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    return _header_number(headers, "retry-after")
+
+
+upstream_policy = UpstreamPolicy()
@@ -1,16 +1,27 @@
-import json
+import asyncio
+import fcntl
 import os
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 from jose import JWTError, jwt
+from pydantic import BaseModel
 from passlib.context import CryptContext
+import httpx
+import orjson
 import requests
+import requests.adapters
 from loguru import logger
 from config import settings
+from metrics import UPSTREAM_REQUEST_DURATION, UPSTREAM_RETRIES
 from models.auth_models import UserInDB
 from models.company_models import Company
 from models.review_models import Review
 from models.job_models import JobLog
+from upstream import BACKGROUND, INTERACTIVE, UpstreamError, upstream_policy
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -21,6 +32,13 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# bcrypt is deliberately slow, so keep it off the event loop on a dedicated pool
+password_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+async def verify_password_async(plain_password, hashed_password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, verify_password, plain_password, hashed_password)
+
 # JWT token functions
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -32,95 +50,226 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def decode_token(token: str):
+def decode_token_claims(token: str) -> Optional[Dict[str, Any]]:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+        if payload.get("sub") is None:
             return None
-        return username
+        return payload
     except JWTError:
         return None
 
 # Data storage functions
 def ensure_data_dir():
-    if not os.path.exists(settings.DATA_DIR):
-        os.makedirs(settings.DATA_DIR)
+    os.makedirs(settings.DATA_DIR, exist_ok=True)
+
+@contextmanager
+def file_lock(lock_path: str):
+    """Cross-process advisory lock held for the duration of the block"""
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# JSON encoding; pydantic models are dumped as they are, without revalidation
+def _json_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.dict()
+    return str(value)
+
+def json_dumps(data: Any) -> bytes:
+    return orjson.dumps(data, default=_json_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
 
 def read_json_file(file_path: str) -> List[Dict[str, Any]]:
     ensure_data_dir()
     if not os.path.exists(file_path):
         return []
-    with open(file_path, 'r') as f:
+    with open(file_path, 'rb') as f:
         try:
-            return json.load(f)
-        except json.JSONDecodeError:
+            return orjson.loads(f.read())
+        except orjson.JSONDecodeError:
             return []
 
-def write_json_file(file_path: str, data: List[Dict[str, Any]]):
-    ensure_data_dir()
-    with open(file_path, 'w') as f:
-        json.dump(data, f, indent=2, default=str)
+RAPIDAPI_HEADERS = {
+    "x-rapidapi-host": "trustpilot-company-and-reviews-data.p.rapidapi.com",
+    "x-rapidapi-key": settings.RAPIDAPI_KEY
+}
+
+# Shared HTTP session so upstream calls reuse keep-alive connections
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+def get_http_session() -> requests.Session:
+    global _http_session
+    with _http_session_lock:
+        if _http_session is not None:
+            return _http_session
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=2,
+            pool_maxsize=max(settings.FETCH_CONCURRENCY, 10)
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(RAPIDAPI_HEADERS)
+        _http_session = session
+        return _http_session
+
+# Async client used by the request path, bound to the app's event loop
+_async_http_client: Optional[httpx.AsyncClient] = None
+
+def get_async_http_client() -> httpx.AsyncClient:
+    global _async_http_client
+    if _async_http_client is None:
+        _async_http_client = httpx.AsyncClient(
+            headers=RAPIDAPI_HEADERS,
+            timeout=settings.UPSTREAM_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=settings.ASYNC_HTTP_MAX_CONNECTIONS, max_keepalive_connections=settings.ASYNC_HTTP_MAX_CONNECTIONS)
+        )
+    return _async_http_client
+
+async def close_async_http_client():
+    global _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+
+# Upstream payload parsing
+def parse_companies(data: Dict[str, Any]) -> List[Company]:
+    companies = []
+    for company_data in data.get("data", {}).get("companies", []):
+        company = Company(
+            domain=company_data.get("domain", ""),
+            name=company_data.get("name", ""),
+            website=company_data.get("website", ""),
+            trustscore=company_data.get("trust_score"),
+            trustscore_category=company_data.get("trust_score"),
+            number_of_reviews=company_data.get("review_count")
+        )
+        companies.append(company)
+    return companies
+
+def parse_reviews(domain: str, data: Dict[str, Any]) -> List[Review]:
+    reviews = []
+    for review_data in data.get("data", {}).get("reviews", []):
+        review = Review(
+            id=review_data.get("review_id", ""),
+            company_domain=domain,
+            title=review_data.get("review_title", ""),
+            content=review_data.get("review_text", ""),
+            rating=review_data.get("review_rating", 0),
+            date=datetime.fromisoformat(review_data.get("review_time", "1970-01-01T00:00:00").replace('Z', '+00:00')),
+            author=review_data.get("consumer_name", "")
+        )
+        reviews.append(review)
+    return reviews
+
+def review_page_params(domain: str, page: int) -> Dict[str, Any]:
+    return {"company_domain": domain, "sort": "recency", "page": page}
+
+# Upstream requests, timed per endpoint ("search" or "reviews") and status code. Every
+# attempt passes the circuit breaker, quota budget and rate limiter in upstream.py, and
+# 429s, 5xx and transport errors are retried with jittered backoff.
+def _timed_attempt(endpoint: str, start: float, response) -> None:
+    status = str(response.status_code) if response is not None else "error"
+    UPSTREAM_REQUEST_DURATION.labels(endpoint, status).observe(time.perf_counter() - start)
+
+def upstream_get(endpoint: str, url: str, params: Dict[str, Any], timeout: float, priority: str = BACKGROUND) -> requests.Response:
+    attempts = upstream_policy.max_attempts(priority)
+    for attempt in range(attempts):
+        trial = upstream_policy.before_call(priority)
+        response = None
+        start = None
+        try:
+            upstream_policy.bucket.acquire(priority)
+            start = time.perf_counter()
+            response = get_http_session().get(url, params=params, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            upstream_policy.after_error()
+            if attempt + 1 == attempts:
+                raise
+            retry_after = None
+        else:
+            retry_after = upstream_policy.after_response(response.status_code, response.headers)
+            if retry_after is None or attempt + 1 == attempts:
+                return response
+        finally:
+            if trial:
+                # on_success/on_failure already ended it, unless the trial gave no verdict
+                upstream_policy.breaker.release_trial()
+            if start is not None:
+                _timed_attempt(endpoint, start, response)
+        UPSTREAM_RETRIES.labels(endpoint).inc()
+        time.sleep(upstream_policy.backoff(attempt, retry_after))
+
+async def async_upstream_get(endpoint: str, url: str, params: Dict[str, Any], priority: str = INTERACTIVE) -> httpx.Response:
+    attempts = upstream_policy.max_attempts(priority)
+    for attempt in range(attempts):
+        trial = upstream_policy.before_call(priority)
+        response = None
+        start = None
+        try:
+            await upstream_policy.bucket.acquire_async(priority)
+            start = time.perf_counter()
+            response = await get_async_http_client().get(url, params=params)
+        except httpx.TransportError:
+            upstream_policy.after_error()
+            if attempt + 1 == attempts:
+                raise
+            retry_after = None
+        else:
+            retry_after = upstream_policy.after_response(response.status_code, response.headers)
+            if retry_after is None or attempt + 1 == attempts:
+                return response
+        finally:
+            if trial:
+                # on_success/on_failure already ended it, unless the trial gave no verdict
+                upstream_policy.breaker.release_trial()
+            if start is not None:
+                _timed_attempt(endpoint, start, response)
+        UPSTREAM_RETRIES.labels(endpoint).inc()
+        await asyncio.sleep(upstream_policy.backoff(attempt, retry_after))
 
 # API call functions
-def search_companies(query: str) -> List[Company]:
-    headers = {
-        "x-rapidapi-host": "trustpilot-company-and-reviews-data.p.rapidapi.com",
-        "x-rapidapi-key": settings.RAPIDAPI_KEY
-    }
-    
+def fetch_companies(query: str) -> List[Company]:
+    """Search companies upstream. Raises on request errors."""
     params = {"query": query}
-    
-    try:
-        response = requests.get(settings.COMPANY_SEARCH_URL, headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        companies = []
-        for company_data in data.get("data", {}).get("companies", []):
-            company = Company(
-                domain=company_data.get("domain", ""),
-                name=company_data.get("name", ""),
-                website=company_data.get("website", ""),
-                trustscore=company_data.get("trust_score"),
-                trustscore_category=company_data.get("trust_score"),
-                number_of_reviews=company_data.get("review_count")
-            )
-            companies.append(company)
-        
-        return companies
-    except requests.RequestException as e:
-        logger.error(f"❌ Error searching companies: {e}")
-        return []
 
-def get_company_reviews(domain: str) -> List[Review]:
-    headers = {
-        "x-rapidapi-host": "trustpilot-company-and-reviews-data.p.rapidapi.com",
-        "x-rapidapi-key": settings.RAPIDAPI_KEY
-    }
-    
-    params = {"company_domain": domain}
-    
+    response = upstream_get("search", settings.COMPANY_SEARCH_URL, params, settings.UPSTREAM_TIMEOUT_SECONDS, INTERACTIVE)
+    response.raise_for_status()
+    return parse_companies(response.json())
+
+def fetch_review_page(domain: str, page: int = 1, timeout: Optional[float] = None) -> List[Review]:
+    """Fetch one page of reviews, newest first. Raises on request or parse errors."""
+    response = upstream_get(
+        "reviews",
+        settings.COMPANY_REVIEWS_URL,
+        review_page_params(domain, page),
+        timeout or settings.UPSTREAM_TIMEOUT_SECONDS
+    )
+    response.raise_for_status()
+    return parse_reviews(domain, response.json())
+
+# Async API call functions
+async def async_fetch_companies(query: str) -> List[Company]:
+    """Search companies upstream without blocking the event loop. Raises on request errors."""
+    response = await async_upstream_get("search", settings.COMPANY_SEARCH_URL, {"query": query})
+    response.raise_for_status()
+    return parse_companies(response.json())
+
+async def async_fetch_review_page(domain: str, page: int = 1) -> List[Review]:
+    """Async fetch_review_page. Raises on request or parse errors."""
+    response = await async_upstream_get("reviews", settings.COMPANY_REVIEWS_URL, review_page_params(domain, page))
+    response.raise_for_status()
+    return parse_reviews(domain, response.json())
+
+async def async_get_company_reviews(domain: str, page: int = 1) -> List[Review]:
     try:
-        response = requests.get(settings.COMPANY_REVIEWS_URL, headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        reviews = []
-        for review_data in data.get("data", {}).get("reviews", []):
-            review = Review(
-                id=review_data.get("review_id", ""),
-                company_domain=domain,
-                title=review_data.get("review_title", ""),
-                content=review_data.get("review_text", ""),
-                rating=review_data.get("review_rating", 0),
-                date=datetime.fromisoformat(review_data.get("review_time", "1970-01-01T00:00:00").replace('Z', '+00:00')),
-                author=review_data.get("consumer_name", "")
-            )
-            reviews.append(review)
-        
-        return reviews
-    except requests.RequestException as e:
+        return await async_fetch_review_page(domain, page=page)
+    except (httpx.HTTPError, UpstreamError) as e:
         logger.error(f"❌ Error fetching reviews for {domain}: {e}")
         return []
     except (ValueError, KeyError) as e: